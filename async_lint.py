@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+asyncio interface for linting part definitions inside an event loop based service
+
+    async for result in lint_many(paths_or_bytes):
+        …
+
+Files are read in the default (thread) executor of the loop, and parsing runs in the
+executor passed in (a ThreadPoolExecutor or ProcessPoolExecutor), so the event loop
+is never blocked. At most «concurrency» parts are in progress at once, and the next
+source is only taken from the input when a slot is free, so a slow consumer holds
+back the reading and parsing as well.
+
+Nothing is printed. Each result is a lint_api.LintResult, with the source name, the
+findings and metadata, and an error string (or None) for parts that could not be
+processed.
+'''
+
+# pipenv shell
+# pipenv run pylint async_lint.py
+
+# standard library imports
+import os
+import asyncio
+import argparse
+from concurrent.futures import Executor
+from typing import AsyncIterator, Dict
+
+# local application/library specific imports
+from parse_fzp import rule_names
+from xml_backend import check_backend_choice, BACKEND_CHOICES
+from lint_api import LintResult, lint_part, error_result
+
+ASYNC_LINT_VERSION = '0.0.1'
+DEFAULT_OPTIONS = {
+    'process_svg': False,
+    'rules': None,
+    'xml_backend': 'auto'
+}
+
+
+def source_name(source) -> str:
+    '''get the name used for a lint source in the results'''
+    if isinstance(source, tuple):
+        return source[0]
+    if isinstance(source, (bytes, bytearray)):
+        return '<bytes>'
+    return os.fspath(source)
+# end def source_name:
+
+
+def read_source(source) -> bytes:
+    '''get the content of a lint source: a path, bytes, or a (name, bytes) tuple'''
+    if isinstance(source, tuple):
+        return source[1]
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, 'rb') as source_file:
+        return source_file.read()
+# end def read_source:
+
+
+def lint_content(name: str, content: bytes, lint_options: dict) -> LintResult:
+    '''lint a single part definition already read into memory
+
+    Only uses picklable arguments, so it can run in a process pool'''
+    return lint_part(content, lint_options, name)
+# end def lint_content:
+
+
+async def lint_source(source, executor: Executor, lint_options: dict) -> LintResult:
+    '''read (without blocking the loop), then lint a single source in the executor'''
+    loop = asyncio.get_running_loop()
+    name = source_name(source)
+    try:
+        content = await loop.run_in_executor(None, read_source, source)
+    except OSError as exc:
+        return error_result(name, type(exc).__name__ + ': ' + str(exc))
+    return await loop.run_in_executor(executor, lint_content, name, content, lint_options)
+# end def lint_source:
+
+
+async def as_async_iterator(sources) -> AsyncIterator:
+    '''iterate over a plain or async iterable of sources'''
+    if hasattr(sources, '__aiter__'):
+        async for source in sources:
+            yield source
+    else:
+        for source in sources:
+            yield source
+# end def as_async_iterator:
+
+
+async def lint_many(sources, executor: Executor = None, concurrency: int = 4,
+                    options: Dict[str, object] = None) -> AsyncIterator[LintResult]:
+    '''lint part definitions from paths, bytes or (name, bytes) tuples, yielding the
+    results in completion order'''
+    lint_options = dict(DEFAULT_OPTIONS)
+    lint_options.update(options or {})
+    pending_sources = as_async_iterator(sources)
+    sources_done = False
+    in_progress = set()
+    try:
+        while True:
+            while not sources_done and len(in_progress) < concurrency:
+                try:
+                    source = await pending_sources.__anext__()
+                except StopAsyncIteration:
+                    sources_done = True
+                    break
+                in_progress.add(asyncio.ensure_future(
+                    lint_source(source, executor, lint_options)))
+            if not in_progress:
+                return
+            done, in_progress = await asyncio.wait(
+                in_progress, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in in_progress:
+            task.cancel()
+# end def lint_many:
+
+
+class CommandLineParser:
+    '''handle command line argument parsing'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.parser = CommandLineParser.build_parser()
+        self.command_arguments = self.parser.parse_args()
+
+    @staticmethod
+    def build_parser() -> argparse.ArgumentParser:
+        '''create command line argument parser'''
+        parser = argparse.ArgumentParser(description='Fritzing part asyncio lint')
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + ASYNC_LINT_VERSION)
+        parser.add_argument('definition_files', metavar='Part Definition', nargs='+',
+                            help='Fritzing part definition files')
+        parser.add_argument('-c', '--concurrency', type=int, default=4,
+                            help='maximum number of parts in progress at once')
+        parser.add_argument('--rules', type=rule_names, metavar='rules',
+                            help='only check the comma separated rules (exception keys)')
+        parser.add_argument('--xml-backend', choices=BACKEND_CHOICES, default='auto',
+                            help='xml parser to use')
+        return parser
+    # end def build_parser:
+# end class CommandLineParser:
+
+
+async def lint_files(cmd_args: argparse.Namespace) -> None:
+    '''show the results for the command line files'''
+    options = {
+        'rules': frozenset(cmd_args.rules) if cmd_args.rules else None,
+        'xml_backend': cmd_args.xml_backend
+    }
+    async for result in lint_many(
+            cmd_args.definition_files, concurrency=cmd_args.concurrency, options=options):
+        print(result.source)
+        print(result.error if result.error is not None else result.findings)
+# end def lint_files:
+
+
+def my_main() -> None:
+    '''wrapper for test/start code so that variables do not look like constants'''
+    cli_parser = CommandLineParser()
+    check_backend_choice(cli_parser.parser, cli_parser.command_arguments.xml_backend)
+    asyncio.run(lint_files(cli_parser.command_arguments))
+# end def my_main:
+
+# Standalone module execution
+if __name__ == "__main__":
+    my_main()
+
+# variables
+#   cSpell:words asyncio
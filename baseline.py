@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+baseline of accepted lint findings, to only report new findings
+
+Each finding gets a stable fingerprint, from the (library relative) part path, and
+the key, value and context of the finding. In a run over several library layers, the
+position of the library in the stack is part of the fingerprint for every library
+after the first, so the same relative path in two layers is suppressed separately.
+A fingerprint for the first (or only) library does not change. A baseline file is the
+set of fingerprints for the findings that have been accepted. A lint run using a
+baseline only reports findings that are not in the set.
+
+A baseline can be written at the end of any lint run, or created from the report
+of a previous run (like exceptions.txt), using this module from the command line.
+'''
+
+# pipenv shell
+# pipenv run pylint baseline.py
+
+# standard library imports
+import os
+import ast
+import json
+import hashlib
+import argparse
+from typing import Iterator, Tuple
+
+# local application/library specific imports
+from myutilities import ReadableFile, write_atomically
+
+BASELINE_VERSION = '0.0.1'
+BASELINE_HEADER = '# fritzing-lint baseline'
+# the part path folder levels used in the fingerprint: «source folder»/«file name»
+PATH_LEVELS = 2
+
+
+def stable_part_path(part_path: str) -> str:
+    '''get the part of a path that does not depend on where the library is located'''
+    return '/'.join(os.path.normpath(part_path).split(os.sep)[-PATH_LEVELS:])
+# end def stable_part_path:
+
+
+def finding_fingerprint(part_path: str, finding: dict, layer: int = 0) -> str:
+    '''get the stable fingerprint for a single finding in a part, from library «layer»'''
+    identity = [stable_part_path(part_path), finding['key'], finding['value'],
+                finding['context']]
+    if layer:
+        identity.append(layer)
+    identity = json.dumps(identity, sort_keys=True, default=str)
+    return hashlib.sha1(identity.encode('UTF-8')).hexdigest()
+# end def finding_fingerprint:
+
+
+def report_findings(report_path: str) -> Iterator[Tuple[str, dict]]:
+    '''get the (part path, finding) pairs from the printed report of a lint run
+
+    The report has the path of each part with findings on one line, followed by the
+    exceptions dictionary for the part on the next line'''
+    part_path = None
+    with open(report_path, 'r', encoding='UTF-8') as report_file:
+        for line in report_file:
+            line = line.strip()
+            if line.endswith('.fzp'):
+                part_path = line
+            elif line.startswith('{') and part_path is not None:
+                for findings in ast.literal_eval(line).values():
+                    for finding in findings:
+                        yield part_path, finding
+                part_path = None
+# end def report_findings:
+
+
+class Baseline:
+    '''a set of accepted finding fingerprints'''
+    def __init__(self, baseline_path: str = None):
+        self.fingerprints = set()
+        self.comments = {}
+        if baseline_path is not None:
+            self.load(baseline_path)
+    # end def __init__:
+
+    def load(self, baseline_path: str) -> None:
+        '''add the fingerprints from a baseline file'''
+        with open(baseline_path, 'r', encoding='UTF-8') as baseline_file:
+            for line in baseline_file:
+                fingerprint = line.split('#', 1)[0].strip()
+                if fingerprint:
+                    self.fingerprints.add(fingerprint)
+    # end def load:
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return fingerprint in self.fingerprints
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def add(self, part_path: str, finding: dict, layer: int = 0) -> str:
+        '''add the fingerprint for a finding, and return it'''
+        fingerprint = finding_fingerprint(part_path, finding, layer)
+        self.fingerprints.add(fingerprint)
+        self.comments[fingerprint] = '{0} {1}{2}'.format(
+            stable_part_path(part_path), finding['key'],
+            ' (layer {0})'.format(layer) if layer else '')
+        return fingerprint
+    # end def add:
+
+    def write(self, baseline_path: str) -> None:
+        '''save the fingerprints, sorted so that baseline diffs stay readable'''
+        lines = [BASELINE_HEADER]
+        for fingerprint in sorted(self.fingerprints):
+            comment = self.comments.get(fingerprint)
+            lines.append(fingerprint if comment is None else fingerprint + ' # ' + comment)
+        write_atomically(baseline_path, '\n'.join(lines) + '\n')
+    # end def write:
+# end class Baseline:
+
+
+class CommandLineParser:
+    '''handle command line argument parsing'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.parser = CommandLineParser.build_parser()
+        self.command_arguments = self.parser.parse_args()
+
+    @staticmethod
+    def build_parser() -> argparse.ArgumentParser:
+        '''create command line argument parser'''
+        parser = argparse.ArgumentParser(
+            description='create a lint baseline from the report of a previous run')
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + BASELINE_VERSION)
+        parser.add_argument('report', metavar='Report', action=ReadableFile,
+                            help='printed report (exceptions dump) from a parse_fzp run')
+        parser.add_argument('baseline', metavar='Baseline',
+                            help='baseline file to write')
+        return parser
+    # end def build_parser:
+# end class CommandLineParser:
+
+
+def my_main() -> None:
+    '''wrapper for test/start code so that variables do not look like constants'''
+    cli_parser = CommandLineParser()
+    baseline = Baseline()
+    for part_path, finding in report_findings(cli_parser.command_arguments.report):
+        baseline.add(part_path, finding)
+    baseline.write(cli_parser.command_arguments.baseline)
+    print('{0} findings in baseline'.format(len(baseline)))
+# end def my_main:
+
+# Standalone module execution
+if __name__ == "__main__":
+    my_main()
+
+# variables
+#   cSpell:words
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+benchmark the xml parser backends on a Fritzing parts library (or folder)
+
+times the part definition and svg image parsing with each available backend, and
+verifies that every backend produces exactly the same lint findings
+
+With --adversarial, generates a set of pathological part and image files instead,
+and verifies that the per file limits stop each one, quickly, with a file_limit
+finding
+'''
+
+# pipenv shell
+# pipenv run pylint bench_parse.py
+
+# standard library imports
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# local application/library specific imports
+from myutilities import ExistingDir
+from yield_parts import PartFinder, PseudoDirEntry, read_file_content
+from parse_fzp import FritzingPartDefinition
+from parse_svg import read_svg_ids, SvgIdIndex
+from xml_backend import select_backend, lxml_etree
+from file_limits import FileLimits, LimitedBackend
+
+BENCH_PARSE_VERSION = '0.0.1'
+# the limits the adversarial files are checked against
+ADVERSARIAL_LIMITS = {
+    'max_bytes': 8 << 20, 'max_elements': 100000, 'max_depth': 200, 'max_attributes': 500,
+    'max_seconds': 5.0}
+PART_HEAD = '<?xml version="1.0" encoding="UTF-8"?>\n<module moduleId="adversarialModuleID">\n'
+PART_PROPERTIES = ' <properties>\n  <property name="family">adversarial</property>\n' \
+    ' </properties>\n'
+PART_TAIL = '</module>\n'
+
+
+class ParseBenchmark:
+    '''time parsing and linting with each xml backend'''
+    def __init__(self, cmd_args: argparse.Namespace):
+        self.command_arguments = cmd_args
+        self.backends = [select_backend('defusedxml')]
+        if lxml_etree is not None:
+            self.backends.append(select_backend('lxml'))
+        else:
+            print('lxml is not installed: only benchmarking defusedxml')
+        self.part_files = self.load_files(False)
+        self.image_files = self.load_files(True)
+        print('{0} part files, {1} svg image files'.format(
+            len(self.part_files), len(self.image_files)))
+    # end def __init__:
+
+    def load_files(self, svg: bool) -> list:
+        '''read the (selected) library files into memory, so only parsing is timed'''
+        args = argparse.Namespace()
+        args.folder = None
+        args.part_library = self.command_arguments.library
+        args.svg = svg
+        args.pattern = self.command_arguments.pattern
+        suffix = PartFinder.IMAGE_FILE_TYPE if svg else PartFinder.PART_FILE_TYPE
+        return [(entry, read_file_content(entry))
+                for entry in PartFinder(args).filtered_files() if entry.name.endswith(suffix)]
+    # end def load_files:
+
+    def run(self) -> None:
+        '''time each backend, then compare the findings'''
+        findings = {}
+        for backend in self.backends:
+            part_time = self.best_time(lambda: self.parse_parts(backend))
+            image_time = self.best_time(lambda: self.parse_images(backend))
+            start = time.perf_counter()
+            findings[backend.NAME] = self.lint_parts(backend)
+            lint_time = time.perf_counter() - start
+            print('{0:>10}: parse fzp {1:8.3f}s  svg ids {2:8.3f}s  full lint {3:8.3f}s'.format(
+                backend.NAME, part_time, image_time, lint_time))
+        reference = findings[self.backends[0].NAME]
+        for backend in self.backends[1:]:
+            mismatched = [path for path in reference
+                          if reference[path] != findings[backend.NAME][path]]
+            if mismatched:
+                print('{0} findings differ from {1} for {2} parts, including:'.format(
+                    backend.NAME, self.backends[0].NAME, len(mismatched)))
+                for path in mismatched[:self.command_arguments.show]:
+                    print('  ' + path)
+            else:
+                print('{0} findings are identical to {1}'.format(
+                    backend.NAME, self.backends[0].NAME))
+    # end def run:
+
+    def best_time(self, operation) -> float:
+        '''get the fastest of the repeated runs of an operation'''
+        best = None
+        for _repeat in range(self.command_arguments.repeat):
+            start = time.perf_counter()
+            operation()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+    # end def best_time:
+
+    def parse_parts(self, backend: object) -> None:
+        '''build the element tree for every part file'''
+        for _entry, content in self.part_files:
+            try:
+                backend.fromstring(content)
+            except backend.ERRORS:
+                pass
+    # end def parse_parts:
+
+    def parse_images(self, backend: object) -> None:
+        '''collect the element ids for every image file'''
+        for _entry, content in self.image_files:
+            try:
+                read_svg_ids(io.BytesIO(content), backend)
+            except backend.ERRORS:
+                pass
+    # end def parse_images:
+
+    def lint_parts(self, backend: object) -> dict:
+        '''collect the findings for every part file'''
+        options = {
+            'exceptions': True,
+            'process_svg': self.command_arguments.svg,
+            'verbose': 0,
+            'dtd': 'FritzingPart.dtd',
+            'xml_backend': backend,
+            'svg_index': SvgIdIndex(backend=backend),
+            'quiet': True
+        }
+        findings = {}
+        for entry, content in self.part_files:
+            try:
+                part = FritzingPartDefinition(entry, options, content)
+                findings[entry.path] = part.exceptions
+            except (NotImplementedError, *backend.ERRORS) as exc:
+                findings[entry.path] = type(exc).__name__ + ': ' + str(exc)
+        return findings
+    # end def lint_parts:
+# end class ParseBenchmark:
+
+
+def adversarial_files(folder: str) -> list:
+    '''write the pathological part and image files, returning (file name, expected limit,
+    limit overrides) for each one'''
+    depth = ADVERSARIAL_LIMITS['max_depth'] * 2
+    fixtures = {
+        # text padding only, so no other limit is hit first
+        'huge.fzp': ('bytes', {}, PART_HEAD + PART_PROPERTIES + ' <description>' + 'x' * (
+            ADVERSARIAL_LIMITS['max_bytes'] + 1024) + '</description>\n' + PART_TAIL),
+        'deep.fzp': ('depth', {}, PART_HEAD + PART_PROPERTIES + '<n>' * depth + '</n>' * depth
+                     + PART_TAIL),
+        'wide.fzp': ('elements', {}, PART_HEAD + PART_PROPERTIES + ' <connectors>\n'
+                     + '<c/>' * (ADVERSARIAL_LIMITS['max_elements'] * 2) + '</connectors>\n'
+                     + PART_TAIL),
+        'attributes.fzp': ('attributes', {}, PART_HEAD + PART_PROPERTIES + ' <views '
+                           + ' '.join('a{0}="{0}"'.format(index) for index in range(
+                               ADVERSARIAL_LIMITS['max_attributes'] * 4)) + '/>\n'
+                           + PART_TAIL),
+        # under every other limit, but too slow for a tiny time budget
+        'slow.fzp': ('seconds', {'max_seconds': 0.001}, PART_HEAD + PART_PROPERTIES
+                     + ' <connectors>\n' + '<c id="x"/>' * (
+                         ADVERSARIAL_LIMITS['max_elements'] - 100) + '</connectors>\n'
+                     + PART_TAIL),
+        'deep.svg': ('depth', {}, '<svg xmlns="http://www.w3.org/2000/svg">' + '<g>' * depth
+                     + '</g>' * depth + '</svg>\n')
+    }
+    for file_name, (_limit, _overrides, content) in fixtures.items():
+        with open(os.path.join(folder, file_name), 'w', encoding='UTF-8') as fixture_file:
+            fixture_file.write(content)
+    return [(file_name, limit, overrides)
+            for file_name, (limit, overrides, _content) in fixtures.items()]
+# end def adversarial_files:
+
+
+def adversarial_result(backend: object, file_path: str) -> str:
+    '''get the file_limit finding text for a single adversarial file, or None'''
+    if file_path.endswith('.svg'):
+        image_ids = SvgIdIndex(backend=backend).image_ids(file_path)
+        return image_ids if isinstance(image_ids, str) else None
+    part = FritzingPartDefinition(PseudoDirEntry(os.path.basename(file_path), file_path), {
+        'exceptions': True, 'process_svg': False, 'verbose': 0, 'dtd': 'FritzingPart.dtd',
+        'xml_backend': backend, 'quiet': True}, None)
+    for finding in part.exceptions['error']:
+        if finding['key'] == 'file_limit':
+            return finding['context'][0]
+    return None
+# end def adversarial_result:
+
+
+def run_adversarial(backends: list) -> bool:
+    '''check that every adversarial file is stopped by the expected limit'''
+    all_held = True
+    with tempfile.TemporaryDirectory(prefix='adversarial') as folder:
+        fixtures = adversarial_files(folder)
+        for backend in backends:
+            for file_name, limit, overrides in fixtures:
+                limits = dict(ADVERSARIAL_LIMITS, **overrides)
+                start = time.perf_counter()
+                result = adversarial_result(
+                    LimitedBackend(backend, FileLimits(**limits)),
+                    os.path.join(folder, file_name))
+                elapsed = time.perf_counter() - start
+                held = result is not None and limit in result \
+                    and elapsed < ADVERSARIAL_LIMITS['max_seconds']
+                all_held = all_held and held
+                print('{0:>10} {1:>15} {2:>10} {3:8.3f}s  {4}: {5}'.format(
+                    backend.NAME, file_name, limit, elapsed, 'held' if held else 'FAILED',
+                    result))
+    return all_held
+# end def run_adversarial:
+
+
+class CommandLineParser:
+    '''handle command line argument parsing'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.parser = CommandLineParser.build_parser()
+        self.command_arguments = self.parser.parse_args()
+
+    @staticmethod
+    def build_parser() -> argparse.ArgumentParser:
+        '''create command line argument parser'''
+        parser = argparse.ArgumentParser(description='Fritzing xml backend benchmark')
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + BENCH_PARSE_VERSION)
+        parser.add_argument('library', metavar='Part Library', action=ExistingDir, nargs='?',
+                            help='path to top folder for Fritzing Parts library')
+        parser.add_argument('--adversarial', action='store_true',
+                            help='check that the per file limits stop a set of generated'
+                            ' pathological files, instead of benchmarking a library')
+        parser.add_argument('-p', '--pattern', action='append', metavar='pattern',
+                            help='only benchmark files matching the wild card pattern')
+        parser.add_argument('-r', '--repeat', type=int, default=3,
+                            help='number of timed runs, the fastest is reported')
+        parser.add_argument('-s', '--svg', action='store_true',
+                            help='include the connector svgId checks in the full lint')
+        parser.add_argument('--show', type=int, default=10,
+                            help='maximum number of mismatched part paths to show')
+        return parser
+    # end def build_parser:
+# end class CommandLineParser:
+
+
+def my_main() -> None:
+    '''wrapper for test/start code so that variables do not look like constants'''
+    cli_parser = CommandLineParser()
+    if cli_parser.command_arguments.adversarial:
+        backends = [select_backend('defusedxml')]
+        if lxml_etree is not None:
+            backends.append(select_backend('lxml'))
+        if not run_adversarial(backends):
+            sys.exit('a per file limit did not hold')
+        return
+    if cli_parser.command_arguments.library is None:
+        cli_parser.parser.error('a parts library is needed, unless using --adversarial')
+    ParseBenchmark(cli_parser.command_arguments).run()
+# end def my_main:
+
+# Standalone module execution
+if __name__ == "__main__":
+    my_main()
+
+# variables
+#   cSpell:words lxml defusedxml
@@ -13,13 +13,20 @@ explore the code to accurately walk the Fritzing part folder structure
 # standard library imports
 import os
 import posix
+import json
 from typing import Dict, List, NewType, Callable
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 
 # local application/library specific imports
-from myutilities import ExistingDir
+from myutilities import ExistingDir, write_atomically
+from metrics_export import RunMetrics
+from result_store import ResultStore
+from yield_parts import LinkWalker
+from library_layers import LibraryStack
 
 PART_COUNT_VERSION = '0.0.1'
+COUNT_CACHE_VERSION = 2
 CountDict = NewType('CountDict', Dict[str, int])
 
 
@@ -59,6 +66,58 @@ class PseudoDirEntry:
 # end class PseudoDirEntry:
 
 
+class FolderCountCache:
+    '''persisted folder counts, reused while the folder modification time is unchanged
+
+    Adding, removing, or renaming a file in a folder updates the folder modification
+    time, so the counts for a folder with the same time can not have changed'''
+    def __init__(self, cache_path: str, read_cache: bool = True):
+        self.cache_path = cache_path
+        self.folders = {}
+        self.changed = False
+        if read_cache:
+            self.load()
+    # end def __init__:
+
+    def load(self) -> None:
+        '''get the counts saved by a previous run'''
+        try:
+            with open(self.cache_path, 'r', encoding='UTF-8') as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            return # missing or unusable cache, start over
+        if cached.get('version') == COUNT_CACHE_VERSION:
+            self.folders = cached['folders']
+    # end def load:
+
+    def save(self) -> None:
+        '''store the current counts (atomically), when any of them changed'''
+        if not self.changed:
+            return
+        write_atomically(self.cache_path, json.dumps(
+            {'version': COUNT_CACHE_VERSION, 'folders': self.folders}))
+        self.changed = False
+    # end def save:
+
+    def get(self, kind: str, folder: posix.DirEntry) -> (CountDict, int):
+        '''get the cached counts for a folder, or None, plus the current folder mtime'''
+        folder_mtime = os.stat(folder.path).st_mtime_ns
+        cached = self.folders.get(kind + ':' + os.path.abspath(folder.path))
+        if cached is not None and cached['mtime'] == folder_mtime:
+            return cached['counts'], folder_mtime
+        return None, folder_mtime
+    # end def get:
+
+    def put(self, kind: str, folder: posix.DirEntry, folder_mtime: int, counts: CountDict) -> None:
+        '''save the counts for a folder'''
+        # dict updates are atomic, so worker threads can share the cache
+        self.folders[kind + ':' + os.path.abspath(folder.path)] = {
+            'mtime': folder_mtime, 'counts': counts}
+        self.changed = True
+    # end def put:
+# end class FolderCountCache:
+
+
 class PartCounter:
     '''count and report part files in the selected directories'''
     PART_FILE_TYPE = ('.fzp')
@@ -71,8 +130,45 @@ class PartCounter:
     def __init__(self, cmd_args: argparse.Namespace):
         '''count and report part files in the selected directories'''
         count_totals = self.empty_part_folder_counts()
-        user_counts = None
         self.command_arguments = cmd_args
+        self.count_cache = None
+        self.walker = None
+        # linked files waiting for all of the real files to be counted
+        self.deferred_links = []
+        if cmd_args.follow_links:
+            # every folder and file is checked against the ones already counted, so the
+            # folders are counted in order, and counts are not cached
+            self.walker = LinkWalker()
+        elif cmd_args.cache is not None:
+            # the file details are kept with the counts, so cached counts can be reported
+            self.count_cache = FolderCountCache(cmd_args.cache)
+        self.pool = None
+        if cmd_args.jobs > 1 and self.walker is None:
+            self.pool = ThreadPoolExecutor(max_workers=cmd_args.jobs)
+        self.metrics = None
+        if cmd_args.metrics is not None or cmd_args.metrics_json is not None:
+            self.metrics = RunMetrics('count_parts')
+        self.store = None
+        if cmd_args.store is not None:
+            self.store = ResultStore(cmd_args.store, 'count_parts',
+                                     os.path.abspath(cmd_args.parts_library), vars(cmd_args))
+        try:
+            self.count_part_sets(count_totals)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+            if self.count_cache is not None:
+                self.count_cache.save()
+        if self.metrics is not None:
+            self.metrics.write(cmd_args.metrics, cmd_args.metrics_json)
+        if self.store is not None:
+            self.store.finish()
+    # end def __init__:
+
+    def count_part_sets(self, count_totals: CountDict) -> None:
+        '''count the parts library, and the user parts when requested'''
+        user_counts = None
+        cmd_args = self.command_arguments
         self._report_folder_processing(cmd_args.parts_library, self.LIB_DIR_DESC)
         lib_counts = self.count_nested_parts('parts_library')
         if cmd_args.user is not None:
@@ -81,7 +177,90 @@ class PartCounter:
             user_counts = self.count_nested_parts('user')
             self.accumulate_count_fields(count_totals, user_counts)
             self._report_parts_grand_totals(count_totals)
-    # end def __init__:
+            if cmd_args.shadowed:
+                self.report_layered_parts(count_totals)
+        if self.walker is not None:
+            self.walker.report()
+    # end def count_part_sets:
+
+    def report_layered_parts(self, count_totals: CountDict) -> None:
+        '''show the parts and images of the parts library that are shadowed by the user
+        parts (as Fritzing resolves them), and the number of parts actually used'''
+        cmd_args = self.command_arguments
+        library_stack = LibraryStack([cmd_args.user, cmd_args.parts_library],
+                                     cmd_args.module_cache)
+        hidden_parts = len(library_stack.hidden_part_paths())
+        library_stack.report()
+        print('Effective Parts = {0}'.format(count_totals['parts'] - hidden_parts))
+    # end def report_layered_parts:
+
+    def walked_folders(self, folders: List[posix.DirEntry]) -> List[posix.DirEntry]:
+        '''get the folders to count, when following links: each physical folder once,
+        through a real path before a link'''
+        if self.walker is None:
+            return folders
+        entered = set()
+        for folder in LinkWalker.real_first(folders):
+            if self.walker.enter(folder):
+                entered.add(folder.path)
+                self.walker.leave(folder) # the folders counted are not nested
+        return [folder for folder in folders if folder.path in entered]
+    # end def walked_folders:
+
+    def is_walked_file(self, entry: posix.DirEntry, tally: Callable, *tally_args) -> bool:
+        '''decide if a file should be counted now, when following links
+
+        A linked file is deferred, then counted (with the tally function) by
+        count_deferred_links, only if the file it links to was not already counted'''
+        if self.walker is None:
+            return True
+        if entry.is_symlink():
+            self.deferred_links.append((entry, tally, tally_args))
+            return False
+        return self.walker.is_new_file(entry)
+    # end def is_walked_file:
+
+    def count_deferred_links(self) -> None:
+        '''count the linked files that reach a file that has not been counted yet'''
+        deferred_links, self.deferred_links = self.deferred_links, []
+        for entry, tally, tally_args in deferred_links:
+            if self.walker.is_new_file(entry):
+                tally(entry, *tally_args)
+    # end def count_deferred_links:
+
+    def map_folders(
+            self, counter: Callable[[posix.DirEntry], CountDict],
+            folders: List[posix.DirEntry]) -> List[CountDict]:
+        '''count each of the (independent) folders, in parallel when jobs were requested
+
+        The results are always in the same order as the folders'''
+        if self.pool is None:
+            return [counter(folder) for folder in folders]
+        return list(self.pool.map(counter, folders))
+    # end def map_folders:
+
+    def cached_folder_counts(
+            self, kind: str, counter: Callable[[posix.DirEntry], CountDict],
+            folder: posix.DirEntry) -> CountDict:
+        '''get the counts for a folder from the cache, scanning only when it changed'''
+        if self.count_cache is None:
+            return counter(folder)
+        counts, folder_mtime = self.count_cache.get(kind, folder)
+        if counts is None:
+            counts = counter(folder)
+            self.count_cache.put(kind, folder, folder_mtime, counts)
+        return dict(counts)
+    # end def cached_folder_counts:
+
+    def count_cached_folder_parts(self, parts_folder: posix.DirEntry) -> CountDict:
+        '''Count the part definition files in a folder, using cached counts when valid'''
+        return self.cached_folder_counts('parts', self.count_folder_parts, parts_folder)
+    # end def count_cached_folder_parts:
+
+    def count_cached_view_images(self, view_folder: posix.DirEntry) -> CountDict:
+        '''Count the image files in a view folder, using cached counts when valid'''
+        return self.cached_folder_counts('view', self.count_view_images, view_folder)
+    # end def count_cached_view_images:
 
     def _report_folder_processing(self, folder: str, description: str) -> None:
         '''Show information about the folder to be processed depending on verbosity setting'''
@@ -194,6 +373,21 @@ class PartCounter:
                 print('other file "{0}" found in image folder'.format(other_file.name))
     # end def _report_image_other_file_details:
 
+    def _report_file_details(self, details: List[list], folder: posix.DirEntry) -> None:
+        '''show the unexpected files noted while counting a folder
+
+        The counting can run in worker threads, or come from the cache, so the details
+        are only shown (in folder order) with the folder counts'''
+        reporters = {
+            'dir': self._report_dir_file_details,
+            'weird': self._report_weird_file_details,
+            'part_other': self._report_part_other_file_details,
+            'image_other': self._report_image_other_file_details
+        }
+        for kind, name in details:
+            reporters[kind](PseudoDirEntry(name, os.path.join(folder.path, name)), folder)
+    # end def _report_file_details:
+
     @staticmethod
     def _report_image_definition_mismatch(def_folders: List[str], img_folders: List[str]) -> None:
         '''report information about folders to hold part definitions and images that do not match'''
@@ -210,12 +404,19 @@ class PartCounter:
     # def count_nested_parts(self, folders: list) -> dict:
     def count_nested_parts(self, arg_key: str) -> Dict[str, int]:
         '''Count the number of Fritzing part definition files in each folder'''
-        folders = getattr(self.command_arguments, arg_key + "_sub")
+        folders = self.walked_folders(getattr(self.command_arguments, arg_key + "_sub"))
         count_totals = self.empty_part_folder_counts()
         part_sub_folders = []
-        for one_folder in folders:
+        folder_counts = self.map_folders(self.count_cached_folder_parts, folders)
+        if self.walker is not None:
+            self.count_deferred_links()
+        for one_folder, counts in zip(folders, folder_counts):
             part_sub_folders.append(one_folder.name)
-            counts = self.count_folder_parts(one_folder)
+            if self.metrics is not None:
+                self.metrics.record_part_folder(arg_key, one_folder.name, counts)
+            if self.store is not None:
+                self.store.add_counts(arg_key, one_folder.name, None, counts)
+            self._report_file_details(counts['details'], one_folder)
             self._report_single_folder_content(counts, one_folder)
             self.accumulate_count_fields(count_totals, counts)
         if self.command_arguments.svg:
@@ -228,21 +429,57 @@ class PartCounter:
         '''Count the number of svg image files useable for parts'''
         folders = getattr(self.command_arguments, arg_key + "_svg")
         if folders:
-            counts = self.count_part_set_images(folders[0], part_folders)
+            counts = self.count_part_set_images(folders[0], part_folders, arg_key)
             self._report_part_set_images(counts, folders[0])
         else:
             print('no svg folder found in {0}'.format(getattr(self.command_arguments, arg_key)))
     # end def count_images_for_parts:
 
     def count_part_set_images(
-            self, svg_root: posix.DirEntry, part_folders: List[str]) -> Dict[str, int]:
+            self, svg_root: posix.DirEntry, part_folders: List[str],
+            part_set: str = None) -> Dict[str, int]:
         '''count svg image files associated with a set (library) of part files'''
         context_data = {
             'svg_part_sets': [],
+            'source_folders': [],
             'root_svg_counts': self.empty_image_folder_counts(),
             'svg_root': svg_root
         }
+        if self.walker is not None and not self.walker.enter(svg_root):
+            return context_data['root_svg_counts'] # the same images were already counted
         scan_directory_files(svg_root, self.process_part_set_source_folders, context_data)
+        context_data['source_folders'] = self.walked_folders(context_data['source_folders'])
+        context_data['svg_part_sets'] = [folder.name for folder in context_data['source_folders']]
+        # collect the view folders for every source first, so that all of the (independent)
+        # view folders can be counted together
+        source_data = [self.collect_part_source_view_folders(source_folder)
+                       for source_folder in context_data['source_folders']]
+        all_view_folders = [view_folder for source_context in source_data
+                            for view_folder in source_context['view_folders']]
+        view_counts = self.map_folders(self.count_cached_view_images, all_view_folders)
+        if self.walker is not None:
+            self.count_deferred_links()
+            self.walker.leave(svg_root)
+        view_counts = iter(view_counts)
+        for source_folder, source_context in zip(context_data['source_folders'], source_data):
+            self._report_file_details(source_context['details'], source_folder)
+            for view_folder in source_context['view_folders']:
+                counts = next(view_counts)
+                self._report_file_details(counts['details'], view_folder)
+                if self.metrics is not None:
+                    self.metrics.record_image_folder(
+                        part_set, source_folder.name, view_folder.name, counts)
+                if self.store is not None:
+                    self.store.add_counts(part_set, source_folder.name, view_folder.name, counts)
+                self.accumulate_count_fields(source_context['total_counts'], counts)
+            if self.metrics is not None:
+                self.metrics.record_image_folder(
+                    part_set, source_folder.name, '', source_context['source_counts'])
+            if self.store is not None:
+                self.store.add_counts(
+                    part_set, source_folder.name, '', source_context['source_counts'])
+            set_counts = self.count_part_source_images(source_folder, source_context)
+            self.accumulate_count_fields(context_data['root_svg_counts'], set_counts)
         self._report_image_definition_mismatch(part_folders, context_data['svg_part_sets'])
         return context_data['root_svg_counts']
     # end def count_part_set_images:
@@ -255,8 +492,7 @@ class PartCounter:
         if source_file_spec.is_dir():
             if source_file_spec.name in PartsLibraryDir.SUB_PART_FOLDERS:
                 context_data['svg_part_sets'].append(source_file_spec.name)
-                set_counts = self.count_part_source_images(source_file_spec)
-                self.accumulate_count_fields(context_data['root_svg_counts'], set_counts)
+                context_data['source_folders'].append(source_file_spec)
             else: # unexpected directory name for parts svg
                 context_data['root_svg_counts']['dirs'] += 1
                 self._report_dir_file_details(source_file_spec, set_root_folder)
@@ -267,13 +503,22 @@ class PartCounter:
             context_data['root_svg_counts']['weird'] += 1
     # end def process_part_set_set_root_folders:
 
-    def count_part_source_images(self, source_folder: posix.DirEntry) -> Dict[str, int]:
-        '''count the image files for a part (definition) set'''
+    def collect_part_source_view_folders(self, source_folder: posix.DirEntry) -> dict:
+        '''find the image view folders (and count anything else) in a part source folder'''
         context_data = {
+            'view_folders': [],
             'total_counts': self.empty_image_folder_counts(),
-            'source_counts': self.empty_image_folder_counts()
+            'source_counts': self.empty_image_folder_counts(),
+            'details': []
         }
         scan_directory_files(source_folder, self.process_part_source_view_folders, context_data)
+        context_data['view_folders'] = self.walked_folders(context_data['view_folders'])
+        return context_data
+    # end def collect_part_source_view_folders:
+
+    def count_part_source_images(
+            self, source_folder: posix.DirEntry, context_data: dict) -> Dict[str, int]:
+        '''report and total the (already counted) image files for a part (definition) set'''
         self._report_source_image_counts(context_data['total_counts'], source_folder)
         self.accumulate_count_fields(context_data['total_counts'], context_data['source_counts'])
         return context_data['total_counts']
@@ -286,14 +531,13 @@ class PartCounter:
         '''process image view folders in a single part source folder'''
         if view_file_spec.is_dir():
             if view_file_spec.name in PartsLibraryDir.SVG_VIEW_FOLDERS:
-                view_counts = self.count_view_images(view_file_spec)
-                self.accumulate_count_fields(context_data['total_counts'], view_counts)
+                context_data['view_folders'].append(view_file_spec)
             else:
                 context_data['source_counts']['dirs'] += 1
-                self._report_dir_file_details(view_file_spec, source_folder)
+                context_data['details'].append(('dir', view_file_spec.name))
         elif view_file_spec.is_file():
             context_data['source_counts']['other'] += 1
-            self._report_image_other_file_details(view_file_spec, source_folder)
+            context_data['details'].append(('image_other', view_file_spec.name))
         else:
             context_data['source_counts']['weird'] += 1
     # end def process_part_source_view_folders:
@@ -301,6 +545,7 @@ class PartCounter:
     def count_view_images(self, view_folder: posix.DirEntry) -> dict:
         '''count the part image files for a single view folder'''
         raw_counts = self.empty_image_folder_counts()
+        raw_counts['details'] = []
         scan_directory_files(view_folder, self.process_view_image_folder, raw_counts)
         raw_counts['source'] = {
             'path': view_folder.path,
@@ -314,35 +559,36 @@ class PartCounter:
             view_folder: posix.DirEntry,
             raw_counts: Dict[str, int]) -> None:
         '''process a file found in an svg view specific folder'''
+        if self.is_walked_file(image_file, self.tally_view_image_file, view_folder, raw_counts):
+            self.tally_view_image_file(image_file, view_folder, raw_counts)
+    # end def process_view_image_folder:
+
+    @staticmethod
+    def tally_view_image_file(
+            image_file: posix.DirEntry, view_folder: posix.DirEntry,
+            raw_counts: Dict[str, int]) -> None:
+        '''count a single file found in an svg view specific folder'''
         if image_file.is_dir():
             raw_counts['dirs'] += 1
-            self._report_dir_file_details(image_file, view_folder)
+            raw_counts['details'].append(('dir', image_file.name))
         elif not image_file.is_file():
             raw_counts['weird'] += 1
-            self._report_weird_file_details(image_file, view_folder)
+            raw_counts['details'].append(('weird', image_file.name))
         elif image_file.name.endswith(PartCounter.IMAGE_FILE_TYPE):
             raw_counts[view_folder.name] += 1
         else:
             raw_counts['other'] += 1
-            self._report_image_other_file_details(image_file, view_folder)
-    # end def process_view_image_folder:
+            raw_counts['details'].append(('image_other', image_file.name))
+    # end def tally_view_image_file:
 
     def count_folder_parts(self, parts_folder: posix.DirEntry) -> dict:
         '''Count the number of Fritzing part definition files in a folder'''
         raw_counts = self.empty_part_folder_counts()
+        raw_counts['details'] = [] # reported later, in folder order
         with os.scandir(parts_folder.path) as parts:
             for part_file in parts:
-                if part_file.is_dir():
-                    raw_counts['dirs'] += 1
-                    self._report_dir_file_details(part_file, parts_folder)
-                elif not part_file.is_file():
-                    raw_counts['weird'] += 1
-                    self._report_weird_file_details(part_file, parts_folder)
-                elif part_file.name.endswith(PartCounter.PART_FILE_TYPE):
-                    raw_counts['parts'] += 1
-                else:
-                    raw_counts['other'] += 1
-                    self._report_part_other_file_details(part_file, parts_folder)
+                if self.is_walked_file(part_file, self.tally_part_folder_file, raw_counts):
+                    self.tally_part_folder_file(part_file, raw_counts)
         raw_counts['source'] = {
             'path': parts_folder.path,
             'name': parts_folder.name
@@ -350,6 +596,37 @@ class PartCounter:
         return raw_counts
     # end def count_folder_parts:
 
+    @staticmethod
+    def tally_part_folder_file(part_file: posix.DirEntry, raw_counts: CountDict) -> None:
+        '''count a single file found in a part definition folder'''
+        if part_file.is_dir():
+            raw_counts['dirs'] += 1
+            raw_counts['details'].append(('dir', part_file.name))
+        elif not part_file.is_file():
+            raw_counts['weird'] += 1
+            raw_counts['details'].append(('weird', part_file.name))
+        elif part_file.name.endswith(PartCounter.PART_FILE_TYPE):
+            raw_counts['parts'] += 1
+        else:
+            raw_counts['other'] += 1
+            raw_counts['details'].append(('part_other', part_file.name))
+    # end def tally_part_folder_file:
+
+    @staticmethod
+    def count_library_part_files(library_path: str) -> int:
+        '''Quick count of the part definition files in the part source folders of a
+        library, without any reporting, for an expected total before processing'''
+        part_count = 0
+        with os.scandir(library_path) as library_folders:
+            source_folders = [folder for folder in library_folders if folder.is_dir()
+                              and folder.name in PartsLibraryDir.SUB_PART_FOLDERS]
+        for parts_folder in source_folders:
+            with os.scandir(parts_folder.path) as parts:
+                part_count += sum(1 for part_file in parts if part_file.is_file()
+                                  and part_file.name.endswith(PartCounter.PART_FILE_TYPE))
+        return part_count
+    # end def count_library_part_files:
+
     @staticmethod
     def accumulate_count_fields(target: dict, source: dict) -> None:
         '''update count attributes in target with those in source'''
@@ -465,6 +742,29 @@ class CommandLineParser:
                             help='report exceptions while counting')
         parser.add_argument('-s', '--svg', action='store_true',
                             help='report svg image file counts')
+        parser.add_argument('-c', '--cache', metavar='cache-file',
+                            help='file to keep folder counts in between runs. Folders that'
+                            ' have not been modified are not scanned again')
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='number of folders to count in parallel')
+        parser.add_argument('--follow-links', action='store_true',
+                            help='follow symbolic links, counting each physical folder and'
+                            ' file once, however many links reach it (folders are then'
+                            ' counted one at a time, without the cache)')
+        parser.add_argument('--shadowed', action='store_true',
+                            help='with --user, resolve the user parts before the parts'
+                            ' library by moduleId and image path, and report the parts and'
+                            ' images that are shadowed')
+        parser.add_argument('--module-cache', metavar='cache-file',
+                            help='with --shadowed, file to keep the part moduleId index in'
+                            ' between runs (shared with parse_fzp)')
+        parser.add_argument('--metrics', metavar='prom-file',
+                            help='write the counts in Prometheus text format')
+        parser.add_argument('--metrics-json', metavar='json-file',
+                            help='write the counts as JSON')
+        parser.add_argument('--store', metavar='sqlite-file',
+                            help='add the counts for the run to a SQLite database'
+                            ' (see result_store.py)')
         return parser
     # end def build_parser:
 # end class CommandLineParser:
@@ -473,6 +773,8 @@ class CommandLineParser:
 def my_main() -> None:
     '''wrapper for test/start code so that variables do not look like constants'''
     cli_parser = CommandLineParser()
+    if cli_parser.command_arguments.shadowed and cli_parser.command_arguments.user is None:
+        cli_parser.parser.error('--shadowed needs the --user parts to layer over the library')
     PartCounter(cli_parser.command_arguments)
 # end def my_main:
 
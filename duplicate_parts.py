@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+detect duplicate and near duplicate part definitions
+
+Each parsed part is reduced to a canonical form: whitespace collapsed, attributes
+sorted, and volatile fields (like the moduleId) removed. The canonical forms are
+hashed, and parts with the same hash land in the same bucket, so all of the
+duplicates in a library are found in a single pass, without comparing every pair
+of parts.
+
+exact: identical after removing volatile fields
+near: also identical after removing the descriptive text (title, description,
+    tags, property values, …), leaving the family, views, layers, images and
+    connector graphics
+'''
+
+# pipenv shell
+# pipenv run pylint duplicate_parts.py
+
+# standard library imports
+import hashlib
+from typing import Dict, List, Tuple
+
+DUPLICATE_PARTS_VERSION = '0.0.1'
+
+
+class CanonicalForm:
+    '''the rules for reducing a part definition tree to a canonical form'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self, skip_attributes: Dict[str, frozenset], skip_elements: frozenset,
+                 skip_text: frozenset, keep_property_values: frozenset):
+        self.skip_attributes = skip_attributes
+        self.skip_elements = skip_elements
+        self.skip_text = skip_text
+        self.keep_property_values = keep_property_values
+    # end def __init__:
+
+    def digest(self, root) -> str:
+        '''get the hash of the canonical form of an element tree'''
+        hasher = hashlib.blake2b(digest_size=16)
+        self.feed(hasher, root)
+        return hasher.hexdigest()
+    # end def digest:
+
+    def feed(self, hasher, element) -> None:
+        '''add the canonical form of an element (and descendants) to the hash'''
+        tag = element.tag
+        hasher.update(b'<' + tag.encode('UTF-8'))
+        skipped = self.skip_attributes.get(tag, frozenset())
+        for name, value in sorted(element.attrib.items()):
+            if name not in skipped:
+                hasher.update('\x00{0}={1}'.format(name, value).encode('UTF-8'))
+        if tag not in self.skip_text or (
+                tag == 'property' and element.get('name') in self.keep_property_values):
+            hasher.update(b'\x01' + ' '.join((element.text or '').split()).encode('UTF-8'))
+        for child in element:
+            if child.tag not in self.skip_elements:
+                self.feed(hasher, child)
+        hasher.update(b'>')
+    # end def feed:
+# end class CanonicalForm:
+
+
+EXACT_FORM = CanonicalForm(
+    {'module': frozenset(('moduleId', 'fritzingVersion'))},
+    frozenset(('date', 'version')),
+    frozenset(),
+    frozenset())
+NEAR_FORM = CanonicalForm(
+    {'module': frozenset(('moduleId', 'fritzingVersion')),
+     'connector': frozenset(('name',))},
+    frozenset(('author', 'date', 'description', 'label', 'spice', 'tags', 'taxonomy',
+               'title', 'url', 'version')),
+    frozenset(('property',)),
+    frozenset(('family',)))
+
+
+class DuplicateFinder:
+    '''bucket parts by the hashes of their canonical forms'''
+    def __init__(self):
+        self.exact_buckets = {}
+        self.near_buckets = {}
+    # end def __init__:
+
+    @staticmethod
+    def digests(root) -> Tuple[str, str]:
+        '''get the (exact, near) canonical digests for a parsed part'''
+        return EXACT_FORM.digest(root), NEAR_FORM.digest(root)
+    # end def digests:
+
+    def add(self, part_path: str, root) -> None:
+        '''add a parsed part to the buckets'''
+        self.add_digests(part_path, *self.digests(root))
+    # end def add:
+
+    def add_digests(self, part_path: str, exact_digest: str, near_digest: str) -> None:
+        '''add a part to the buckets, using digests calculated elsewhere (like in a worker
+        process)'''
+        self.exact_buckets.setdefault(exact_digest, []).append(part_path)
+        self.near_buckets.setdefault(near_digest, []).append((exact_digest, part_path))
+    # end def add_digests:
+
+    def exact_duplicates(self) -> List[List[str]]:
+        '''get the groups of parts that are identical, other than volatile fields'''
+        return [paths for paths in self.exact_buckets.values() if len(paths) > 1]
+    # end def exact_duplicates:
+
+    def near_duplicates(self) -> List[List[str]]:
+        '''get the groups of parts that only differ in descriptive text
+
+        A group where every part is also an exact duplicate of the others is only
+        reported as an exact duplicate'''
+        groups = []
+        for members in self.near_buckets.values():
+            if len({exact_digest for exact_digest, _path in members}) > 1:
+                groups.append([path for _exact_digest, path in members])
+        return groups
+    # end def near_duplicates:
+
+    def report(self) -> None:
+        '''show the duplicate groups'''
+        for label, groups in (('exact', self.exact_duplicates()),
+                              ('near', self.near_duplicates())):
+            print('{0} {1} duplicate part groups'.format(len(groups), label))
+            for paths in groups:
+                print('  ' + '\n    '.join(sorted(paths)))
+    # end def report:
+# end class DuplicateFinder:
+
+# variables
+#   cSpell:words
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+library wide consistency checks for the part family property
+
+Fritzing Inspector offers the parts with the same family as swap candidates, using
+the other properties to pick between them. Checking that needs every part in a
+family, so these rules work on a small summary (path, family, property names) of
+each part, streamed in once, grouped by family:
+
+* parts with a different set of property names than the rest of the family
+* families with only a single part
+* family names that are likely misspellings of another family name
+'''
+
+# pipenv shell
+# pipenv run pylint family_checks.py
+
+# standard library imports
+import re
+import difflib
+import argparse
+from typing import Dict, List, Tuple
+
+# local application/library specific imports
+from myutilities import ReadableFile
+
+FAMILY_CHECKS_VERSION = '0.0.1'
+
+
+def family_key(family: str) -> str:
+    '''reduce a family name to the form used to compare spellings'''
+    return re.sub(r'[\W_]+', '', family.casefold())
+# end def family_key:
+
+
+class FamilyChecker:
+    '''group part summaries by family, then check the groups'''
+    def __init__(self, similarity: float = 0.9):
+        self.similarity = similarity
+        # family: {frozenset of property names: [part paths]}
+        self.families = {}
+    # end def __init__:
+
+    def add(self, part_path: str, properties: Dict[str, str]) -> None:
+        '''add the summary for a single part'''
+        family = properties.get('family')
+        if family is None:
+            return # reported for the part as null_family
+        name_sets = self.families.setdefault(family, {})
+        name_sets.setdefault(frozenset(properties), []).append(part_path)
+    # end def add:
+
+    def add_model(self, model: 'PartModel') -> None:
+        '''add the summary for a single part from the (snapshot) part model'''
+        if model.error is None:
+            self.add(model.path, dict(model.properties))
+    # end def add_model:
+
+    def family_size(self, family: str) -> int:
+        '''get the number of parts in a family'''
+        return sum(len(paths) for paths in self.families[family].values())
+    # end def family_size:
+
+    def property_set_differences(self) -> List[Tuple[str, frozenset, list]]:
+        '''get (family, common names, [(missing names, extra names, paths)]) for every
+        family where the parts do not all have the same property names'''
+        differences = []
+        for family, name_sets in sorted(self.families.items()):
+            if len(name_sets) < 2:
+                continue
+            common = max(name_sets, key=lambda names: (len(name_sets[names]), sorted(names)))
+            variants = [(sorted(common - names), sorted(names - common), sorted(paths))
+                        for names, paths in name_sets.items() if names != common]
+            differences.append((family, common, sorted(variants)))
+        return differences
+    # end def property_set_differences:
+
+    def singleton_families(self) -> List[Tuple[str, str]]:
+        '''get (family, part path) for every family with only a single part'''
+        return [(family, next(iter(name_sets.values()))[0])
+                for family, name_sets in sorted(self.families.items())
+                if self.family_size(family) == 1]
+    # end def singleton_families:
+
+    def misspelled_families(self) -> List[Tuple[str, str]]:
+        '''get (family, likely intended family) pairs
+
+        Families that only differ in case, spacing or punctuation always match. Other
+        family names match when they are similar enough, but not when the numbers in
+        the names are different (like «Rev2» and «Rev3»). The family with fewer parts
+        is reported as the likely misspelling'''
+        spellings = {}
+        for family in self.families:
+            spellings.setdefault(family_key(family), []).append(family)
+        pairs = set()
+        for families in spellings.values():
+            for family in families:
+                pairs.update(self.misspelling_pair(family, other)
+                             for other in families if other != family)
+        keys = sorted(spellings)
+        for key in keys:
+            for other_key in difflib.get_close_matches(key, keys, n=5, cutoff=self.similarity):
+                if other_key == key or re.findall(r'\d+', key) != re.findall(r'\d+', other_key):
+                    continue
+                for family in spellings[key]:
+                    pairs.update(self.misspelling_pair(family, other)
+                                 for other in spellings[other_key])
+        return sorted(pairs)
+    # end def misspelled_families:
+
+    def misspelling_pair(self, family: str, other: str) -> Tuple[str, str]:
+        '''order a pair of similar families as (likely misspelling, likely intended)'''
+        if (self.family_size(family), family) < (self.family_size(other), other):
+            return family, other
+        return other, family
+    # end def misspelling_pair:
+
+    def report(self) -> None:
+        '''show the results of every family check'''
+        differences = self.property_set_differences()
+        print('{0} families with differing property names'.format(len(differences)))
+        for family, common, variants in differences:
+            print('  {0}: {1}'.format(family, ', '.join(sorted(common))))
+            for missing, extra, paths in variants:
+                print('    missing {0} extra {1}'.format(missing, extra))
+                print('      ' + '\n      '.join(paths))
+        singletons = self.singleton_families()
+        print('{0} families with a single part'.format(len(singletons)))
+        for family, part_path in singletons:
+            print('  {0}: {1}'.format(family, part_path))
+        misspellings = self.misspelled_families()
+        print('{0} likely misspelled families'.format(len(misspellings)))
+        for family, intended in misspellings:
+            print('  "{0}" ({1}) for "{2}" ({3})'.format(
+                family, self.family_size(family), intended, self.family_size(intended)))
+    # end def report:
+# end class FamilyChecker:
+
+
+class CommandLineParser:
+    '''handle command line argument parsing'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.parser = CommandLineParser.build_parser()
+        self.command_arguments = self.parser.parse_args()
+
+    @staticmethod
+    def build_parser() -> argparse.ArgumentParser:
+        '''create command line argument parser'''
+        parser = argparse.ArgumentParser(description='Fritzing part family checks')
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + FAMILY_CHECKS_VERSION)
+        parser.add_argument('snapshot', metavar='Snapshot', action=ReadableFile,
+                            help='library snapshot file (from library_snapshot.py)')
+        parser.add_argument('--similarity', type=float, default=0.9,
+                            help='how similar (0 to 1) family names need to be to be'
+                            ' reported as likely misspellings')
+        return parser
+    # end def build_parser:
+# end class CommandLineParser:
+
+
+def my_main() -> None:
+    '''wrapper for test/start code so that variables do not look like constants'''
+    # imported here: library_snapshot uses parse_fzp, which uses this module
+    from library_snapshot import load_part_models # pylint: disable=import-outside-toplevel
+    cli_parser = CommandLineParser()
+    checker = FamilyChecker(cli_parser.command_arguments.similarity)
+    for model in load_part_models(cli_parser.command_arguments.snapshot):
+        checker.add_model(model)
+    checker.report()
+# end def my_main:
+
+# Standalone module execution
+if __name__ == "__main__":
+    my_main()
+
+# variables
+#   cSpell:words misspellings
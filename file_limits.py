@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+per file resource limits, to protect a library run from pathological xml files
+
+A single huge, deeply nested, or attribute stuffed part or svg image can stall a
+whole library run. LimitedBackend wraps an xml backend, checking the file size before
+anything is read, then counting the elements, nesting depth and attributes (and
+checking the elapsed time) as the document is streamed in. Parsing stops at the
+first limit that is exceeded, with LimitExceeded, instead of after the whole file
+has been loaded.
+'''
+
+# pipenv shell
+# pipenv run pylint file_limits.py
+
+# standard library imports
+import io
+import os
+import time
+import argparse
+from typing import Iterator, Tuple
+
+FILE_LIMITS_VERSION = '0.0.1'
+LIMIT_NAMES = ('bytes', 'elements', 'depth', 'attributes', 'seconds')
+# the elapsed time is only checked after this many elements
+TIME_CHECK_ELEMENTS = 64
+
+
+class LimitExceeded(ValueError):
+    '''a file is over one of the processing limits'''
+    def __init__(self, limit: str, value: float, maximum: float):
+        super().__init__('{0} {1} over the limit of {2}'.format(limit, value, maximum))
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+    # end def __init__:
+# end class LimitExceeded:
+
+
+class FileLimits:
+    '''the maximum size, element count, nesting depth, attributes on a single element,
+    and parse time for a single file. None for no limit'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self, max_bytes: int = None, max_elements: int = None, max_depth: int = None,
+                 max_attributes: int = None, max_seconds: float = None):
+        self.maximum = {
+            'bytes': max_bytes,
+            'elements': max_elements,
+            'depth': max_depth,
+            'attributes': max_attributes,
+            'seconds': max_seconds
+        }
+    # end def __init__:
+
+    @classmethod
+    def from_arguments(cls, cmd_args: argparse.Namespace) -> 'FileLimits':
+        '''get the limits from the command line options, or None when there are none'''
+        limits = cls(
+            getattr(cmd_args, 'max_file_size', None), getattr(cmd_args, 'max_elements', None),
+            getattr(cmd_args, 'max_depth', None), getattr(cmd_args, 'max_attributes', None),
+            getattr(cmd_args, 'max_parse_seconds', None))
+        return limits if limits.is_active() else None
+    # end def from_arguments:
+
+    def is_active(self) -> bool:
+        '''check if any limit is set'''
+        return any(maximum is not None for maximum in self.maximum.values())
+    # end def is_active:
+
+    def check(self, limit: str, value: float) -> None:
+        '''raise LimitExceeded when a value is over the limit'''
+        maximum = self.maximum[limit]
+        if maximum is not None and value > maximum:
+            raise LimitExceeded(limit, value, maximum)
+    # end def check:
+# end class FileLimits:
+
+
+def source_size(source) -> int:
+    '''get the size in bytes of a file path or file object, without reading it, or None'''
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer().nbytes
+    if hasattr(source, 'read'):
+        try:
+            return os.fstat(source.fileno()).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+    return os.stat(os.fspath(source)).st_size
+# end def source_size:
+
+
+class LimitedBackend:
+    '''an xml backend that enforces FileLimits while parsing'''
+    def __init__(self, backend: object, limits: FileLimits):
+        self.backend = backend
+        self.limits = limits
+        self.NAME = backend.NAME # pylint: disable=invalid-name
+        self.ERRORS = backend.ERRORS + (LimitExceeded,) # pylint: disable=invalid-name
+    # end def __init__:
+
+    def iterparse(self, source, events: Tuple[str]) -> Iterator[Tuple[str, object]]:
+        '''stream (event, element) pairs, stopping at the first limit exceeded'''
+        limits = self.limits
+        size = source_size(source)
+        if size is not None:
+            limits.check('bytes', size)
+        start = time.perf_counter()
+        elements = depth = 0
+        for event, element in self.backend.iterparse(source, ('start', 'end')):
+            if event == 'start':
+                elements += 1
+                depth += 1
+                limits.check('elements', elements)
+                limits.check('depth', depth)
+                limits.check('attributes', len(element.attrib))
+                if elements % TIME_CHECK_ELEMENTS == 0:
+                    limits.check('seconds', round(time.perf_counter() - start, 3))
+            else:
+                depth -= 1
+            if event in events:
+                yield event, element
+        limits.check('seconds', round(time.perf_counter() - start, 3))
+    # end def iterparse:
+
+    def parse(self, source) -> object:
+        '''get the root element of a document from a file path or file object'''
+        root = None
+        for _event, element in self.iterparse(source, ('start',)):
+            if root is None:
+                root = element
+        return root
+    # end def parse:
+
+    def fromstring(self, content: bytes) -> object:
+        '''get the root element of a document already read into memory'''
+        return self.parse(io.BytesIO(content))
+    # end def fromstring:
+# end class LimitedBackend:
+
+
+def limited_backend(backend: object, limits: FileLimits) -> object:
+    '''wrap a backend with the limits, when there are any'''
+    if limits is None or not limits.is_active():
+        return backend
+    return LimitedBackend(backend, limits)
+# end def limited_backend:
+
+# variables
+#   cSpell:words fstat
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+an ordered stack of Fritzing parts libraries, processed as a single library
+
+Fritzing finds parts and images across the core parts library and the user parts
+folder. A LibraryStack does the same for any number of libraries, listed from the
+highest to the lowest precedence:
+
+* a moduleId resolves to the part in the first library that has it. The same
+  moduleId in a later library is shadowed, and that part file is never used
+* a view image reference resolves in the library of the part first (own source
+  folder, then the other source folders), then in the other libraries in order
+
+The svg image inventory for every library is built once, with a single scan of the
+view folders, and every library shares the same moduleId cache file.
+'''
+
+# pipenv shell
+# pipenv run pylint library_layers.py
+
+# standard library imports
+import os
+from typing import Dict, List, Set, Tuple
+
+# local application/library specific imports
+from part_bins import ModuleIdIndex
+
+LIBRARY_LAYERS_VERSION = '0.0.1'
+IMAGE_FOLDER = 'svg'
+IMAGE_FILE_TYPE = ('.svg')
+
+
+class LibraryStack:
+    '''merged part and image lookup over an ordered list of parts libraries'''
+    SOURCE_PREFERENCE = ModuleIdIndex.SOURCE_PREFERENCE
+    OBSOLETE_FOLDER = ModuleIdIndex.OBSOLETE_FOLDER
+
+    def __init__(self, library_paths: List[str], module_cache: str = None,
+                 backend: object = None):
+        self.layers = [os.path.abspath(path) for path in library_paths]
+        self.module_indexes = [ModuleIdIndex(path, module_cache, backend)
+                               for path in self.layers]
+        self.backend = self.module_indexes[0].backend
+        self.images = None
+    # end def __init__:
+
+    def layer_index(self, file_path: str) -> int:
+        '''get the position in the stack of the library that contains a file, or None'''
+        full_path = os.path.abspath(file_path)
+        for index, layer in enumerate(self.layers):
+            if full_path.startswith(layer + os.sep):
+                return index
+        return None
+    # end def layer_index:
+
+    def layer_root(self, file_path: str) -> str:
+        '''get the root folder of the library that contains a file'''
+        index = self.layer_index(file_path)
+        return self.layers[0 if index is None else index]
+    # end def layer_root:
+
+    def build_image_inventory(self) -> None:
+        '''collect every view image in every library: {view/name: [(layer, source, path)]}'''
+        self.images = {}
+        for index, layer in enumerate(self.layers):
+            image_root = os.path.join(layer, IMAGE_FOLDER)
+            if not os.path.isdir(image_root):
+                continue
+            with os.scandir(image_root) as sources:
+                source_folders = sorted(entry.name for entry in sources if entry.is_dir())
+            for source in source_folders:
+                with os.scandir(os.path.join(image_root, source)) as views:
+                    view_folders = sorted((entry for entry in views if entry.is_dir()),
+                                          key=lambda entry: entry.name)
+                for view_folder in view_folders:
+                    with os.scandir(view_folder.path) as view_images:
+                        for image in view_images:
+                            if image.name.endswith(IMAGE_FILE_TYPE):
+                                self.images.setdefault(
+                                    view_folder.name + '/' + image.name, []).append(
+                                        (index, source, image.path))
+    # end def build_image_inventory:
+
+    def source_rank(self, source: str) -> int:
+        '''get the search position of a source folder inside a library'''
+        if source in self.SOURCE_PREFERENCE:
+            return self.SOURCE_PREFERENCE.index(source)
+        return len(self.SOURCE_PREFERENCE)
+    # end def source_rank:
+
+    def image_paths(self, part_path: str, image_path: str) -> List[str]:
+        '''get the existing files for a part view image, in resolution order
+
+        When the image is not in any library, the path where it is expected (in the
+        part own library and source folder) is the only entry'''
+        if self.images is None:
+            self.build_image_inventory()
+        own_layer = self.layer_index(part_path)
+        own_source = os.path.basename(os.path.dirname(os.path.abspath(part_path)))
+        candidates = sorted(
+            self.images.get(image_path, ()),
+            key=lambda image: (image[0] != own_layer, image[0], image[1] != own_source,
+                               self.source_rank(image[1])))
+        if candidates:
+            return [path for _index, _source, path in candidates]
+        return [os.path.join(self.layer_root(part_path), IMAGE_FOLDER, own_source, image_path)]
+    # end def image_paths:
+
+    def lookup(self, module_id: str) -> Tuple[str, str]:
+        '''get the (source folder, file name) for a moduleId, or None when not found'''
+        for module_index in self.module_indexes:
+            location = module_index.lookup(module_id)
+            if location is not None:
+                return location
+        return None
+    # end def lookup:
+
+    def part_path(self, module_id: str) -> str:
+        '''get the full path to the part definition file for a moduleId'''
+        for module_index in self.module_indexes:
+            full_path = module_index.part_path(module_id)
+            if full_path is not None:
+                return full_path
+        return None
+    # end def part_path:
+
+    def shadowed_parts(self) -> Dict[str, List[str]]:
+        '''get {moduleId: [part paths]} for every moduleId in more than one library, with
+        the part that is used first'''
+        locations = {}
+        for module_index in self.module_indexes:
+            if module_index.index is None:
+                module_index.build_index()
+            for module_id in module_index.index:
+                locations.setdefault(module_id, []).append(module_index.part_path(module_id))
+        return {module_id: paths for module_id, paths in locations.items() if len(paths) > 1}
+    # end def shadowed_parts:
+
+    def hidden_part_paths(self) -> Set[str]:
+        '''get the (absolute) paths of the part files that are shadowed by a part with the
+        same moduleId in an earlier library, so are never used'''
+        return {os.path.abspath(path) for paths in self.shadowed_parts().values()
+                for path in paths[1:]}
+    # end def hidden_part_paths:
+
+    def shadowed_images(self) -> Dict[str, List[str]]:
+        '''get {view/name: [image paths]} for every image in more than one library, in
+        library order'''
+        if self.images is None:
+            self.build_image_inventory()
+        shadowed = {}
+        for image_path, images in self.images.items():
+            if len({index for index, _source, _path in images}) > 1:
+                shadowed[image_path] = [
+                    path for _index, _source, path in sorted(
+                        images, key=lambda image: (image[0], self.source_rank(image[1])))]
+        return shadowed
+    # end def shadowed_images:
+
+    def report(self) -> None:
+        '''show the parts and images that are hidden by the same item in a library earlier
+        in the stack'''
+        for label, shadowed in (('parts', self.shadowed_parts()),
+                                ('images', self.shadowed_images())):
+            print('{0} shadowed {1} across {2} libraries'.format(
+                len(shadowed), label, len(self.layers)))
+            for key, paths in sorted(shadowed.items()):
+                print('  {0}: {1}'.format(key, paths[0]))
+                print('    shadows ' + '\n    shadows '.join(paths[1:]))
+    # end def report:
+# end class LibraryStack:
+
+# variables
+#   cSpell:words
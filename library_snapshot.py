@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+save the parsed model of every part in a library to a single snapshot file
+
+The snapshot holds the properties, views (image paths and layers), connectors, buses
+and lint findings for each part, so cross part analysis tools can load the whole
+library without parsing thousands of xml files again.
+
+file layout: magic, header length, marshalled header, marshalled part models
+
+Each part model keeps the modification time and size of the part file (and of the
+view images it was checked against). Refreshing a snapshot only parses the parts
+where any of those have changed, and the whole snapshot is rebuilt when the format,
+the Python (and marshal) version, or the processing options in the header do not
+match. marshal data is only guaranteed to load in the Python version that wrote it.
+'''
+
+# pipenv shell
+# pipenv run pylint library_snapshot.py
+
+# standard library imports
+import os
+import sys
+import mmap
+import time
+import struct
+import marshal
+import argparse
+from typing import Dict, List, Tuple
+
+# local application/library specific imports
+from myutilities import ExistingDir, write_atomically
+from yield_parts import PartFinder
+from parse_fzp import FritzingPartDefinition
+from parse_svg import SvgIdIndex
+from xml_backend import select_backend, check_backend_choice, BACKEND_CHOICES
+from part_model import PartModel, snapshot_models
+
+LIBRARY_SNAPSHOT_VERSION = '0.0.1'
+SNAPSHOT_MAGIC = b'FZLSNAP\x00'
+SNAPSHOT_FORMAT = 1
+# the header entries that must match for a snapshot to be read at all
+SNAPSHOT_RUNTIME = {
+    'format': SNAPSHOT_FORMAT,
+    'python': tuple(sys.version_info[:2]),
+    'marshal': marshal.version
+}
+HEADER_LENGTH = struct.Struct('<I')
+MISSING_STAMP = (-1, -1)
+
+
+def file_stamp(file_path: str) -> Tuple[int, int]:
+    '''get the (modification time, size) of a file, used to detect changes'''
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
+        return MISSING_STAMP
+    return file_stat.st_mtime_ns, file_stat.st_size
+# end def file_stamp:
+
+
+def read_snapshot(snapshot_path: str) -> Tuple[dict, Dict[str, dict]]:
+    '''get the header and part models from a snapshot file
+
+    The file is memory mapped, so the models are unmarshalled straight from the page
+    cache. Returns (None, {}) for a missing, empty or truncated file, or one in an
+    unknown format or from a different Python version'''
+    try:
+        snapshot_file = open(snapshot_path, 'rb')
+    except FileNotFoundError:
+        return None, {}
+    with snapshot_file:
+        if os.fstat(snapshot_file.fileno()).st_size == 0:
+            return None, {} # an empty file can not be memory mapped
+        with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as image:
+            return read_snapshot_image(image)
+# end def read_snapshot:
+
+
+def read_snapshot_image(image: mmap.mmap) -> Tuple[dict, Dict[str, dict]]:
+    '''get the header and part models from the memory mapped snapshot file'''
+    prefix_end = len(SNAPSHOT_MAGIC) + HEADER_LENGTH.size
+    if len(image) < prefix_end or image[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        return None, {}
+    header_length, = HEADER_LENGTH.unpack(image[len(SNAPSHOT_MAGIC):prefix_end])
+    with memoryview(image) as view:
+        try:
+            header = marshal.loads(view[prefix_end:prefix_end + header_length])
+            if not isinstance(header, dict) or any(
+                    header.get(key) != value for key, value in SNAPSHOT_RUNTIME.items()):
+                return None, {}
+            models = marshal.loads(view[prefix_end + header_length:])
+        except (EOFError, ValueError, TypeError): # truncated or damaged
+            return None, {}
+    return header, models
+# end def read_snapshot_image:
+
+
+def load_snapshot(snapshot_path: str) -> Dict[str, dict]:
+    '''get the part models, by library relative path, for analysis tools'''
+    return read_snapshot(snapshot_path)[1]
+# end def load_snapshot:
+
+
+def load_part_models(snapshot_path: str) -> List[PartModel]:
+    '''get the compact part models for a whole library, for analysis tools that keep
+    every part in memory'''
+    return list(snapshot_models(load_snapshot(snapshot_path)))
+# end def load_part_models:
+
+
+class LibrarySnapshot:
+    '''build or refresh the snapshot for a parts library'''
+    def __init__(self, cmd_args: argparse.Namespace):
+        self.command_arguments = cmd_args
+        self.library = os.path.abspath(cmd_args.library)
+        self.header = {
+            **SNAPSHOT_RUNTIME,
+            'library': self.library,
+            'process_svg': cmd_args.svg
+        }
+        xml_backend = select_backend(cmd_args.xml_backend)
+        self.part_parse_options = {
+            'exceptions': True,
+            'process_svg': cmd_args.svg,
+            'verbose': 0,
+            'dtd': 'FritzingPart.dtd',
+            'xml_backend': xml_backend,
+            'svg_index': SvgIdIndex(backend=xml_backend),
+            'quiet': True
+        }
+        self.models = {}
+        self.statistics = {'reused': 0, 'parsed': 0, 'removed': 0}
+    # end def __init__:
+
+    def part_files(self) -> List[os.DirEntry]:
+        '''get the (selected) part definition files in the library'''
+        args = argparse.Namespace()
+        args.folder = None
+        args.part_library = self.library
+        args.svg = False
+        args.pattern = self.command_arguments.pattern
+        return list(PartFinder(args).filtered_files())
+    # end def part_files:
+
+    def refresh(self) -> None:
+        '''reuse the unchanged models from the existing snapshot, and parse the rest'''
+        header, old_models = read_snapshot(self.command_arguments.snapshot)
+        if header is None or any(header.get(key) != value for key, value in self.header.items()):
+            old_models = {}
+        for part_file in self.part_files():
+            relative_path = os.path.relpath(part_file.path, self.library)
+            model = old_models.pop(relative_path, None)
+            if model is None or not self.is_current(model):
+                model = self.parse_part(part_file)
+                self.statistics['parsed'] += 1
+            else:
+                self.statistics['reused'] += 1
+            self.models[relative_path] = model
+        self.statistics['removed'] = len(old_models)
+    # end def refresh:
+
+    @staticmethod
+    def is_current(model: dict) -> bool:
+        '''check if every file a part model was built from is unchanged'''
+        return all(tuple(stamp) == file_stamp(file_path)
+                   for file_path, stamp in model['stamps'].items())
+    # end def is_current:
+
+    def parse_part(self, part_file: os.DirEntry) -> dict:
+        '''build the model for a single part definition file'''
+        stamps = {part_file.path: file_stamp(part_file.path)}
+        try:
+            part = FritzingPartDefinition(part_file, self.part_parse_options)
+        except Exception as exc: # pylint: disable=broad-except
+            # not parsable, or a structure the checks do not handle (yet)
+            return {'stamps': stamps, 'error': type(exc).__name__ + ': ' + str(exc)}
+        if self.command_arguments.svg:
+            for details in part.data_set['part_views'].values():
+                if details.get('image') is None:
+                    continue # a view without layers, or an image
+                for image_path in part.view_image_paths(details['image']):
+                    stamps[image_path] = file_stamp(image_path)
+                    if stamps[image_path] != MISSING_STAMP:
+                        break
+        return {
+            'stamps': stamps,
+            'error': None,
+            'module_id': part.data_set['module_id'],
+            'properties': part.data_set['properties'],
+            'views': part.data_set['part_views'],
+            'connectors': part.data_set['connectors'],
+            'buses': part.data_set['buses'],
+            'findings': part.exceptions
+        }
+    # end def parse_part:
+
+    def save(self) -> None:
+        '''write the snapshot file'''
+        self.header['created'] = time.time()
+        header_bytes = marshal.dumps(self.header)
+        write_atomically(
+            self.command_arguments.snapshot,
+            SNAPSHOT_MAGIC + HEADER_LENGTH.pack(len(header_bytes)) + header_bytes +
+            marshal.dumps(self.models))
+    # end def save:
+# end class LibrarySnapshot:
+
+
+class CommandLineParser:
+    '''handle command line argument parsing'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.parser = CommandLineParser.build_parser()
+        self.command_arguments = self.parser.parse_args()
+
+    @staticmethod
+    def build_parser() -> argparse.ArgumentParser:
+        '''create command line argument parser'''
+        parser = argparse.ArgumentParser(description='Fritzing parts library snapshot')
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + LIBRARY_SNAPSHOT_VERSION)
+        parser.add_argument('library', metavar='Part Library', action=ExistingDir,
+                            help='path to top folder for Fritzing Parts library')
+        parser.add_argument('snapshot', metavar='Snapshot',
+                            help='snapshot file to create or refresh')
+        parser.add_argument('-p', '--pattern', action='append', metavar='pattern',
+                            help='only include files matching the wild card pattern')
+        parser.add_argument('-s', '--svg', action='store_true',
+                            help='include the connector svgId checks in the findings')
+        parser.add_argument('--xml-backend', choices=BACKEND_CHOICES, default='auto',
+                            help='xml parser to use for parts that need to be parsed')
+        return parser
+    # end def build_parser:
+# end class CommandLineParser:
+
+
+def my_main() -> None:
+    '''wrapper for test/start code so that variables do not look like constants'''
+    cli_parser = CommandLineParser()
+    check_backend_choice(cli_parser.parser, cli_parser.command_arguments.xml_backend)
+    snapshot = LibrarySnapshot(cli_parser.command_arguments)
+    snapshot.refresh()
+    snapshot.save()
+    print('{0} parts: {reused} reused, {parsed} parsed, {removed} removed'.format(
+        len(snapshot.models), **snapshot.statistics))
+    start = time.perf_counter()
+    load_snapshot(cli_parser.command_arguments.snapshot)
+    print('snapshot loads in {0:.3f}s'.format(time.perf_counter() - start))
+# end def my_main:
+
+# Standalone module execution
+if __name__ == "__main__":
+    my_main()
+
+# variables
+#   cSpell:words FZLSNAP unmarshalled mmap
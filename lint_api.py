@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+side effect free, in process, lint interface
+
+    result = lint_part(path_bytes_or_tree, options)
+
+lint_part never prints, and never raises for a bad part definition. Everything is
+returned in an immutable LintResult: the findings, the extracted metadata (moduleId,
+family, properties, views and connector ids), and an error string for a document
+that could not be parsed, or that hit a case the lint does not handle yet.
+'''
+
+# pipenv shell
+# pipenv run pylint lint_api.py
+
+# standard library imports
+import os
+from typing import NamedTuple, Optional, Tuple
+
+# local application/library specific imports
+from yield_parts import PseudoDirEntry
+from parse_fzp import FritzingPartDefinition
+from xml_backend import select_backend
+from file_limits import limited_backend
+
+LINT_API_VERSION = '0.0.1'
+SEVERITIES = ('information', 'warning', 'error')
+
+
+class LintFinding(NamedTuple):
+    '''a single lint finding'''
+    severity: str
+    key: str
+    msg: str
+    value: object
+    context: tuple
+# end class LintFinding:
+
+
+class LintView(NamedTuple):
+    '''the image and layers for one view of the part'''
+    view: str
+    image: str
+    layers: Tuple[str, ...]
+# end class LintView:
+
+
+class LintResult(NamedTuple):
+    '''everything found out about a single part definition'''
+    source: str
+    error: Optional[str]
+    module_id: Optional[str]
+    family: Optional[str]
+    properties: Tuple[Tuple[str, str], ...]
+    views: Tuple[LintView, ...]
+    connector_ids: Tuple[str, ...]
+    findings: Tuple[LintFinding, ...]
+    suppressed: int
+
+    def by_severity(self, severity: str) -> Tuple[LintFinding, ...]:
+        '''get the findings with a single severity'''
+        return tuple(finding for finding in self.findings if finding.severity == severity)
+# end class LintResult:
+
+
+def is_element_tree(source) -> bool:
+    '''check if a lint source is an already parsed document (tree or root element)'''
+    return hasattr(source, 'getroot') or (hasattr(source, 'tag') and hasattr(source, 'attrib'))
+# end def is_element_tree:
+
+
+def part_options(options: dict) -> dict:
+    '''fill in the FritzingPartDefinition options for a library call'''
+    xml_backend = options.get('xml_backend')
+    if xml_backend is None or isinstance(xml_backend, str):
+        xml_backend = select_backend(xml_backend or 'auto')
+    xml_backend = limited_backend(xml_backend, options.get('limits'))
+    return {
+        'exceptions': True,
+        'process_svg': options.get('process_svg', False),
+        'verbose': 0,
+        'dtd': options.get('dtd', 'FritzingPart.dtd'),
+        'xml_backend': xml_backend,
+        'svg_index': options.get('svg_index'),
+        'baseline': options.get('baseline'),
+        'rules': options.get('rules'),
+        'quiet': True
+    }
+# end def part_options:
+
+
+def error_result(name: str, error: str) -> LintResult:
+    '''build the result for a part that could not be processed'''
+    return LintResult(name, error, None, None, (), (), (), (), 0)
+# end def error_result:
+
+
+def lint_part(source, options: dict = None, name: str = None) -> LintResult:
+    '''lint a single part definition from a path, bytes, or a parsed tree (or root element)
+
+    options (all optional): rules (frozenset), process_svg, xml_backend (name or backend),
+    limits (FileLimits), svg_index, baseline, dtd. «name» is the part path used in the
+    result, the svg image search and the baseline fingerprints, for bytes and tree sources.'''
+    options = part_options(options or {})
+    content = root = None
+    if isinstance(source, (bytes, bytearray)):
+        content = bytes(source)
+        name = name or '<bytes>'
+    elif is_element_tree(source):
+        root = source.getroot() if hasattr(source, 'getroot') else source
+        name = name or '<tree>'
+    else:
+        name = name or os.fspath(source)
+        try:
+            with open(source, 'rb') as source_file:
+                content = source_file.read()
+        except OSError as exc:
+            return error_result(name, type(exc).__name__ + ': ' + str(exc))
+    try:
+        part = FritzingPartDefinition(
+            PseudoDirEntry(os.path.basename(name), name), options, content, root)
+    except Exception as exc: # pylint: disable=broad-except
+        # not parsable, or a structure the checks do not handle (yet)
+        return error_result(name, type(exc).__name__ + ': ' + str(exc))
+    data_set = part.data_set
+    return LintResult(
+        source=name,
+        error=None,
+        module_id=data_set['module_id'],
+        family=data_set['properties'].get('family'),
+        properties=tuple(data_set['properties'].items()),
+        views=tuple(LintView(view, details.get('image'), tuple(details.get('layers', ())))
+                    for view, details in data_set['part_views'].items()),
+        connector_ids=tuple(data_set['connectors']),
+        findings=tuple(
+            LintFinding(severity, finding['key'], finding['msg'], finding['value'],
+                        tuple(finding['context']))
+            for severity in SEVERITIES for finding in part.exceptions[severity]),
+        suppressed=len(data_set['suppressed']))
+# end def lint_part:
+
+# variables
+#   cSpell:words
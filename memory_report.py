@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+track memory use by processing phase, with an optional memory budget
+
+Each phase (walk, parse, stages, svg, report) is wrapped in a context manager, that
+records the elapsed time, the peak resident set size, and (when tracemalloc is
+running) the current and peak traced memory. A tracemalloc snapshot is kept for
+each phase whenever the traced memory reaches a new high (by at least 10%), so the
+report can show the top allocation sites where each phase used the most memory.
+
+With a budget, the peak RSS (or traced memory, where RSS is not available) is
+checked at the end of every phase, and the run stops with the report as soon as the
+budget is exceeded, instead of being killed by the system later.
+'''
+
+# pipenv shell
+# pipenv run pylint memory_report.py
+
+# standard library imports
+import re
+import sys
+import time
+import argparse
+import contextlib
+import tracemalloc
+from typing import Iterator
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+MEMORY_REPORT_VERSION = '0.0.1'
+SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+SNAPSHOT_GROWTH = 1.1
+
+
+def memory_size(source: str) -> int:
+    '''get a byte count from a size like «800M» or «2G», for argparse'''
+    size_match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*', source, re.IGNORECASE)
+    if size_match is None:
+        raise argparse.ArgumentTypeError('"{0}" is not a memory size'.format(source))
+    return int(float(size_match.group(1)) * SIZE_UNITS[size_match.group(2).upper()])
+# end def memory_size:
+
+
+def peak_rss() -> int:
+    '''get the peak resident set size of the process in bytes, or None'''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # linux reports KiB
+# end def peak_rss:
+
+
+def format_size(size: int) -> str:
+    '''show a byte count in MiB'''
+    return '-' if size is None else '{0:.1f}MiB'.format(size / (1 << 20))
+# end def format_size:
+
+
+class MemoryBudgetExceeded(MemoryError):
+    '''the run used more memory than the budget allows'''
+# end class MemoryBudgetExceeded:
+
+
+class MemoryTracker:
+    '''collect the memory use for each processing phase'''
+    def __init__(self, trace: bool = True, budget: int = None, top: int = 10):
+        self.budget = budget
+        self.top = top
+        self.phases = {}
+        self.active = []
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+    # end def __init__:
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        '''record the memory use while the body runs'''
+        details = self.phases.setdefault(name, {
+            'count': 0, 'seconds': 0.0, 'traced': 0, 'traced_peak': 0, 'rss_peak': 0,
+            'snapshot': None, 'snapshot_traced': 0})
+        start = time.perf_counter()
+        self.active.append(name)
+        try:
+            yield
+        finally:
+            self.active.pop()
+            details['count'] += 1
+            details['seconds'] += time.perf_counter() - start
+            self.record(details)
+        self.check_budget(name)
+    # end def phase:
+
+    def record(self, details: dict) -> None:
+        '''save the memory use at the end of a phase'''
+        details['rss_peak'] = max(details['rss_peak'], peak_rss() or 0)
+        if not tracemalloc.is_tracing():
+            return
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        details['traced'] = max(details['traced'], traced)
+        details['traced_peak'] = max(details['traced_peak'], traced_peak)
+        if traced > details['snapshot_traced'] * SNAPSHOT_GROWTH:
+            details['snapshot'] = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__)))
+            details['snapshot_traced'] = traced
+    # end def record:
+
+    def used(self) -> int:
+        '''get the memory compared to the budget: peak RSS when available'''
+        rss = peak_rss()
+        if rss is not None:
+            return rss
+        return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+    # end def used:
+
+    def check_budget(self, phase_name: str) -> None:
+        '''stop with the report when the memory budget is exceeded'''
+        if self.budget is None or self.active:
+            return # only check at the end of the outermost phase
+        used = self.used()
+        if used > self.budget:
+            self.report()
+            raise MemoryBudgetExceeded('memory budget of {0} exceeded during {1}: {2}'.format(
+                format_size(self.budget), phase_name, format_size(used)))
+    # end def check_budget:
+
+    def report(self) -> None:
+        '''show the memory use for every phase, with the top allocation sites'''
+        print('memory by phase: peak rss {0}'.format(format_size(peak_rss())))
+        print('{0:>10} {1:>8} {2:>9} {3:>12} {4:>12} {5:>12}'.format(
+            'phase', 'count', 'seconds', 'traced', 'traced peak', 'rss peak'))
+        for name, details in self.phases.items():
+            print('{0:>10} {1:>8} {2:>9.3f} {3:>12} {4:>12} {5:>12}'.format(
+                name, details['count'], details['seconds'], format_size(details['traced']),
+                format_size(details['traced_peak']), format_size(details['rss_peak'])))
+        for name, details in self.phases.items():
+            if details['snapshot'] is None:
+                continue
+            print('top allocation sites for {0}, at {1} traced'.format(
+                name, format_size(details['snapshot_traced'])))
+            for statistic in details['snapshot'].statistics('lineno')[:self.top]:
+                frame = statistic.traceback[0]
+                print('  {0:>10} {1:>8} blocks  {2}:{3}'.format(
+                    format_size(statistic.size), statistic.count, frame.filename,
+                    frame.lineno))
+    # end def report:
+# end class MemoryTracker:
+
+
+def phase_context(tracker: MemoryTracker, name: str):
+    '''get the phase context manager for an optional tracker'''
+    if tracker is None:
+        return contextlib.nullcontext()
+    return tracker.phase(name)
+# end def phase_context:
+
+
+def tracked_iterator(source_iterable, tracker: MemoryTracker, name: str) -> Iterator:
+    '''pass through the items of an iterable, recording the memory use getting each one'''
+    source_iterator = iter(source_iterable)
+    while True:
+        with tracker.phase(name):
+            try:
+                item = next(source_iterator)
+            except StopIteration:
+                return
+        yield item
+# end def tracked_iterator:
+
+# variables
+#   cSpell:words tracemalloc darwin
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+collect count and lint run metrics, and write them for monitoring tools
+
+The metrics are written in the Prometheus text exposition format (for the node
+exporter textfile collector), and as JSON. Both files are written to a temporary
+file in the target folder, then renamed, so a collector never sees a partial file.
+'''
+
+# pipenv shell
+# pipenv run pylint metrics_export.py
+
+# standard library imports
+import json
+import time
+from typing import Dict, List, Tuple
+
+# local application/library specific imports
+from myutilities import write_atomically
+
+METRICS_EXPORT_VERSION = '0.0.1'
+METRIC_PREFIX = 'fritzing_'
+METRIC_HELP = {
+    'part_folder_files': ('gauge', 'files found in a part definition source folder, by kind'),
+    'image_folder_files': ('gauge', 'files found in an svg image folder, by view or kind'),
+    'lint_parts': ('gauge', 'part definition files processed by the lint run'),
+    'lint_findings': ('gauge', 'lint findings reported, by rule and severity'),
+    'run_duration_seconds': ('gauge', 'elapsed time for the run'),
+    'run_timestamp_seconds': ('gauge', 'unix time that the run finished')
+}
+
+
+def escape_label_value(value: str) -> str:
+    '''escape a label value for the Prometheus text format'''
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+# end def escape_label_value:
+
+
+class RunMetrics:
+    '''accumulate labelled metric values for a single count or lint run'''
+    def __init__(self, job: str):
+        self.job = job
+        self.start_time = time.perf_counter()
+        self.values = {}
+    # end def __init__:
+
+    def set_value(self, metric: str, value: float, **labels) -> None:
+        '''save the value for a metric with a set of labels'''
+        self.values.setdefault(metric, {})[tuple(sorted(labels.items()))] = value
+    # end def set_value:
+
+    def add_value(self, metric: str, value: float, **labels) -> None:
+        '''add to the value for a metric with a set of labels'''
+        label_key = tuple(sorted(labels.items()))
+        metric_values = self.values.setdefault(metric, {})
+        metric_values[label_key] = metric_values.get(label_key, 0) + value
+    # end def add_value:
+
+    def record_part_folder(self, part_set: str, source: str, counts: Dict[str, int]) -> None:
+        '''save the counts for a part definition source folder'''
+        for kind in ('parts', 'dirs', 'other', 'weird'):
+            self.set_value(
+                'part_folder_files', counts[kind], set=part_set, source=source, kind=kind)
+    # end def record_part_folder:
+
+    def record_image_folder(
+            self, part_set: str, source: str, view: str, counts: Dict[str, int]) -> None:
+        '''save the counts for an svg view image folder (or a source folder, with no view)'''
+        if view:
+            self.set_value(
+                'image_folder_files', counts[view], set=part_set, source=source, view=view,
+                kind='images')
+        for kind in ('dirs', 'other', 'weird'):
+            self.set_value(
+                'image_folder_files', counts[kind], set=part_set, source=source, view=view,
+                kind=kind)
+    # end def record_image_folder:
+
+    def record_known_rules(self, rules: Dict[str, dict]) -> None:
+        '''start every rule at zero findings, so a rule with no findings in a run still
+        has a series: {rule: {'severity': severity, …}}'''
+        self.add_value('lint_parts', 0)
+        for rule, rule_data in rules.items():
+            self.add_value('lint_findings', 0, rule=rule, severity=rule_data['severity'])
+    # end def record_known_rules:
+
+    def record_part_findings(self, exceptions: Dict[str, List[dict]]) -> None:
+        '''add the findings for a single linted part'''
+        self.add_value('lint_parts', 1)
+        for severity, findings in exceptions.items():
+            for finding in findings:
+                self.add_value('lint_findings', 1, rule=finding['key'], severity=severity)
+    # end def record_part_findings:
+
+    def finish(self) -> None:
+        '''save the run timing'''
+        self.set_value('run_duration_seconds', time.perf_counter() - self.start_time)
+        self.set_value('run_timestamp_seconds', time.time())
+    # end def finish:
+
+    def labelled_values(self, metric: str) -> List[Tuple[dict, float]]:
+        '''get the (labels, value) pairs for a metric, with the job label included'''
+        return [(dict((('job', self.job),) + label_key), value)
+                for label_key, value in sorted(self.values[metric].items())]
+    # end def labelled_values:
+
+    def prometheus_text(self) -> str:
+        '''format all of the metrics in the Prometheus text exposition format'''
+        lines = []
+        for metric in sorted(self.values):
+            metric_type, metric_help = METRIC_HELP[metric]
+            name = METRIC_PREFIX + metric
+            lines.append('# HELP {0} {1}'.format(name, metric_help))
+            lines.append('# TYPE {0} {1}'.format(name, metric_type))
+            for labels, value in self.labelled_values(metric):
+                label_text = ','.join('{0}="{1}"'.format(label, escape_label_value(text))
+                                      for label, text in labels.items())
+                lines.append('{0}{{{1}}} {2}'.format(name, label_text, value))
+        return '\n'.join(lines) + '\n'
+    # end def prometheus_text:
+
+    def json_text(self) -> str:
+        '''format all of the metrics as a JSON document'''
+        return json.dumps({
+            'version': METRICS_EXPORT_VERSION,
+            'job': self.job,
+            'metrics': {
+                METRIC_PREFIX + metric: [
+                    {'labels': labels, 'value': value}
+                    for labels, value in self.labelled_values(metric)]
+                for metric in sorted(self.values)}
+        }, indent=1) + '\n'
+    # end def json_text:
+
+    def write(self, prometheus_path: str = None, json_path: str = None) -> None:
+        '''finish the run, and write the metrics to the requested files'''
+        self.finish()
+        if prometheus_path is not None:
+            write_atomically(prometheus_path, self.prometheus_text())
+        if json_path is not None:
+            write_atomically(json_path, self.json_text())
+    # end def write:
+# end class RunMetrics:
+
+# variables
+#   cSpell:words textfile
@@ -9,8 +9,10 @@ Utility methods collection
 # pipenv run pylint myutilities.py
 
 import contextlib
+import os
 import sys
 import argparse
+import tempfile
 from pathlib import Path, PosixPath
 import stat
 import errno
@@ -29,6 +31,34 @@ def smart_filehandle(filehandle):
             filehandle.close()
 # end def smart_filehandle()
 
+def write_atomically(target_path: str, content) -> None:
+    '''replace the content (str or bytes) of a file, without ever exposing a partially
+    written file
+
+    A symbolic link is followed, so the file it points to is replaced, not the link. The
+    file keeps its permissions; a new file is created with mode 0o644'''
+    target_path = os.path.realpath(target_path)
+    try:
+        target_mode = stat.S_IMODE(os.stat(target_path).st_mode)
+    except FileNotFoundError:
+        target_mode = 0o644
+    target_folder = os.path.dirname(target_path)
+    file_handle, temporary_path = tempfile.mkstemp(
+        dir=target_folder, prefix='.' + os.path.basename(target_path), suffix='.tmp')
+    try:
+        if isinstance(content, bytes):
+            temporary_file = os.fdopen(file_handle, 'wb')
+        else:
+            temporary_file = os.fdopen(file_handle, 'w', encoding='UTF-8')
+        with temporary_file:
+            temporary_file.write(content)
+        os.chmod(temporary_path, target_mode)
+        os.replace(temporary_path, target_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+# end def write_atomically:
+
 def stat_following_link(src_path: str, action_object: argparse.Action) -> stat:
     '''follow through any link to get stat for real file'''
     if not isinstance(src_path, str) or not src_path:
@@ -87,6 +117,9 @@ class ExistingDir(argparse.Action):
     # pylint: disable=too-few-public-methods
     def __call__(self, parser, namespace, src_path, option_string=None):
         '''verify that the path references an existing folder'''
+        if src_path is None and self.nargs == argparse.OPTIONAL:
+            setattr(namespace, self.dest, src_path) # optional positional not given
+            return
         leaf_stat = stat_following_link(src_path, self)
         if not stat.S_ISDIR(leaf_stat.st_mode):
             msg = "%r is not a directory" % src_path
@@ -96,10 +129,28 @@ class ExistingDir(argparse.Action):
 # end class ExistingDir:
 
 
+class ExistingDirList(argparse.Action):
+    '''verify passed argument is a path to an existing directory, collecting a list for a
+    repeated option'''
+    # pylint: disable=too-few-public-methods
+    def __call__(self, parser, namespace, src_path, option_string=None):
+        '''verify that the path references an existing folder, then add it to the list'''
+        leaf_stat = stat_following_link(src_path, self)
+        if not stat.S_ISDIR(leaf_stat.st_mode):
+            msg = "%r is not a directory" % src_path
+            raise argparse.ArgumentError(self, msg)
+        setattr(namespace, self.dest, (getattr(namespace, self.dest, None) or []) + [src_path])
+    # end def __call__:
+# end class ExistingDirList:
+
+
 class ReadableFile(argparse.Action):
     '''verify passed argument is a path to an existing readable normal file'''
     # pylint: disable=too-few-public-methods
     def __call__(self, parser, namespace, src_path, option_string=None):
+        if src_path is None and self.nargs == argparse.OPTIONAL:
+            setattr(namespace, self.dest, src_path) # optional positional not given
+            return
         leaf_stat = stat_following_link(src_path, self)
         if not stat.S_ISREG(leaf_stat.st_mode):
             msg = "%r is not a regular file" % src_path
@@ -11,17 +11,38 @@ xml parsing
 # pipenv run pylint parse_fzp.py
 
 # standard library imports
-from typing import Dict
+from typing import Dict, List, Tuple
+import io
+import os
 import subprocess
 import re
+import sys
 import argparse
-import defusedxml.ElementTree as ET
+from itertools import chain
 
 # local application/library specific imports
-from myutilities import ReadableFile
-from yield_parts import PartFinder
+from myutilities import ReadableFile, ExistingDirList
+from yield_parts import PartFinder, PseudoDirEntry, LinkWalker, read_ahead
+from library_layers import LibraryStack
+from parse_svg import SvgIdIndex
+from xml_backend import select_backend, check_backend_choice, BACKEND_CHOICES
+from metrics_export import RunMetrics
+from duplicate_parts import DuplicateFinder
+from baseline import Baseline, finding_fingerprint
+from family_checks import FamilyChecker
+from result_store import ResultStore
+from part_sample import StratifiedSample, PrevalenceReport, sample_size
+from part_scheduler import scheduled_map, entry_size
+from progress import ProgressReporter, PROGRESS_CHOICES
+from count_parts import PartCounter
+from part_fixes import FIXABLE_RULES, fix_parts, report_fixes
+from file_limits import FileLimits, LimitExceeded, limited_backend
+from memory_report import MemoryTracker, MemoryBudgetExceeded, memory_size, phase_context, \
+    tracked_iterator
 
 PARSE_FZP_VERSION = '0.0.1'
+# the part parse options for the parts linted in a worker process
+LINT_WORKER = {}
 
 def is_trimmed_string(source: str) -> bool:
     '''check if string has any leading, trailing whitespace, or embedded newline'''
@@ -37,6 +58,109 @@ def is_trimmed_string(source: str) -> bool:
 # end def is_trimmed_string:
 
 
+def rule_names(source: str) -> List[str]:
+    '''get the lint rule (exception key) names from a comma separated list'''
+    names = [name.strip() for name in source.split(',') if name.strip()]
+    for name in names:
+        if name not in FritzingPartDefinition.EXCEPTION_DATA:
+            raise argparse.ArgumentTypeError('unknown rule "{0}"'.format(name))
+    return names
+# end def rule_names:
+
+
+def part_parse_options(cmd_args: argparse.Namespace, xml_backend: object,
+                       memory: MemoryTracker = None, library_stack: LibraryStack = None) -> dict:
+    '''get the FritzingPartDefinition options from the command line arguments'''
+    return {
+        'exceptions': cmd_args.exceptions,
+        'process_svg': cmd_args.svg,
+        'verbose': cmd_args.verbose,
+        'dtd': 'FritzingPart.dtd', # hard-coded for now
+        'xml_backend': xml_backend,
+        # shared by all parts, so each image is parsed once
+        'svg_index': SvgIdIndex(backend=xml_backend),
+        'baseline': Baseline(cmd_args.baseline) if cmd_args.baseline else None,
+        'rules': FritzingPartDefinition.select_rules(cmd_args.rules, cmd_args.skip_rules),
+        # duplicate detection needs the whole tree, even when the rules do not
+        'complete_tree': cmd_args.duplicates,
+        'keep_tree': cmd_args.duplicates,
+        'memory': memory,
+        'library_stack': library_stack,
+        # family checks need the properties, whatever rules are selected
+        'extra_stages': ('properties',) if cmd_args.families else ()
+    }
+# end def part_parse_options:
+
+
+def command_backend(cmd_args: argparse.Namespace) -> object:
+    '''get the xml backend (with any file limits) from the command line arguments'''
+    return limited_backend(
+        select_backend(cmd_args.xml_backend), FileLimits.from_arguments(cmd_args))
+# end def command_backend:
+
+
+def init_lint_worker(cmd_args: argparse.Namespace) -> None:
+    '''set up the part parse options in a worker process
+
+    Backends and caches can not be shared between processes, so each worker builds
+    its own'''
+    xml_backend = command_backend(cmd_args)
+    library_stack = None
+    if cmd_args.library is not None and len(cmd_args.library) > 1:
+        library_stack = LibraryStack(cmd_args.library, cmd_args.module_cache, xml_backend)
+    LINT_WORKER['options'] = part_parse_options(cmd_args, xml_backend, None, library_stack)
+    # the details are shown by the main process, in the order of the results
+    LINT_WORKER['options']['defer_output'] = True
+# end def init_lint_worker:
+
+
+def lint_worker(part_path: str) -> 'LintedPart':
+    '''lint a single part in a worker process'''
+    return LintedPart(FritzingPartDefinition(
+        PseudoDirEntry(os.path.basename(part_path), part_path), LINT_WORKER['options']))
+# end def lint_worker:
+
+
+def expected_part_count(cmd_args: argparse.Namespace, part_files) -> int:
+    '''get the number of part files a run is expected to process, from a quick count of
+    the library part folders when the files are not already listed
+
+    None when the files are filtered (by pattern or bin), so can not be counted ahead'''
+    if isinstance(part_files, list):
+        return len(part_files)
+    if cmd_args.pattern or cmd_args.bins:
+        return None
+    return sum(PartCounter.count_library_part_files(library) for library in cmd_args.library)
+# end def expected_part_count:
+
+
+class LintedPart:
+    '''the (picklable) results of linting a part in a worker process
+
+    Has the FritzingPartDefinition attributes used after a part is linted, with the
+    duplicate digests in place of the tree'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self, definition: 'FritzingPartDefinition'):
+        self.exceptions = definition.exceptions
+        self.stages = definition.stages
+        self.output = definition.output
+        self.data_set = {key: definition.data_set[key] for key in (
+            'data_error_detected', 'properties', 'suppressed', 'module_id', 'load_error',
+            'layer')}
+        self.root = None
+        self.digests = None
+        if definition.root is not None:
+            self.digests = DuplicateFinder.digests(definition.root)
+    # end def __init__:
+
+    def show_output(self) -> None:
+        '''show the details the worker kept, as the serial run would have printed them'''
+        for details in self.output:
+            print(*details)
+    # end def show_output:
+# end class LintedPart:
+
+
 class ProcessParts:
     '''process a set/series of part definition files
 
@@ -51,35 +175,162 @@ class ProcessParts:
         # print('request part is {0}'.format(type(first_file))) # DEBUG
         # print('requested part file(s): {0}'.format(cmd_args.definition_file)) # DEBUG
         # print('cli args namespace: {0}'.format(cmd_args)) # DEBUG
-        part_parse_options = {
-            'exceptions': cmd_args.exceptions,
-            'process_svg': cmd_args.svg,
-            'verbose': cmd_args.verbose,
-            'dtd': 'FritzingPart.dtd' # hard-coded for now
-        }
+        xml_backend = command_backend(cmd_args)
+        memory = None
+        if cmd_args.memory_report or cmd_args.max_memory is not None:
+            memory = MemoryTracker(trace=cmd_args.memory_report, budget=cmd_args.max_memory)
+        library_stack = None
+        if cmd_args.library is not None and len(cmd_args.library) > 1:
+            library_stack = LibraryStack(cmd_args.library, cmd_args.module_cache, xml_backend)
+        parse_options = part_parse_options(cmd_args, xml_backend, memory, library_stack)
         # _definition_instance = FritzingPartDefinition(first_file, part_parse_options)
 
         args = argparse.Namespace()
         args.folder = None
         args.svg = False
-        args.part_library = None
-        args.pattern = None
+        args.part_library = None # set for each library below
+        args.pattern = cmd_args.pattern
+        args.bins = cmd_args.bins
+        args.module_cache = cmd_args.module_cache
+        args.xml_backend = xml_backend
 
         # args.folder = './'
         # args.folder = '/home/phil/Documents/data_files/fritzing-parts/core/'
 
-        args.part_library = '/home/phil/Documents/data_files/fritzing-parts/'
-
-        for part_file in PartFinder(args).filtered_files():
+        args.follow_links = cmd_args.follow_links
+        part_finders = []
+        if library_stack is not None:
+            # one finder for each library, sharing the link walker and part index
+            args.link_walker = LinkWalker() if cmd_args.follow_links else None
+            args.module_index = library_stack
+            for library_path in library_stack.layers[:1] if cmd_args.bins \
+                    else library_stack.layers:
+                args.part_library = library_path
+                part_finders.append(PartFinder(args))
+            # only the part used for each moduleId is linted, not the ones it shadows
+            hidden_parts = library_stack.hidden_part_paths()
+            part_files = (part_file for part_file in chain.from_iterable(
+                part_finder.filtered_files() for part_finder in part_finders)
+                          if os.path.abspath(part_file.path) not in hidden_parts)
+        elif cmd_args.library is not None:
+            args.part_library = cmd_args.library[0]
+            part_finders.append(PartFinder(args))
+            part_files = part_finders[0].filtered_files()
+        else:
+            part_files = [PseudoDirEntry(
+                os.path.basename(cmd_args.definition_file), cmd_args.definition_file)]
+        prevalence = None
+        if cmd_args.sample is not None:
+            # only the directory entries are collected, then just the sample is read
+            sample = StratifiedSample(
+                cmd_args.sample, 0 if cmd_args.seed is None else cmd_args.seed)
+            part_files = sample.select(part_files)
+            prevalence = PrevalenceReport(sample)
+        progress = ProgressReporter(None, cmd_args.progress)
+        if progress.enabled:
+            progress.total = expected_part_count(cmd_args, part_files)
+        else:
+            progress = None
+        if memory is not None:
+            part_files = tracked_iterator(part_files, memory, 'walk')
+        if cmd_args.jobs > 1:
+            # largest files first, each worker reads its own files
+            linted_parts = scheduled_map(
+                lint_worker, part_files, cmd_args.jobs, init_lint_worker, (cmd_args,))
+        else:
+            if cmd_args.read_ahead > 0:
+                # read the upcoming files in the background while the current one is parsed
+                # a file over the size limit is not read, the parser reports it
+                part_sources = read_ahead(
+                    part_files, workers=cmd_args.read_ahead, inode_order=cmd_args.inode_order,
+                    max_bytes=cmd_args.max_file_size)
+            else:
+                part_sources = ((part_file, None) for part_file in part_files)
+            linted_parts = ((part_file, FritzingPartDefinition(
+                part_file, parse_options, part_content))
+                            for part_file, part_content in part_sources)
+        metrics = None
+        if cmd_args.metrics is not None or cmd_args.metrics_json is not None:
+            metrics = RunMetrics('parse_fzp')
+            metrics.record_known_rules(FritzingPartDefinition.EXCEPTION_DATA)
+        duplicates = DuplicateFinder() if cmd_args.duplicates else None
+        families = FamilyChecker() if cmd_args.families else None
+        new_baseline = Baseline() if cmd_args.write_baseline else None
+        store = None
+        if cmd_args.store is not None:
+            store = ResultStore(cmd_args.store, 'parse_fzp', os.pathsep.join(
+                os.path.abspath(library) for library in cmd_args.library or ()) or None,
+                                vars(cmd_args))
+        pending_fixes = {} if cmd_args.fix or cmd_args.dry_run else None
+        suppressed_count = 0
+        for part_file, definition_instance in linted_parts:
             # print(part_file.name) # DEBUG
             # print(part_file.path) # DEBUG
-            _definition_instance = FritzingPartDefinition(part_file, part_parse_options)
+            if isinstance(definition_instance, LintedPart):
+                definition_instance.show_output()
+            if metrics is not None:
+                metrics.record_part_findings(definition_instance.exceptions)
+            suppressed_count += len(definition_instance.data_set['suppressed'])
+            if new_baseline is not None:
+                for findings in definition_instance.exceptions.values():
+                    for finding in findings:
+                        new_baseline.add(part_file.path, finding,
+                                         definition_instance.data_set['layer'])
+                for finding in definition_instance.data_set['suppressed']:
+                    new_baseline.add(part_file.path, finding,
+                                     definition_instance.data_set['layer'])
+            if prevalence is not None:
+                prevalence.add(part_file.path, definition_instance.exceptions)
+            if store is not None:
+                store.add_part(part_file.path, definition_instance.data_set,
+                               definition_instance.exceptions,
+                               definition_instance.data_set['load_error'])
+            if pending_fixes is not None:
+                fixable = [finding for findings in definition_instance.exceptions.values()
+                           for finding in findings if finding['key'] in FIXABLE_RULES]
+                if fixable:
+                    pending_fixes[part_file.path] = fixable
+            if families is not None and 'properties' in definition_instance.stages:
+                families.add(part_file.path, definition_instance.data_set['properties'])
+            if duplicates is not None and definition_instance.root is not None:
+                # reuse the already loaded tree
+                duplicates.add(part_file.path, definition_instance.root)
+            elif duplicates is not None and getattr(definition_instance, 'digests', None):
+                duplicates.add_digests(part_file.path, *definition_instance.digests)
+            if progress is not None:
+                progress.add(entry_size(part_file), definition_instance.exceptions)
             # try:
             #     _definition_instance = FritzingPartDefinition(part_file, part_parse_options)
             # except NotImplemented as ni_exc:
             #     print(part_file.path, part_file.name)
             #     print(ni_exc)
             #     break
+        if progress is not None:
+            progress.finish()
+        with phase_context(memory, 'report'):
+            if part_finders and part_finders[0].criteria['walker'] is not None:
+                part_finders[0].criteria['walker'].report()
+            if library_stack is not None:
+                library_stack.report()
+            if prevalence is not None:
+                prevalence.report()
+            if duplicates is not None:
+                duplicates.report()
+            if families is not None:
+                families.report()
+            if pending_fixes is not None:
+                report_fixes(fix_parts(pending_fixes, cmd_args.fix_jobs, not cmd_args.dry_run),
+                             not cmd_args.dry_run)
+            if suppressed_count:
+                print('{0} findings suppressed by the baseline'.format(suppressed_count))
+            if new_baseline is not None:
+                new_baseline.write(cmd_args.write_baseline)
+            if metrics is not None:
+                metrics.write(cmd_args.metrics, cmd_args.metrics_json)
+            if store is not None:
+                store.finish()
+        if cmd_args.memory_report:
+            memory.report()
 
     # end def __init__:
 # end class ProcessParts:
@@ -114,68 +365,254 @@ class FritzingPartDefinition:
         'no_bb_view': {
             'severity' : 'warning', 'msg': 'part does not have a breadboard view'},
         'untrimmed_text': {
-            'severity' : 'error', 'msg': 'found unexpected surrounding whitespace for context'}
+            'severity' : 'error', 'msg': 'found unexpected surrounding whitespace for context'},
+        'no_connector_id': {
+            'severity' : 'error', 'msg': 'connector element without an id'},
+        'dup_connector_id': {
+            'severity' : 'error', 'msg': '2 connectors in module with the same id'},
+        'missing_connector_view': {
+            'severity' : 'warning', 'msg': 'connector has no graphic for a part view'},
+        'unknown_connector_view': {
+            'severity' : 'warning', 'msg': 'connector graphic for a view the part does not have'},
+        'bad_connector_layer': {
+            'severity' : 'error', 'msg': 'connector layer is not one of the part view layers'},
+        'dup_bus_id': {
+            'severity' : 'error', 'msg': '2 buses in module with the same id'},
+        'bad_bus_member': {
+            'severity' : 'error', 'msg': 'bus nodeMember does not reference a connector'},
+        'missing_view_image': {
+            'severity' : 'error', 'msg': 'view image file not found'},
+        'bad_view_image': {
+            'severity' : 'error', 'msg': 'view image file is not a usable svg document'},
+        'missing_svg_id': {
+            'severity' : 'error', 'msg': 'connector id not found in view image'},
+        'file_limit': {
+            'severity' : 'error', 'msg': 'file is over a processing limit, not checked'}
     }
+    # the rules that each processing stage can report, the stages that must run before
+    # it, and the module child elements it reads (None for every element)
+    STAGE_RULES = {
+        'module': ('not_child_element', 'dup_main_ele', 'dup_support_ele'),
+        'properties': ('not_child_element', 'untrimmed_text', 'null_family'),
+        'views': ('not_child_element', 'bad_layer4image', 'bad_icon_layer', 'bad_bb_layer',
+                  'redundant_attribute', 'bb_no_bb_path', 'multiple_layer', 'duplicate_layer',
+                  'no_bb_view'),
+        'connectors': ('not_child_element', 'no_connector_id', 'dup_connector_id',
+                       'missing_connector_view', 'unknown_connector_view',
+                       'bad_connector_layer'),
+        'buses': ('not_child_element', 'dup_bus_id', 'bad_bus_member'),
+        'svg_ids': ('missing_view_image', 'bad_view_image', 'missing_svg_id', 'file_limit')
+    }
+    STAGE_NEEDS = {
+        'module': (), 'properties': (), 'views': ('properties',), 'connectors': ('views',),
+        'buses': ('connectors',), 'svg_ids': ('views', 'connectors')
+    }
+    STAGE_ELEMENTS = {
+        'module': None, 'properties': ('properties',), 'views': ('views',),
+        'connectors': ('connectors',), 'buses': ('buses',), 'svg_ids': ()
+    }
+    # reported whatever rules are selected, since nothing else is checked for the file
+    UNSELECTABLE_RULES = ('file_limit',)
+    PART_SOURCE_FOLDERS = ('core', 'contrib', 'user', 'obsolete')
+    PART_VIEW_TAGS = ('breadboardView', 'iconView', 'pcbView', 'schematicView')
+    CONNECTOR_SVG_ID_ATTRIBUTES = ('svgId', 'terminalId', 'legId')
 
-    def __init__(self, part_file: str, options: dict):
+    def __init__(self, part_file: str, options: dict, content: bytes = None, root=None):
         self.root = None
+        self.output = []
         self.data_set = {
             'have_part_definition': False,
             'data_error_detected': False,
             'part_views': {},
             'properties': {},
+            'connectors': {},
+            'buses': {},
+            'suppressed': [],
+            'partial_tree': False,
+            'module_id': None,
+            'load_error': None,
+            'layer': 0,
             'file_path': part_file
         }
         self.options = {
             'exceptions': options['exceptions'],
             'process_svg': options['process_svg'],
             'verbosity': options['verbose'],
-            'dtd': options['dtd']
+            'dtd': options['dtd'],
+            'xml_backend': options.get('xml_backend'),
+            'svg_index': options.get('svg_index'),
+            'baseline': options.get('baseline'),
+            'rules': options.get('rules'),
+            'complete_tree': options.get('complete_tree', False),
+            'keep_tree': options.get('keep_tree', False),
+            'quiet': options.get('quiet', False),
+            'defer_output': options.get('defer_output', False),
+            'memory': options.get('memory'),
+            'library_stack': options.get('library_stack')
         }
+        if self.options['xml_backend'] is None:
+            self.options['xml_backend'] = select_backend()
+        if self.options['library_stack'] is not None:
+            # the position of the part library in the stack, for the baseline fingerprints
+            self.data_set['layer'] = self.options['library_stack'].layer_index(
+                part_file.path) or 0
+        self.stages = self.rule_stages(self.options['rules'], options.get('extra_stages', ()))
         self.exceptions = {
             'information': [],
             'warning': [],
             'error': []
         }
 
-        self.load_part_definition(part_file)
-        if not self.data_set['have_part_definition']:
-            print('part definition not loaded for "{0}"'.format(part_file))
+        if root is None:
+            with phase_context(self.options['memory'], 'parse'):
+                try:
+                    self.load_part_definition(part_file, content)
+                except LimitExceeded as exc:
+                    self.data_set['load_error'] = str(exc)
+                    self.record_exception(
+                        'file_limit', os.path.basename(part_file.path), [str(exc)])
+        else: # already parsed by the caller
+            self.root = root
+            self.data_set['module_id'] = root.get('moduleId')
+            self.data_set['have_part_definition'] = True
+        if self.data_set['have_part_definition']:
+            self.walk_fzp_xml_tree()
+        else:
+            self.debug_print('part definition not loaded for "{0}"'.format(part_file.path))
             # raise ??
-            return
-        self.walk_fzp_xml_tree()
+        if not self.options['keep_tree']:
+            self.root = None # everything needed has been collected, release the tree memory
         if self.data_set['data_error_detected']:
-            print(self.data_set['file_path'].path) # DEBUG
-            print(self.exceptions) # DEBUG
-            print()
+            self.debug_print(self.data_set['file_path'].path) # DEBUG
+            self.debug_print(self.exceptions) # DEBUG
+            self.debug_print()
     # def __init__:
 
+    def debug_print(self, *details) -> None:
+        '''show (debugging) details about the part, unless running quiet
+
+        With deferred output, the details are kept to be shown later'''
+        if self.options['quiet']:
+            return
+        if self.options['defer_output']:
+            self.output.append(details)
+        else:
+            print(*details)
+    # end def debug_print:
+
+    @staticmethod
+    def select_rules(rules: List[List[str]], skip_rules: List[List[str]]) -> frozenset:
+        '''get the set of rules to check from the (appended) command line rule lists
+
+        None means every rule'''
+        if not rules and not skip_rules:
+            return None
+        if rules:
+            selected = {name for names in rules for name in names}
+        else:
+            selected = set(FritzingPartDefinition.EXCEPTION_DATA)
+        if skip_rules:
+            selected.difference_update(name for names in skip_rules for name in names)
+        return frozenset(selected)
+    # end def select_rules:
+
+    @classmethod
+    def rule_stages(cls, rules: frozenset, extra_stages: Tuple[str] = ()) -> frozenset:
+        '''get the processing stages needed to check a set of rules, plus any stages
+        needed for other uses of the collected data'''
+        if rules is None:
+            return frozenset(cls.STAGE_RULES)
+        stages = {stage for stage, stage_rules in cls.STAGE_RULES.items()
+                  if rules.intersection(stage_rules)}
+        stages.update(extra_stages)
+        pending = list(stages)
+        while pending:
+            for needed in cls.STAGE_NEEDS[pending.pop()]:
+                if needed not in stages:
+                    stages.add(needed)
+                    pending.append(needed)
+        return frozenset(stages)
+    # end def rule_stages:
+
+    def needed_elements(self) -> frozenset:
+        '''get the module child elements used by the selected stages
+
+        None when the whole document is needed'''
+        if self.options['complete_tree']:
+            return None
+        elements = set()
+        for stage in self.stages:
+            if self.STAGE_ELEMENTS[stage] is None:
+                return None
+            elements.update(self.STAGE_ELEMENTS[stage])
+        return frozenset(elements)
+    # end def needed_elements:
+
     def record_exception(self, case: str, cause: str, context: list) -> None:
         '''save information about something strange detected in the part definition'''
-        self.data_set['data_error_detected'] = True
+        if self.options['rules'] is not None and case not in self.options['rules'] \
+                and case not in self.UNSELECTABLE_RULES:
+            return # rule not selected
         case_data = self.EXCEPTION_DATA[case]
-        self.exceptions[case_data['severity']].append({
+        finding = {
             'key': case,
             'msg': case_data['msg'],
             'value': cause,
             'context': list(context)
-            })
+            }
+        baseline = self.options['baseline']
+        if baseline is not None and finding_fingerprint(
+                self.data_set['file_path'].path, finding, self.data_set['layer']) in baseline:
+            self.data_set['suppressed'].append(finding) # already accepted
+            return
+        self.data_set['data_error_detected'] = True
+        self.exceptions[case_data['severity']].append(finding)
     # end def record_exception:
 
-    def load_part_definition(self, part_file_spec: str) -> None:
-        '''load part definition information from file'''
+    def load_part_definition(self, part_file_spec: str, content: bytes = None) -> None:
+        '''load part definition information from file, or the already read file content'''
         # dtd_info = self.validate_via_dtd(part_file_spec)
         # if dtd_info['state'] != 'valid':
         #     msg_fmt = 'Specified part definition file "{0}" failed the dtd check\n' \
         #         '  with state {state}\n  Parsing information: \n{fail}'
         #     print(msg_fmt.format(part_file_spec, **dtd_info))
         #     return
-        tree = ET.parse(
-            part_file_spec, forbid_dtd=True, forbid_entities=True, forbid_external=True)
-        self.root = tree.getroot()
+        wanted_elements = self.needed_elements()
+        if wanted_elements is not None:
+            self.root = self.load_part_elements(
+                part_file_spec if content is None else io.BytesIO(content), wanted_elements)
+        elif content is None:
+            self.root = self.options['xml_backend'].parse(part_file_spec)
+        else:
+            self.root = self.options['xml_backend'].fromstring(content)
+        self.data_set['module_id'] = self.root.get('moduleId')
         self.data_set['have_part_definition'] = True
     # end def load_part_definition:
 
+    def load_part_elements(self, source, wanted_elements: frozenset) -> object:
+        '''stream the part definition, only until every wanted module child element is
+        complete
+
+        Anything after that, like a big connectors block when only the properties and
+        views are checked, is never read'''
+        remaining = set(wanted_elements)
+        root = None
+        depth = 0
+        for event, element in self.options['xml_backend'].iterparse(source, ('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                remaining.discard(element.tag)
+                if not remaining:
+                    self.data_set['partial_tree'] = True
+                    break
+        return root
+    # end def load_part_elements:
+
     def validate_via_dtd(self, xml_file_path: str) -> Dict[str, str]:
         '''check a single part definition xml file against the dtd
 
@@ -198,12 +635,23 @@ class FritzingPartDefinition:
     # end def validate_via_dtd(…)
 
     def walk_fzp_xml_tree(self) -> None:
-        '''explore the fzp content'''
-        self.sanity_check_module_elements()
-        self.process_part_properties()
-        # print(self.data_set['properties']) # DEBUG collected property details
-        self.process_part_views()
-        # print(self.data_set['part_views']) # DEBUG collected part view and layer details
+        '''explore the fzp content, running only the stages needed for the selected rules'''
+        with phase_context(self.options['memory'], 'stages'):
+            if 'module' in self.stages:
+                self.sanity_check_module_elements()
+            if 'properties' in self.stages:
+                self.process_part_properties()
+            # print(self.data_set['properties']) # DEBUG collected property details
+            if 'views' in self.stages:
+                self.process_part_views()
+            # print(self.data_set['part_views']) # DEBUG collected part view and layer details
+            if 'connectors' in self.stages:
+                self.process_part_connectors()
+            if 'buses' in self.stages:
+                self.process_part_buses()
+        if self.options['process_svg'] and 'svg_ids' in self.stages:
+            with phase_context(self.options['memory'], 'svg'):
+                self.process_connector_svg_ids()
         # hpd
     # end def walk_fzp_xml_tree:
 
@@ -224,7 +672,7 @@ class FritzingPartDefinition:
             # all_whitespace_match = re.match(r'\A\s*\Z', source)
             all_whitespace_match = re.fullmatch(r'\s+', source)
             if all_whitespace_match is None:
-                print('module{parent}{tag} {ref} content is "{0}"'.format(
+                self.debug_print('module{parent}{tag} {ref} content is "{0}"'.format(
                     source, **context)) # DEBUG
                 self.data_set['data_error_detected'] = True
                 raise NotImplementedError(
@@ -237,9 +685,9 @@ class FritzingPartDefinition:
         '''assert that all required (attribute) values exist, and no duplicates'''
         for key in required:
             if not key in existing:
-                print(self.data_set['file_path'].path) # DEBUG
+                self.debug_print(self.data_set['file_path'].path) # DEBUG
                 self.data_set['data_error_detected'] = True
-                print(existing, required)
+                self.debug_print(existing, required)
                 raise NotImplementedError(
                     'handling not written yet for missing "{0}" required attribute on'
                     ' module{parent}{tag} element'.format(key, **context))
@@ -270,7 +718,7 @@ class FritzingPartDefinition:
         # text_context['ref'] = 'tail'
         # self.expecting_none_or_whitespace(element.tail, text_context)
         if element.attrib:
-            print(element.attrib)
+            self.debug_print(element.attrib)
             raise NotImplementedError(
                 'handling not written yet for attributes on module{parent}{tag}'
                 ' element'.format(**context))
@@ -314,12 +762,12 @@ class FritzingPartDefinition:
         self.check_required_and_no_duplicates(ele_attrib_keys, attributes, context)
         for key in ele_attrib_keys:
             if key not in attributes:
-                print(self.data_set['file_path'].path) # DEBUG
+                self.debug_print(self.data_set['file_path'].path) # DEBUG
                 raise NotImplementedError(
                     'handling not written yet for unexpected "{0}" attribute on module{parent}{tag}'
                     ' element'.format(key, **context))
         if len(ele_attrib_keys) != len(attributes):
-            print(element.attrib)
+            self.debug_print(element.attrib)
             raise NotImplementedError(
                 'handling not written yet for missmatched attribute counts on module{parent}{tag}'
                 ' element'.format(**context))
@@ -332,7 +780,7 @@ class FritzingPartDefinition:
         self.check_required_and_no_duplicates(ele_attrib_keys, required, context)
         for key in ele_attrib_keys:
             if key not in required and key not in optional:
-                print(self.data_set['file_path'].path) # DEBUG
+                self.debug_print(self.data_set['file_path'].path) # DEBUG
                 raise NotImplementedError(
                     'handling not written yet for unexpected (optional) "{0}" attribute on'
                     ' module{parent}{tag} element'.format(key, **context))
@@ -349,7 +797,7 @@ class FritzingPartDefinition:
         # print(bool(source), is_trimmed_string(source)) # DEBUG
         if not(source and is_trimmed_string(source)):
             self.data_set['data_error_detected'] = True
-            print('"{0}"'.format(source))
+            self.debug_print('"{0}"'.format(source))
             raise NotImplementedError(
                 'handling not written yet for empty, untrimmed or multiline text'
                 ' string {context}'.format(**context))
@@ -383,7 +831,7 @@ class FritzingPartDefinition:
         self.expecting_none_or_whitespace(
             self.root.text, {'parent': '', 'tag': '', 'ref': 'text'})
         if self.root.tail is not None: # even blank string not expected here
-            print('root node tail content is "{0}"'.format(self.root.tail)) # DEBUG
+            self.debug_print('root node tail content is "{0}"'.format(self.root.tail)) # DEBUG
             raise NotImplementedError(
                 'handling not written yet for non-null tail in module')
 
@@ -435,7 +883,7 @@ class FritzingPartDefinition:
             self.expecting_none_or_whitespace(
                 prop.tail, {'parent': '.properties', 'tag': '.property', 'ref': 'tail'})
         if 'family' not in property_names:
-            print(property_names)
+            self.debug_print(property_names)
             raise NotImplementedError(
                 'handling not written yet for missing family property name'
                 ' in module.properties.property')
@@ -472,6 +920,7 @@ class FritzingPartDefinition:
                 # print(layers_children) # DEBUG
                 # self.detail_layer_accumulated_check(layers_children, view.tag)
                 # hpd
+        self.data_set['part_views'] = part_views
         # Until shown otherwise, assume that all parts must have a breadboardView,
         # using a file in the breadboard folder, with a layer of "breadboard"
         # ("breadboardbreadboard" ONLY when part family is "breadboard")
@@ -486,8 +935,8 @@ class FritzingPartDefinition:
                 ['family', part_family, image_details['name']])
         if part_family == "Breadboard":
             if part_views['breadboardView']['layers'][0] != 'breadboardbreadboard':
-                print(self.data_set['file_path'].path) # DEBUG
-                print(part_family, image_details)
+                self.debug_print(self.data_set['file_path'].path) # DEBUG
+                self.debug_print(part_family, image_details)
                 raise NotImplementedError(
                     'handling not written yet for breadboard family not using'
                     ' breadboardbreadboard layer')
@@ -496,9 +945,167 @@ class FritzingPartDefinition:
                 self.record_exception(
                     'bad_bb_layer', part_views['breadboardView']['layers'][0],
                     ['family', part_family, image_details['name']])
-        self.data_set['part_views'] = part_views
     # end def process_part_views:
 
+    def process_part_connectors(self) -> None:
+        '''validate and collect the connector information for the part
+
+        Every check is a single pass over the connectors, using hashed lookups for the
+        already seen connector ids and the layers of each part view'''
+        connectors = self.root.find('connectors')
+        if connectors is None:
+            return
+        # only the known views with layers can hold connector graphics (already reported
+        # otherwise), and connector graphics are not expected in the icon view
+        view_layers = {
+            view: frozenset(details['layers'])
+            for view, details in self.data_set['part_views'].items()
+            if view in self.PART_VIEW_TAGS and details.get('layers')}
+        connector_views = frozenset(view for view in view_layers if view != 'iconView')
+        part_connectors = {}
+        for connector in connectors:
+            if connector.tag != 'connector':
+                self.record_exception('not_child_element', connector.tag, ['module.connectors'])
+                continue
+            connector_id = connector.get('id')
+            if connector_id is None:
+                self.record_exception('no_connector_id', connector.get('name'), [])
+                continue
+            if connector_id in part_connectors:
+                self.record_exception('dup_connector_id', connector_id, [connector.get('name')])
+                continue
+            part_connectors[connector_id] = {
+                'name': connector.get('name'),
+                'type': connector.get('type'),
+                'views': self.collect_connector_views(connector, connector_id, view_layers)
+            }
+            for view in connector_views.difference(part_connectors[connector_id]['views']):
+                self.record_exception('missing_connector_view', view, [connector_id])
+        self.data_set['connectors'] = part_connectors
+    # end def process_part_connectors:
+
+    def collect_connector_views(
+            self, connector, connector_id: str, view_layers: Dict[str, frozenset]) -> dict:
+        '''validate and collect the per view graphic references for a single connector'''
+        connector_views = {}
+        views = connector.find('views')
+        if views is None:
+            return connector_views
+        for view in views:
+            if view.tag not in view_layers:
+                self.record_exception('unknown_connector_view', view.tag, [connector_id])
+                continue
+            view_graphics = []
+            for graphic in view:
+                if graphic.tag != 'p':
+                    self.record_exception(
+                        'not_child_element', graphic.tag,
+                        ['module.connectors.connector.views.' + view.tag])
+                    continue
+                layer = graphic.get('layer')
+                if layer not in view_layers[view.tag] and graphic.get('hybrid') != 'yes':
+                    self.record_exception('bad_connector_layer', layer, [connector_id, view.tag])
+                view_graphics.append({
+                    'layer': layer,
+                    'svgId': graphic.get('svgId'),
+                    'terminalId': graphic.get('terminalId'),
+                    'legId': graphic.get('legId'),
+                    'hybrid': graphic.get('hybrid') == 'yes'
+                })
+            connector_views[view.tag] = view_graphics
+        return connector_views
+    # end def collect_connector_views:
+
+    def process_connector_svg_ids(self) -> None:
+        '''verify that every connector graphic reference exists in the view image'''
+        svg_index = self.options['svg_index']
+        if svg_index is None:
+            svg_index = self.options['svg_index'] = SvgIdIndex(
+                backend=self.options['xml_backend'])
+        view_ids = {}
+        for view, details in self.data_set['part_views'].items():
+            if details.get('image') is None:
+                continue # no layers (or image attribute) already reported for the view
+            image_ids = self.view_image_ids(svg_index, details['image'])
+            if isinstance(image_ids, str):
+                if image_ids.startswith(SvgIdIndex.OVER_LIMIT):
+                    self.record_exception('file_limit', details['image'], [view, image_ids])
+                    continue
+                case = 'missing_view_image' if image_ids == SvgIdIndex.MISSING \
+                    else 'bad_view_image'
+                self.record_exception(case, details['image'], [view])
+                continue
+            view_ids[view] = image_ids
+        for connector_id, connector in self.data_set['connectors'].items():
+            for view, graphics in connector['views'].items():
+                if view not in view_ids:
+                    continue # image problem already reported for the view
+                image_ids = view_ids[view]
+                for graphic in graphics:
+                    if graphic['hybrid']:
+                        continue
+                    for attribute in self.CONNECTOR_SVG_ID_ATTRIBUTES:
+                        svg_id = graphic[attribute]
+                        if svg_id is not None and svg_id not in image_ids:
+                            self.record_exception(
+                                'missing_svg_id', svg_id,
+                                [connector_id, view, attribute,
+                                 self.data_set['part_views'][view]['image']])
+    # end def process_connector_svg_ids:
+
+    def view_image_ids(self, svg_index: SvgIdIndex, image_path: str) -> (frozenset, str):
+        '''get the element ids for a view image, looking in the svg folder for the part
+        source first, then the other part source folders'''
+        image_ids = SvgIdIndex.MISSING
+        for full_image_path in self.view_image_paths(image_path):
+            image_ids = svg_index.image_ids(full_image_path)
+            if image_ids != SvgIdIndex.MISSING:
+                break
+        return image_ids
+    # end def view_image_ids:
+
+    def view_image_paths(self, image_path: str) -> List[str]:
+        '''get the places to look for a view image, in search order'''
+        if self.options['library_stack'] is not None:
+            return self.options['library_stack'].image_paths(
+                self.data_set['file_path'].path, image_path)
+        part_folder = os.path.dirname(self.data_set['file_path'].path)
+        library_root = os.path.dirname(part_folder)
+        own_source = os.path.basename(part_folder)
+        search_sources = [own_source] + [
+            source for source in self.PART_SOURCE_FOLDERS if source != own_source]
+        return [os.path.join(library_root, 'svg', source, image_path)
+                for source in search_sources]
+    # end def view_image_paths:
+
+    def process_part_buses(self) -> None:
+        '''validate and collect the bus information for the part'''
+        buses = self.root.find('buses')
+        if buses is None:
+            return
+        part_connectors = self.data_set['connectors']
+        part_buses = {}
+        for bus in buses:
+            if bus.tag != 'bus':
+                self.record_exception('not_child_element', bus.tag, ['module.buses'])
+                continue
+            bus_id = bus.get('id')
+            if bus_id in part_buses:
+                self.record_exception('dup_bus_id', bus_id, [])
+                continue
+            members = []
+            for member in bus:
+                if member.tag != 'nodeMember':
+                    self.record_exception('not_child_element', member.tag, ['module.buses.bus'])
+                    continue
+                connector_id = member.get('connectorId')
+                if connector_id not in part_connectors:
+                    self.record_exception('bad_bus_member', connector_id, [bus_id])
+                members.append(connector_id)
+            part_buses[bus_id] = members
+        self.data_set['buses'] = part_buses
+    # end def process_part_buses:
+
     def detail_layer_check(
             self, child_ele, processed_children: dict, parent_view: str, image_path: str) -> None:
         '''validation checks for a child element of module.views.*.layers'''
@@ -512,12 +1119,12 @@ class FritzingPartDefinition:
         layer_required_attributes = ['layerId']
         layer_optional_attributes = ['sticky'] # is this really used?
         if child_ele.tag != 'layer':
-            print(child_ele.tag)
+            self.debug_print(child_ele.tag)
             self.data_set['data_error_detected'] = True
             raise NotImplementedError(
                 'handling not written yet for bad child element in module.views.*.layers')
         if not child_ele.text is None:
-            print('"{0}"'.format(child_ele.text))
+            self.debug_print('"{0}"'.format(child_ele.text))
             raise NotImplementedError(
                 'handling not written yet for text in module.views.*.layers.layer element')
         self.expecting_none_or_whitespace(
@@ -556,7 +1163,7 @@ class FritzingPartDefinition:
             self.record_exception('not_child_element', child_ele.tag, ['module.views'])
             return
         if child_ele.tag in processed_children:
-            print(child_ele.tag)
+            self.debug_print(child_ele.tag)
             raise NotImplementedError(
                 'handling not written yet for duplicate layers element in module.views')
         self.expecting_none_or_whitespace(
@@ -576,12 +1183,12 @@ class FritzingPartDefinition:
         image_split = image_path.split('/')
         if len(image_split) != 2:
             self.data_set['data_error_detected'] = True
-            print(image_path, image_split)
+            self.debug_print(image_path, image_split)
             raise NotImplementedError(
                 'handling not written yet for bad image path splitting')
         image_folder = image_split[0]
         if image_folder not in view_folders:
-            print(image_folder, image_path)
+            self.debug_print(image_folder, image_path)
             raise NotImplementedError(
                 'handling not written yet for bad image view folder')
         # (at least) breadboard parts use different pattern for (at least) breadboard svg images
@@ -600,7 +1207,7 @@ class FritzingPartDefinition:
         redundant_attribute_views = ['iconView', 'schematicView']
 
         # print(type(view_ele)) # DEBUG <class 'xml.etree.ElementTree.Element'>
-        if view_ele.tag not in ('breadboardView', 'iconView', 'pcbView', 'schematicView'):
+        if view_ele.tag not in self.PART_VIEW_TAGS:
             self.record_exception('not_child_element', view_ele.tag, ['module.views'])
             return
         self.expecting_wrapper_with_optional_attributes(
@@ -658,20 +1265,105 @@ class CommandLineParser:
                             version='%(prog)s ' + PARSE_FZP_VERSION)
         # hpd later may want to support wild card patterns, without having the
         # os expand the command line arguments
-        # --folder --pattern --family --property --tag
+        # --folder --family --property --tag
         # raw folder (of .fzp)
         # parts library (core, contrib, obsolete, user)
         # user parts (contrib, user)
         # specified file(s)
-        parser.add_argument('definition_file', metavar='Part Definition',
+        parser.add_argument('definition_file', metavar='Part Definition', nargs='?',
                             action=ReadableFile,
-                            help='Fritzing part definition file')
+                            help='Fritzing part definition file, when not processing a library')
+        parser.add_argument('-l', '--library', metavar='library', action=ExistingDirList,
+                            help='path to top folder for Fritzing Parts library. Can be'
+                            ' repeated, from highest to lowest precedence (like a user'
+                            ' library before the core library), to process the libraries'
+                            ' as layers, with shared parts and images')
         parser.add_argument('-v', '--verbose', action='count', default=0,
                             help='increase verbosity')
         parser.add_argument('-e', '--exceptions', action='store_true',
                             help='report «non-fatal» exceptions while processing')
         parser.add_argument('-s', '--svg', action='store_true',
                             help='verify existence of matching svg view files')
+        parser.add_argument('-p', '--pattern', action='append', metavar='pattern',
+                            help='only process files with a (library relative) path matching'
+                            ' the wild card pattern; «re:» prefix for a regular expression,'
+                            ' «!» prefix to exclude matches. Can be repeated')
+        parser.add_argument('-b', '--bin', action='append', metavar='bin', dest='bins',
+                            help='only process the parts referenced by a Fritzing bin (.fzb)'
+                            ' file. Can be repeated')
+        parser.add_argument('--follow-links', action='store_true',
+                            help='follow symbolic links in the library, processing each'
+                            ' physical file once, however many links reach it')
+        parser.add_argument('--module-cache', metavar='cache',
+                            help='file to keep the part moduleId index in between runs')
+        parser.add_argument('--read-ahead', metavar='threads', type=int, default=0,
+                            help='number of background threads reading upcoming files into'
+                            ' memory while the current file is processed (0 to disable)')
+        parser.add_argument('--progress', choices=PROGRESS_CHOICES, default='auto',
+                            help='show parts done, throughput and time remaining on stderr,'
+                            ' as a status line (bar) or JSON lines. auto: a status line'
+                            ' when stderr is a terminal')
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='number of worker processes linting parts, largest files'
+                            ' first. Not with --read-ahead, --inode-order or memory options')
+        parser.add_argument('--inode-order', action='store_true',
+                            help='with --read-ahead, read each block of files in inode order')
+        parser.add_argument('-d', '--duplicates', action='store_true',
+                            help='report duplicate and near duplicate part definitions')
+        parser.add_argument('-f', '--families', action='store_true',
+                            help='report family property consistency across all of the parts')
+        parser.add_argument('--rules', action='append', type=rule_names, metavar='rules',
+                            help='only check the comma separated rules (exception keys).'
+                            ' Can be repeated')
+        parser.add_argument('--skip-rules', action='append', type=rule_names, metavar='rules',
+                            help='do not check the comma separated rules. Can be repeated')
+        parser.add_argument('--sample', type=sample_size, metavar='N|P%',
+                            help='only lint a random sample of N parts, or P percent of the'
+                            ' parts, from each source folder in proportion, then report the'
+                            ' prevalence of each rule with confidence intervals')
+        parser.add_argument('--seed', type=int,
+                            help='random seed for --sample (default 0), the same seed gives'
+                            ' the same sample')
+        parser.add_argument('--fix', action='store_true',
+                            help='fix the untrimmed_text, redundant_attribute and'
+                            ' dup_support_ele findings in place, changing only the bytes'
+                            ' for each fix')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='report what --fix would change, without writing any files')
+        parser.add_argument('--fix-jobs', type=int, metavar='processes',
+                            help='number of processes fixing files (default: cpu count)')
+        parser.add_argument('--baseline', metavar='baseline-file',
+                            help='do not report findings that are in the baseline')
+        parser.add_argument('--write-baseline', metavar='baseline-file',
+                            help='write a baseline with every finding from this run')
+        parser.add_argument('--metrics', metavar='prom-file',
+                            help='write finding counts and run timing in Prometheus text format')
+        parser.add_argument('--metrics-json', metavar='json-file',
+                            help='write finding counts and run timing as JSON')
+        parser.add_argument('--store', metavar='sqlite-file',
+                            help='add the parts and findings for the run to a SQLite database'
+                            ' (see result_store.py)')
+        parser.add_argument('--memory-report', action='store_true',
+                            help='report the memory use of each processing phase, with the'
+                            ' top allocation sites (slows the run down)')
+        parser.add_argument('--max-memory', type=memory_size, metavar='size',
+                            help='stop with the memory report when the peak memory use goes'
+                            ' over the size (like 800M or 2G)')
+        parser.add_argument('--max-file-size', type=memory_size, metavar='size',
+                            help='skip (and report) part and image files bigger than the size'
+                            ' (like 512K or 20M)')
+        parser.add_argument('--max-elements', type=int, metavar='count',
+                            help='stop parsing (and report) files with more elements')
+        parser.add_argument('--max-depth', type=int, metavar='levels',
+                            help='stop parsing (and report) files with deeper element nesting')
+        parser.add_argument('--max-attributes', type=int, metavar='count',
+                            help='stop parsing (and report) files with an element with more'
+                            ' attributes')
+        parser.add_argument('--max-parse-seconds', type=float, metavar='seconds',
+                            help='stop parsing (and report) files that take longer to parse')
+        parser.add_argument('--xml-backend', choices=BACKEND_CHOICES, default='auto',
+                            help='xml parser to use. auto picks lxml when it is installed,'
+                            ' otherwise defusedxml')
         return parser
     # end def build_parser:
 # end class CommandLineParser:
@@ -681,7 +1373,28 @@ def my_main() -> None:
     '''wrapper for test/start code so that variables do not look like constants'''
     print('\n\n\n') #DEBUG
     cli_parser = CommandLineParser()
-    ProcessParts(cli_parser.command_arguments)
+    if (cli_parser.command_arguments.definition_file is None) == \
+            (cli_parser.command_arguments.library is None):
+        cli_parser.parser.error('give either a part definition file or a --library')
+    if cli_parser.command_arguments.bins and cli_parser.command_arguments.library is None:
+        cli_parser.parser.error('--bin needs a --library to find the bin parts in')
+    if cli_parser.command_arguments.seed is not None \
+            and cli_parser.command_arguments.sample is None:
+        cli_parser.parser.error('--seed only applies to a --sample run')
+    if cli_parser.command_arguments.jobs > 1:
+        serial_only = [option for option, used in (
+            ('--read-ahead', cli_parser.command_arguments.read_ahead > 0),
+            ('--inode-order', cli_parser.command_arguments.inode_order),
+            ('--max-memory', cli_parser.command_arguments.max_memory is not None),
+            ('--memory-report', cli_parser.command_arguments.memory_report)) if used]
+        if serial_only:
+            cli_parser.parser.error('{0} can not be used with --jobs more than 1'.format(
+                ', '.join(serial_only)))
+    check_backend_choice(cli_parser.parser, cli_parser.command_arguments.xml_backend)
+    try:
+        ProcessParts(cli_parser.command_arguments)
+    except MemoryBudgetExceeded as exc:
+        sys.exit(str(exc))
 # end def my_main:
 
 # Standalone module execution
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+open Fritzing part view svg image files, and extract information from them
+
+xml parsing
+'''
+
+# pipenv shell
+# pipenv run pylint parse_svg.py
+
+# standard library imports
+from collections import OrderedDict
+
+# local application/library specific imports
+from xml_backend import select_backend
+from file_limits import LimitExceeded
+
+PARSE_SVG_VERSION = '0.0.1'
+
+
+def read_svg_ids(image_path: str, backend: object) -> frozenset:
+    '''stream parse an svg file, collecting the id of every element
+
+    Elements are cleared as soon as they have been seen, so the full document tree
+    is never held in memory'''
+    element_ids = set()
+    for event, element in backend.iterparse(image_path, ('start', 'end')):
+        if event == 'start':
+            element_id = element.get('id')
+            if element_id is not None:
+                element_ids.add(element_id)
+        else:
+            element.clear()
+    return frozenset(element_ids)
+# end def read_svg_ids:
+
+
+class SvgIdIndex:
+    '''cache of the element ids in part view svg image files
+
+    Each image is parsed at most once while it stays in the cache, no matter how many
+    parts (or connectors) reference it'''
+    MISSING = 'missing'
+    UNPARSEABLE = 'unparseable'
+    OVER_LIMIT = 'over limit'
+
+    def __init__(self, max_images: int = 4096, backend: object = None):
+        self.backend = select_backend() if backend is None else backend
+        self.max_images = max_images
+        self.images = OrderedDict()
+        self.statistics = {'parsed': 0, 'hits': 0}
+    # end def __init__:
+
+    def image_ids(self, image_path: str) -> (frozenset, str):
+        '''get the set of element ids for an image, or a reason when that is not possible'''
+        if image_path in self.images:
+            self.images.move_to_end(image_path)
+            self.statistics['hits'] += 1
+            return self.images[image_path]
+        try:
+            cached = read_svg_ids(image_path, self.backend)
+        except FileNotFoundError:
+            cached = self.MISSING
+        except LimitExceeded as exc:
+            cached = '{0}: {1}'.format(self.OVER_LIMIT, exc)
+        except self.backend.ERRORS:
+            cached = self.UNPARSEABLE
+        self.statistics['parsed'] += 1
+        self.images[image_path] = cached
+        if len(self.images) > self.max_images:
+            self.images.popitem(last=False)
+        return cached
+    # end def image_ids:
+# end class SvgIdIndex:
+
+# variables
+#   cSpell:words iterparse
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+resolve the parts referenced by Fritzing bin (.fzb) files
+
+A bin only holds moduleId references to parts. Those are mapped back to part
+definition files through an index of the moduleId attribute on the root module
+element of every part in the library. Building the index only needs the root
+start tag of each file, and the result is cached per file, keyed by the file
+(modification time, size), so that only new and changed files are read again. A
+single cache file can hold the folders for several libraries.
+'''
+
+# pipenv shell
+# pipenv run pylint part_bins.py
+
+# standard library imports
+import os
+import json
+from typing import Dict, List, Tuple
+
+# local application/library specific imports
+from myutilities import write_atomically
+from xml_backend import select_backend
+
+PART_BINS_VERSION = '0.0.1'
+MODULE_CACHE_VERSION = 3
+
+
+def read_module_id(part_path: str, backend: object) -> str:
+    '''get the moduleId from a part definition file, reading only the root start tag'''
+    try:
+        for _event, element in backend.iterparse(part_path, ('start',)):
+            return element.get('moduleId')
+    except backend.ERRORS:
+        pass
+    return None
+# end def read_module_id:
+
+
+def read_bin_module_ids(bin_path: str, backend: object) -> List[str]:
+    '''stream the moduleId references out of a Fritzing bin file
+
+    An instance without a moduleIdRef attribute gives None'''
+    module_ids = []
+    for _event, element in backend.iterparse(bin_path, ('end',)):
+        if element.tag == 'instance':
+            module_ids.append(element.get('moduleIdRef'))
+            element.clear()
+    return module_ids
+# end def read_bin_module_ids:
+
+
+def read_part_view_images(part_path: str, backend: object) -> List[str]:
+    '''get the view image paths from a part definition file, stopping at the connectors'''
+    images = []
+    try:
+        for _event, element in backend.iterparse(part_path, ('start',)):
+            if element.tag == 'connectors':
+                break
+            if element.tag == 'layers' and element.get('image') is not None \
+                    and element.get('image') not in images:
+                images.append(element.get('image'))
+    except backend.ERRORS:
+        pass # the part problems are reported when it is linted
+    return images
+# end def read_part_view_images:
+
+
+class ModuleIdIndex:
+    '''map part moduleId values to part definition files in a parts library'''
+    # when the same moduleId exists in more than one folder, use the first found
+    SOURCE_PREFERENCE = ('core', 'contrib', 'user', 'obsolete')
+    OBSOLETE_FOLDER = 'obsolete'
+    PART_FILE_TYPE = ('.fzp')
+
+    def __init__(self, library_path: str, cache_path: str = None, backend: object = None):
+        self.backend = select_backend() if backend is None else backend
+        self.library_path = library_path
+        self.cache_path = cache_path
+        self.cache_changed = False
+        self.folders = {}
+        self.index = None
+        self.load_cache()
+    # end def __init__:
+
+    def read_cache_libraries(self) -> Dict[str, dict]:
+        '''get the indexed folder information for every library in the cache file'''
+        if self.cache_path is None or not os.path.isfile(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='UTF-8') as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            return {} # an unusable cache is just rebuilt
+        if cached.get('version') != MODULE_CACHE_VERSION:
+            return {}
+        return cached['libraries']
+    # end def read_cache_libraries:
+
+    def load_cache(self) -> None:
+        '''get previously indexed folder information, when a cache file is in use'''
+        self.folders = self.read_cache_libraries().get(os.path.abspath(self.library_path), {})
+    # end def load_cache:
+
+    def save_cache(self) -> None:
+        '''store the indexed folder information, when anything changed
+
+        The cache file is read again first, to keep the folders saved (possibly since
+        this index was loaded) for other libraries'''
+        if self.cache_path is None or not self.cache_changed:
+            return
+        libraries = self.read_cache_libraries()
+        libraries[os.path.abspath(self.library_path)] = self.folders
+        write_atomically(self.cache_path, json.dumps({
+            'version': MODULE_CACHE_VERSION,
+            'libraries': libraries
+        }))
+        self.cache_changed = False
+    # end def save_cache:
+
+    def folder_module_ids(self, source: str) -> Dict[str, str]:
+        '''get the moduleId to file name map for a single part source folder'''
+        folder_path = os.path.join(self.library_path, source)
+        if not os.path.isdir(folder_path):
+            return {}
+        # {file name: [mtime, size, moduleId]}, a file changed in place keeps the folder
+        # modification time, so each file is checked
+        cached_files = self.folders.get(source, {})
+        folder_files = {}
+        module_ids = {}
+        with os.scandir(folder_path) as part_files:
+            for part_file in part_files:
+                if not (part_file.name.endswith(self.PART_FILE_TYPE) and part_file.is_file()):
+                    continue
+                file_stat = part_file.stat()
+                stamp = [file_stat.st_mtime_ns, file_stat.st_size]
+                cached = cached_files.get(part_file.name)
+                if cached is not None and cached[:2] == stamp:
+                    module_id = cached[2]
+                else:
+                    module_id = read_module_id(part_file.path, self.backend)
+                    self.cache_changed = True
+                folder_files[part_file.name] = stamp + [module_id]
+                if module_id is not None and module_id not in module_ids:
+                    module_ids[module_id] = part_file.name
+        if folder_files.keys() != cached_files.keys():
+            self.cache_changed = True # files added or removed
+        self.folders[source] = folder_files
+        return module_ids
+    # end def folder_module_ids:
+
+    def build_index(self) -> None:
+        '''create the merged moduleId lookup for all of the part source folders'''
+        self.index = {}
+        for source in self.SOURCE_PREFERENCE:
+            for module_id, file_name in self.folder_module_ids(source).items():
+                if module_id not in self.index:
+                    self.index[module_id] = (source, file_name)
+        self.save_cache()
+    # end def build_index:
+
+    def lookup(self, module_id: str) -> Tuple[str, str]:
+        '''get the (source folder, file name) for a moduleId, or None when not found'''
+        if self.index is None:
+            self.build_index()
+        return self.index.get(module_id)
+    # end def lookup:
+
+    def part_path(self, module_id: str) -> str:
+        '''get the full path to the part definition file for a moduleId'''
+        location = self.lookup(module_id)
+        if location is None:
+            return None
+        return os.path.join(self.library_path, *location)
+    # end def part_path:
+# end class ModuleIdIndex:
+
+
+class BinResolver:
+    '''collect the part definition files referenced by a set of Fritzing bins'''
+    IMAGE_FOLDER = 'svg'
+
+    def __init__(self, module_index: ModuleIdIndex):
+        self.module_index = module_index
+        self.problems = []
+    # end def __init__:
+
+    def resolve(self, bin_paths: List[str]) -> List[str]:
+        '''get the (unique) part file paths for every part referenced in the bins'''
+        part_paths = []
+        seen_ids = set()
+        for bin_path in bin_paths:
+            try:
+                bin_module_ids = read_bin_module_ids(bin_path, self.module_index.backend)
+            except self.module_index.backend.ERRORS as exc:
+                self.record_problem('unreadable', bin_path, None, str(exc))
+                continue
+            for module_id in bin_module_ids:
+                if module_id is None:
+                    self.record_problem('no_reference', bin_path, None, None)
+                    continue
+                if module_id in seen_ids:
+                    continue
+                seen_ids.add(module_id)
+                location = self.module_index.lookup(module_id)
+                if location is None:
+                    self.record_problem('missing', bin_path, module_id, None)
+                    continue
+                if location[0] == ModuleIdIndex.OBSOLETE_FOLDER:
+                    self.record_problem('obsolete', bin_path, module_id, location[1])
+                part_paths.append(self.module_index.part_path(module_id))
+        return part_paths
+    # end def resolve:
+
+    def image_candidates(self, part_path: str, image_path: str) -> List[str]:
+        '''get the places to look for a part view image, in search order
+
+        The part own source folder first, then the other source folders'''
+        if hasattr(self.module_index, 'image_paths'): # a library stack
+            return self.module_index.image_paths(part_path, image_path)
+        part_folder = os.path.dirname(part_path)
+        own_source = os.path.basename(part_folder)
+        return [os.path.join(os.path.dirname(part_folder), self.IMAGE_FOLDER, source, image_path)
+                for source in (own_source,) + tuple(
+                    source for source in ModuleIdIndex.SOURCE_PREFERENCE if source != own_source)]
+    # end def image_candidates:
+
+    def view_images(self, part_paths: List[str]) -> List[str]:
+        '''get the (unique) existing view image files used by the parts'''
+        image_files = []
+        for part_path in part_paths:
+            for image_path in read_part_view_images(part_path, self.module_index.backend):
+                for candidate in self.image_candidates(part_path, image_path):
+                    if os.path.isfile(candidate):
+                        if candidate not in image_files:
+                            image_files.append(candidate)
+                        break
+        return image_files
+    # end def view_images:
+
+    def record_problem(self, case: str, bin_path: str, module_id: str, file_name: str) -> None:
+        '''save and report a bin entry that does not reference a current library part'''
+        self.problems.append({
+            'key': case, 'bin': bin_path, 'moduleId': module_id, 'file': file_name})
+        if case == 'missing':
+            print('bin "{0}": moduleId "{1}" not found in parts library'.format(
+                bin_path, module_id))
+        elif case == 'no_reference':
+            print('bin "{0}": instance without a moduleIdRef'.format(bin_path))
+        elif case == 'unreadable':
+            print('bin "{0}": not readable: {1}'.format(bin_path, file_name))
+        else:
+            print('bin "{0}": moduleId "{1}" is an obsolete part ({2})'.format(
+                bin_path, module_id, file_name))
+    # end def record_problem:
+# end class BinResolver:
+
+# variables
+#   cSpell:words fzb
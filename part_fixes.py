@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+automatic fixes for the lint findings that have a single mechanical solution
+
+* untrimmed_text: strip the whitespace around a property value, and join lines
+* redundant_attribute: remove the attribute from the iconView or schematicView
+* dup_support_ele: remove the later copies of a repeated supporting module element
+  (Fritzing only uses the first)
+
+The part file is not written back from a parsed tree, since that would reformat the
+whole file. Instead, expat reports the byte position of every element, and only the
+byte ranges for the fixes are replaced. Every other byte of the file is left exactly
+as it was. The patched content has to parse again before the file is (atomically)
+replaced.
+'''
+
+# pipenv shell
+# pipenv run pylint part_fixes.py
+
+# standard library imports
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+import xml.parsers.expat
+
+# local application/library specific imports
+from myutilities import write_atomically
+from part_scheduler import largest_first
+
+PART_FIXES_VERSION = '0.0.1'
+FIXABLE_RULES = frozenset(('untrimmed_text', 'redundant_attribute', 'dup_support_ele'))
+START_TAG_PATTERN = re.compile(rb'<(?:[^>"\']|"[^"]*"|\'[^\']*\')*>')
+LINE_BREAK_PATTERN = re.compile(rb'[ \t\r]*\n\s*')
+
+
+class ElementSpan:
+    '''the byte positions of a single element in the source document'''
+    __slots__ = ('path', 'attrib', 'start', 'start_tag_end', 'end', 'text')
+
+    def __init__(self, path: str, attrib: Dict[str, str], start: int, start_tag_end: int):
+        self.path = path
+        self.attrib = attrib
+        self.start = start
+        self.start_tag_end = start_tag_end
+        self.end = None
+        self.text = ''
+    # end def __init__:
+# end class ElementSpan:
+
+
+def element_spans(content: bytes) -> List[ElementSpan]:
+    '''get the element positions for a document, in document order
+
+    The path of each element is the slash separated list of tags from the root'''
+    spans = []
+    open_spans = []
+    parser = xml.parsers.expat.ParserCreate()
+
+    def start_element(tag: str, attrib: Dict[str, str]) -> None:
+        start = parser.CurrentByteIndex
+        path = tag if not open_spans else open_spans[-1].path + '/' + tag
+        span = ElementSpan(path, attrib, start,
+                           START_TAG_PATTERN.match(content, start).end())
+        spans.append(span)
+        open_spans.append(span)
+    # end def start_element:
+
+    def end_element(_tag: str) -> None:
+        span = open_spans.pop()
+        if content[span.start_tag_end - 2:span.start_tag_end] == b'/>':
+            span.end = span.start_tag_end # empty element: «<tag/>»
+        else: # the end of the end tag, even with nothing before it: «<tag></tag>»
+            span.end = content.index(b'>', parser.CurrentByteIndex) + 1
+    # end def end_element:
+
+    def character_data(text: str) -> None:
+        if open_spans:
+            open_spans[-1].text += text
+    # end def character_data:
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    parser.Parse(content, True)
+    return spans
+# end def element_spans:
+
+
+def trimmed_text_edit(content: bytes, span: ElementSpan) -> Tuple[int, int, bytes]:
+    '''get the edit that trims the text content of an element, or None'''
+    raw_text = content[span.start_tag_end:content.rindex(b'<', 0, span.end)]
+    if b'<' in raw_text:
+        return None # comment, cdata or child element: not a mechanical fix
+    fixed_text = LINE_BREAK_PATTERN.sub(b' ', raw_text.strip())
+    if fixed_text == raw_text:
+        return None
+    return span.start_tag_end, span.start_tag_end + len(raw_text), fixed_text
+# end def trimmed_text_edit:
+
+
+def attribute_edit(content: bytes, span: ElementSpan, attribute: str) -> Tuple[int, int, bytes]:
+    '''get the edit that removes an attribute (and the whitespace before it), or None'''
+    attribute_match = re.compile(
+        rb'\s+' + re.escape(attribute.encode('UTF-8')) + rb'\s*=\s*(?:"[^"]*"|\'[^\']*\')'
+    ).search(content, span.start, span.start_tag_end)
+    if attribute_match is None:
+        return None
+    return attribute_match.start(), attribute_match.end(), b''
+# end def attribute_edit:
+
+
+def element_edit(content: bytes, span: ElementSpan) -> Tuple[int, int, bytes]:
+    '''get the edit that removes an element, with the whitespace (indent) before it'''
+    start = span.start
+    while start > 0 and content[start - 1:start].isspace():
+        start -= 1
+    return start, span.end, b''
+# end def element_edit:
+
+
+def finding_edits(content: bytes, findings: Iterable[dict]) -> List[Tuple[int, int, bytes, str]]:
+    '''get the (start, end, replacement, rule) edits that fix the findings for a part'''
+    spans = element_spans(content)
+    edits = []
+    keys = {finding['key'] for finding in findings}
+    if 'untrimmed_text' in keys:
+        untrimmed = {finding['value'] for finding in findings
+                     if finding['key'] == 'untrimmed_text'}
+        for span in spans:
+            if span.path == 'module/properties/property' and span.text in untrimmed:
+                edits.append((trimmed_text_edit(content, span), 'untrimmed_text'))
+    for finding in findings:
+        if finding['key'] == 'redundant_attribute':
+            view_path = 'module/views/' + finding['context'][0]
+            for span in spans:
+                if span.path == view_path:
+                    edits.append((attribute_edit(content, span, finding['value']),
+                                  'redundant_attribute'))
+    if 'dup_support_ele' in keys:
+        duplicated = {'module/' + finding['value'] for finding in findings
+                      if finding['key'] == 'dup_support_ele'}
+        seen = set()
+        for span in spans:
+            if span.path in duplicated:
+                if span.path in seen:
+                    edits.append((element_edit(content, span), 'dup_support_ele'))
+                seen.add(span.path)
+    # drop the edits that could not be made, and any that overlap an earlier edit
+    fixes = []
+    for edit, rule in sorted((edit, rule) for edit, rule in edits if edit is not None):
+        if fixes and edit[0] < fixes[-1][1]:
+            continue
+        fixes.append(edit + (rule,))
+    return fixes
+# end def finding_edits:
+
+
+def apply_edits(content: bytes, edits: List[Tuple[int, int, bytes, str]]) -> bytes:
+    '''replace the byte ranges, keeping everything else the same'''
+    pieces = []
+    position = 0
+    for start, end, replacement, _rule in edits:
+        pieces.append(content[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(content[position:])
+    return b''.join(pieces)
+# end def apply_edits:
+
+
+def fix_part(part_path: str, findings: List[dict], write: bool = True) -> dict:
+    '''fix the findings for a single part file
+
+    Returns a summary: the path, the count of fixes by rule, the bytes removed, and an
+    error string (or None)'''
+    summary = {'path': part_path, 'rules': {}, 'removed': 0, 'error': None}
+    try:
+        with open(part_path, 'rb') as part_file:
+            content = part_file.read()
+        edits = finding_edits(content, findings)
+        if not edits:
+            return summary
+        fixed_content = apply_edits(content, edits)
+        element_spans(fixed_content) # the fixed part must still be well formed
+        if write:
+            write_atomically(part_path, fixed_content)
+    except (OSError, xml.parsers.expat.ExpatError) as exc:
+        summary['error'] = type(exc).__name__ + ': ' + str(exc)
+        return summary
+    for edit in edits:
+        summary['rules'][edit[3]] = summary['rules'].get(edit[3], 0) + 1
+    summary['removed'] = len(content) - len(fixed_content)
+    return summary
+# end def fix_part:
+
+
+def fix_parts(pending: Dict[str, List[dict]], workers: int = None,
+              write: bool = True) -> List[dict]:
+    '''fix the findings for many part files in parallel processes'''
+    if not pending:
+        return []
+    # biggest files first, so a large file is not left running alone at the end
+    paths = [path for _size, path in largest_first(pending)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        summaries = list(pool.map(fix_part, paths, [pending[path] for path in paths],
+                                  [write] * len(paths)))
+    return sorted(summaries, key=lambda summary: summary['path'])
+# end def fix_parts:
+
+
+def report_fixes(summaries: List[dict], write: bool = True) -> None:
+    '''show what was (or would be) changed in each file, with the totals by rule'''
+    totals = {}
+    changed_files = 0
+    for summary in summaries:
+        if summary['error'] is not None:
+            print('not fixed "{0}": {1}'.format(summary['path'], summary['error']))
+            continue
+        if not summary['rules']:
+            continue
+        changed_files += 1
+        print('{0} "{1}": {2} ({3} bytes removed)'.format(
+            'fixed' if write else 'would fix', summary['path'],
+            ', '.join('{0} {1}'.format(count, rule)
+                      for rule, count in sorted(summary['rules'].items())),
+            summary['removed']))
+        for rule, count in summary['rules'].items():
+            totals[rule] = totals.get(rule, 0) + count
+    print('{0} {1} findings in {2} files{3}'.format(
+        'fixed' if write else 'would fix', sum(totals.values()), changed_files,
+        ''.join(', {0} {1}'.format(count, rule) for rule, count in sorted(totals.items()))))
+# end def report_fixes:
+
+# variables
+#   cSpell:words expat cdata
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+compact in memory model of linted part definitions
+
+The FritzingPartDefinition working data (nested dictionaries, plus the element tree)
+is fine for one part at a time, but too heavy to keep for a whole library. These
+classes use __slots__ and tuples, and intern the strings that repeat across parts
+(family, property names, view, layer and image folder names), so a model of every
+part in the library can stay in memory for cross part analysis.
+'''
+
+# pipenv shell
+# pipenv run pylint part_model.py
+
+# standard library imports
+import sys
+from typing import Dict, Iterator, Tuple
+
+PART_MODEL_VERSION = '0.0.1'
+
+
+def shared(source: str) -> str:
+    '''intern a string that is repeated across many parts'''
+    return None if source is None else sys.intern(source)
+# end def shared:
+
+
+class PartView:
+    '''the image and layers for one view of a part'''
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('view', 'image_folder', 'image_name', 'layers')
+
+    def __init__(self, view: str, image: str, layers: Tuple[str]):
+        self.view = shared(view)
+        folder, _separator, name = (image or '').rpartition('/')
+        self.image_folder = shared(folder)
+        self.image_name = name
+        self.layers = tuple(shared(layer) for layer in layers)
+    # end def __init__:
+
+    @property
+    def image(self) -> str:
+        '''the image path, relative to the svg source folder'''
+        return self.image_folder + '/' + self.image_name if self.image_folder else self.image_name
+# end class PartView:
+
+
+class ConnectorGraphic:
+    '''the graphic references for a connector in one view'''
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('view', 'layer', 'svg_id', 'terminal_id', 'leg_id', 'hybrid')
+
+    def __init__(self, view: str, graphic: dict):
+        self.view = shared(view)
+        self.layer = shared(graphic['layer'])
+        self.svg_id = graphic['svgId']
+        self.terminal_id = graphic['terminalId']
+        self.leg_id = graphic['legId']
+        self.hybrid = graphic['hybrid']
+    # end def __init__:
+# end class ConnectorGraphic:
+
+
+class Connector:
+    '''a single part connector, with the graphics for every view'''
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('connector_id', 'name', 'kind', 'graphics')
+
+    def __init__(self, connector_id: str, details: dict):
+        self.connector_id = connector_id
+        self.name = details['name']
+        self.kind = shared(details['type'])
+        self.graphics = tuple(
+            ConnectorGraphic(view, graphic)
+            for view, graphics in details['views'].items() for graphic in graphics)
+    # end def __init__:
+# end class Connector:
+
+
+class Finding:
+    '''a single lint finding'''
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('severity', 'key', 'value', 'context')
+
+    def __init__(self, severity: str, finding: dict):
+        self.severity = shared(severity)
+        self.key = shared(finding['key'])
+        self.value = finding['value']
+        self.context = tuple(finding['context'])
+    # end def __init__:
+# end class Finding:
+
+
+class PartModel:
+    '''everything collected about a single part definition'''
+    __slots__ = ('path', 'module_id', 'family', 'properties', 'views', 'connectors',
+                 'buses', 'findings', 'error')
+
+    def __init__(self, path: str, module_id: str = None, error: str = None):
+        self.path = path
+        self.module_id = module_id
+        self.error = error
+        self.family = None
+        self.properties = ()
+        self.views = ()
+        self.connectors = ()
+        self.buses = ()
+        self.findings = ()
+    # end def __init__:
+
+    @classmethod
+    def from_data(cls, path: str, module_id: str, data_set: dict,
+                  exceptions: Dict[str, list]) -> 'PartModel':
+        '''build the model from FritzingPartDefinition data_set and exceptions content'''
+        model = cls(path, module_id)
+        properties = data_set['properties']
+        model.family = shared(properties.get('family'))
+        model.properties = tuple(
+            (shared(name), value) for name, value in properties.items())
+        model.views = tuple(
+            PartView(view, details.get('image'), details.get('layers', ()))
+            for view, details in data_set['part_views'].items())
+        model.connectors = tuple(
+            Connector(connector_id, details)
+            for connector_id, details in data_set['connectors'].items())
+        model.buses = tuple(
+            (bus_id, tuple(members)) for bus_id, members in data_set['buses'].items())
+        model.findings = tuple(
+            Finding(severity, finding)
+            for severity, findings in exceptions.items() for finding in findings)
+        return model
+    # end def from_data:
+
+    @classmethod
+    def from_definition(cls, part) -> 'PartModel':
+        '''build the model for a linted FritzingPartDefinition'''
+        return cls.from_data(part.data_set['file_path'].path, part.data_set['module_id'],
+                             part.data_set, part.exceptions)
+    # end def from_definition:
+
+    @classmethod
+    def from_snapshot(cls, path: str, record: dict) -> 'PartModel':
+        '''build the model for a part from a library snapshot record'''
+        if record['error'] is not None:
+            return cls(path, error=record['error'])
+        return cls.from_data(path, record['module_id'], {
+            'properties': record['properties'],
+            'part_views': record['views'],
+            'connectors': record['connectors'],
+            'buses': record['buses']
+        }, record['findings'])
+    # end def from_snapshot:
+
+    def view(self, view_name: str) -> PartView:
+        '''get the details for a single part view, or None'''
+        for part_view in self.views:
+            if part_view.view == view_name:
+                return part_view
+        return None
+    # end def view:
+
+    def property_value(self, name: str) -> str:
+        '''get the value of a single part property, or None'''
+        for property_name, value in self.properties:
+            if property_name == name:
+                return value
+        return None
+    # end def property_value:
+# end class PartModel:
+
+
+def snapshot_models(records: Dict[str, dict]) -> Iterator[PartModel]:
+    '''convert loaded library snapshot records to part models
+
+    Each record is removed as it is converted, so the nested dictionaries and the
+    models for the whole library are never all in memory at once'''
+    for path in list(records):
+        yield PartModel.from_snapshot(path, records.pop(path))
+# end def snapshot_models:
+
+# variables
+#   cSpell:words
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+lint a reproducible random sample of a library, for quick rule prevalence estimates
+
+The sample is stratified by part source folder (core, contrib, user, obsolete): each
+folder gets its share of the sample, in proportion to the number of parts in it, so
+a small folder is not missed by chance. Only the directory entries are collected
+before sampling, and only the sampled parts are read and linted.
+
+For every rule, the report shows the fraction of sampled parts with at least one
+finding, with a Wilson score confidence interval, for each folder and overall. The
+overall estimate weights each folder by its share of the population (a stratified
+estimate), since small folders get at least one part, so are over represented in
+the sample.
+'''
+
+# pipenv shell
+# pipenv run pylint part_sample.py
+
+# standard library imports
+import os
+import re
+import math
+import random
+import argparse
+from typing import Dict, Iterable, List, Tuple
+
+PART_SAMPLE_VERSION = '0.0.1'
+CONFIDENCE_Z = 1.96 # 95%
+
+
+def sample_size(source: str) -> Tuple[str, float]:
+    '''get («count», N) or («fraction», P / 100) from «N» or «P%», for argparse'''
+    size_match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(%?)\s*', source)
+    if size_match is None:
+        raise argparse.ArgumentTypeError('"{0}" is not a count or percentage'.format(source))
+    if size_match.group(2):
+        fraction = float(size_match.group(1)) / 100
+        if not 0 < fraction <= 1:
+            raise argparse.ArgumentTypeError('"{0}" is not between 0 and 100%'.format(source))
+        return 'fraction', fraction
+    if '.' in size_match.group(1) or int(size_match.group(1)) < 1:
+        raise argparse.ArgumentTypeError('"{0}" is not a whole number of parts'.format(source))
+    return 'count', int(size_match.group(1))
+# end def sample_size:
+
+
+def part_stratum(part_path: str) -> str:
+    '''get the stratum (source folder name) for a part file'''
+    return os.path.basename(os.path.dirname(os.path.abspath(part_path)))
+# end def part_stratum:
+
+
+def wilson_interval(hits: int, total: int, z_score: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    '''get the (low, high) Wilson score interval for a proportion'''
+    if total == 0:
+        return 0.0, 1.0
+    proportion = hits / total
+    scale = 1 + z_score * z_score / total
+    center = (proportion + z_score * z_score / (2 * total)) / scale
+    spread = z_score * math.sqrt(
+        proportion * (1 - proportion) / total + z_score * z_score / (4 * total * total)) / scale
+    return max(0.0, center - spread), min(1.0, center + spread)
+# end def wilson_interval:
+
+
+def allocate(stratum_sizes: Dict[str, int], size: Tuple[str, float]) -> Dict[str, int]:
+    '''split the sample size between the strata, in proportion to their sizes
+
+    Uses the largest remainder for the rounding, and gives every non empty stratum at
+    least one part when the sample is big enough for that'''
+    population = sum(stratum_sizes.values())
+    kind, amount = size
+    wanted = min(population, round(population * amount) if kind == 'fraction' else amount)
+    if population == 0:
+        return {stratum: 0 for stratum in stratum_sizes}
+    exact = {stratum: wanted * count / population for stratum, count in stratum_sizes.items()}
+    shares = {stratum: int(share) for stratum, share in exact.items()}
+    by_remainder = sorted(exact, key=lambda stratum: (shares[stratum] - exact[stratum], stratum))
+    for stratum in by_remainder[:wanted - sum(shares.values())]:
+        shares[stratum] += 1
+    if wanted >= len(stratum_sizes):
+        for stratum, count in stratum_sizes.items():
+            if count and not shares[stratum]:
+                largest = max(shares, key=lambda name: (shares[name], name))
+                shares[largest] -= 1
+                shares[stratum] = 1
+    return shares
+# end def allocate:
+
+
+class StratifiedSample:
+    '''draw a reproducible stratified sample from a stream of part file entries'''
+    def __init__(self, size: Tuple[str, float], seed: int = 0):
+        self.size = size
+        self.seed = seed
+        self.population = {}
+        self.sampled = {}
+    # end def __init__:
+
+    def select(self, part_entries: Iterable) -> List:
+        '''get the sampled entries, in a stable order
+
+        Each stratum is sorted by path before sampling, so the same library and seed
+        always give the same sample, whatever order the folders are scanned in'''
+        strata = {}
+        for entry in part_entries:
+            strata.setdefault(part_stratum(entry.path), []).append(entry)
+        self.population = {stratum: len(entries) for stratum, entries in strata.items()}
+        shares = allocate(self.population, self.size)
+        generator = random.Random(self.seed)
+        selected = []
+        for stratum in sorted(strata):
+            entries = sorted(strata[stratum], key=lambda entry: entry.path)
+            chosen = sorted(generator.sample(range(len(entries)), shares[stratum]))
+            self.sampled[stratum] = len(chosen)
+            selected.extend(entries[index] for index in chosen)
+        return selected
+    # end def select:
+# end class StratifiedSample:
+
+
+class PrevalenceReport:
+    '''count the sampled parts with findings for each rule, by stratum'''
+    def __init__(self, sample: StratifiedSample):
+        self.sample = sample
+        self.linted = {}
+        # rule: {stratum: parts with at least one finding}
+        self.hits = {}
+    # end def __init__:
+
+    def add(self, part_path: str, exceptions: Dict[str, List[dict]]) -> None:
+        '''count the rules with findings for a single sampled part'''
+        stratum = part_stratum(part_path)
+        self.linted[stratum] = self.linted.get(stratum, 0) + 1
+        for rule in {finding['key'] for findings in exceptions.values() for finding in findings}:
+            rule_hits = self.hits.setdefault(rule, {})
+            rule_hits[stratum] = rule_hits.get(stratum, 0) + 1
+    # end def add:
+
+    @staticmethod
+    def format_line(label: str, hits: int, total: int) -> str:
+        '''show one prevalence estimate'''
+        low, high = wilson_interval(hits, total)
+        return '  {0:>10} {1:>6}/{2:<6} {3:6.1%}  ({4:.1%} - {5:.1%})'.format(
+            label, hits, total, hits / total if total else 0, low, high)
+    # end def format_line:
+
+    def stratum_weights(self) -> Dict[str, float]:
+        '''get the population share of each stratum with linted parts'''
+        population = sum(self.sample.population.get(stratum, 0) for stratum in self.linted)
+        if not population:
+            return {}
+        return {stratum: self.sample.population.get(stratum, 0) / population
+                for stratum in self.linted}
+    # end def stratum_weights:
+
+    def effective_size(self) -> float:
+        '''get the (Kish) effective sample size for the stratified estimate'''
+        weights = self.stratum_weights()
+        spread = sum(weight * weight / self.linted[stratum]
+                     for stratum, weight in weights.items())
+        return 1 / spread if spread else 0.0
+    # end def effective_size:
+
+    def overall_line(self, rule_hits: Dict[str, int]) -> str:
+        '''show the stratified prevalence estimate for all of the strata
+
+        Each stratum proportion is weighted by its population share. The interval is
+        the Wilson interval for that proportion at the effective sample size'''
+        weights = self.stratum_weights()
+        proportion = sum(weight * rule_hits.get(stratum, 0) / self.linted[stratum]
+                         for stratum, weight in weights.items())
+        size = self.effective_size()
+        low, high = wilson_interval(proportion * size, size) if size else (0.0, 1.0)
+        return '  {0:>10} {1:>6}/{2:<6} {3:6.1%}  ({4:.1%} - {5:.1%})'.format(
+            'all', sum(rule_hits.values()), sum(self.linted.values()), proportion, low, high)
+    # end def overall_line:
+
+    def report(self) -> None:
+        '''show the estimated prevalence of every rule found, with confidence intervals'''
+        total = sum(self.linted.values())
+        print('sampled {0} of {1} parts (seed {2}): {3}'.format(
+            total, sum(self.sample.population.values()), self.sample.seed,
+            ', '.join('{0} {1}/{2}'.format(stratum, self.linted.get(stratum, 0), count)
+                      for stratum, count in sorted(self.sample.population.items()))))
+        print('rule prevalence, parts with at least one finding ({0:.0%} interval)'.format(
+            math.erf(CONFIDENCE_Z / math.sqrt(2))))
+        for rule, rule_hits in sorted(self.hits.items()):
+            print(rule)
+            print(self.overall_line(rule_hits))
+            for stratum, linted in sorted(self.linted.items()):
+                print(self.format_line(stratum, rule_hits.get(stratum, 0), linted))
+        size = self.effective_size()
+        print('rules without findings in the sample are in under {0:.1%} of the parts'.format(
+            wilson_interval(0, size)[1] if size else 1.0))
+    # end def report:
+# end class PrevalenceReport:
+
+# variables
+#   cSpell:words
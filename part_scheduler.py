@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+spread per file work over worker processes, biggest files first
+
+With a plain parallel map, a few very large parts or images can be the last items in
+the queue, leaving one worker running long after the others are done. Here the files
+are ordered by size (from the directory entry stat, which the scandir based walk
+already has), and handed out largest first. Every worker takes its next file from
+the same shared queue as soon as it is free, so the small files at the end fill in
+around the big ones, and the elapsed time tracks the total work divided by the
+number of workers.
+'''
+
+# pipenv shell
+# pipenv run pylint part_scheduler.py
+
+# standard library imports
+import os
+import posix
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+PART_SCHEDULER_VERSION = '0.0.1'
+# files queued ahead for each worker, so a worker never waits for the next submit
+QUEUED_PER_WORKER = 2
+
+
+def entry_size(file_entry) -> int:
+    '''get the size of a file from its directory entry (or path), 0 when unknown'''
+    try:
+        if isinstance(file_entry, str):
+            return os.stat(file_entry).st_size
+        entry_stat = file_entry.stat()
+        if entry_stat is None: # PseudoDirEntry without a cached stat
+            entry_stat = os.stat(file_entry.path)
+        return entry_stat.st_size
+    except OSError:
+        return 0
+# end def entry_size:
+
+
+def largest_first(file_entries: Iterable) -> List[Tuple[int, posix.DirEntry]]:
+    '''get (size, entry) pairs, biggest first, ties in path order'''
+    sized = [(entry_size(entry), entry) for entry in file_entries]
+    sized.sort(key=lambda item: (-item[0], os.fspath(item[1])))
+    return sized
+# end def largest_first:
+
+
+def scheduled_map(function: Callable, file_entries: Iterable, workers: int,
+                  initializer: Callable = None, initargs: tuple = ()) -> Iterator:
+    '''run function(path) for every file entry in worker processes, largest files first,
+    yielding (entry, result) pairs in completion order
+
+    Only the path is sent to the worker, since directory entries can not be pickled'''
+    pending = iter(largest_first(file_entries))
+    in_progress = {}
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        while True:
+            while len(in_progress) < workers * QUEUED_PER_WORKER:
+                next_item = next(pending, None)
+                if next_item is None:
+                    break
+                in_progress[pool.submit(function, os.fspath(next_item[1]))] = next_item[1]
+            if not in_progress:
+                return
+            done, _running = wait(in_progress, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_progress.pop(future), future.result()
+# end def scheduled_map:
+
+# variables
+#   cSpell:words initargs
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+live progress, throughput and estimated time to completion for a library run
+
+Shows the parts done out of the expected total, parts and bytes per second, the
+findings so far, and the estimated time remaining. The total comes from a quick count
+of the part files in the library folders (the same scan as count_parts), before any
+part is read. When the files are filtered (by pattern or bin), there is no total, and
+so no time remaining. Either a single status line on stderr, redrawn in place, or one
+JSON status object per line, for other tools to follow. When stdout is the same
+terminal, the status line is cleared before anything else is printed, and drawn
+again at the next update.
+
+Each part only adds to a few counters. The status is written at most once per
+interval, so the overhead does not depend on how fast parts are processed. In the
+default (auto) mode, progress is only shown when stderr is a terminal.
+'''
+
+# pipenv shell
+# pipenv run pylint progress.py
+
+# standard library imports
+import sys
+import json
+import time
+import datetime
+from typing import Dict, List, TextIO
+
+from memory_report import format_size
+
+PROGRESS_VERSION = '0.0.1'
+PROGRESS_CHOICES = ('auto', 'bar', 'json', 'off')
+# minimum seconds between status updates
+PROGRESS_INTERVAL = 0.5
+
+
+def format_duration(seconds: float) -> str:
+    '''show a (not negative) number of seconds as h:mm:ss, or - when unknown'''
+    if seconds is None:
+        return '-'
+    return str(datetime.timedelta(seconds=round(seconds)))
+# end def format_duration:
+
+
+class StatusLineClearing:
+    '''a text stream wrapper that clears the progress status line before every write'''
+    def __init__(self, stream: TextIO, reporter: 'ProgressReporter'):
+        self.stream = stream
+        self.reporter = reporter
+    # end def __init__:
+
+    def write(self, text: str) -> int:
+        '''clear any status line, then write to the wrapped stream'''
+        self.reporter.clear()
+        return self.stream.write(text)
+    # end def write:
+
+    def __getattr__(self, name: str):
+        '''everything else goes to the wrapped stream'''
+        return getattr(self.stream, name)
+    # end def __getattr__:
+# end class StatusLineClearing:
+
+
+class ProgressReporter:
+    '''track and show the progress of a run over an (estimated) number of files
+
+    A total of None means the number of files is not known'''
+    def __init__(self, total: int, mode: str = 'auto', stream: TextIO = None,
+                 interval: float = PROGRESS_INTERVAL):
+        self.stream = sys.stderr if stream is None else stream
+        if mode == 'auto':
+            mode = 'bar' if self.stream.isatty() else 'off'
+        self.mode = mode
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.bytes = 0
+        self.findings = 0
+        self.start = time.perf_counter()
+        self.next_update = self.start + interval
+        self.line_width = 0
+        self.stdout = None
+        if self.mode == 'bar' and self.stream.isatty() and sys.stdout.isatty():
+            # both on the terminal: keep the normal output from running into the status
+            self.stdout = sys.stdout
+            sys.stdout = StatusLineClearing(self.stdout, self)
+    # end def __init__:
+
+    @property
+    def enabled(self) -> bool:
+        '''check if progress is being shown'''
+        return self.mode != 'off'
+    # end def enabled:
+
+    def add(self, size: int, exceptions: Dict[str, List[dict]]) -> None:
+        '''count a completed file, and show the status when it is due'''
+        self.done += 1
+        self.bytes += size
+        self.findings += sum(len(findings) for findings in exceptions.values())
+        if self.mode != 'off':
+            now = time.perf_counter()
+            if now >= self.next_update:
+                self.next_update = now + self.interval
+                self.show(now)
+    # end def add:
+
+    def status(self, now: float) -> dict:
+        '''get the current progress figures'''
+        elapsed = now - self.start
+        # the pre-count is an estimate, the total is never less than what is done
+        total = None if self.total is None else max(self.total, self.done)
+        files_rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = None
+        if files_rate > 0 and total is not None:
+            remaining = (total - self.done) / files_rate
+        return {
+            'done': self.done,
+            'total': total,
+            'elapsed': round(elapsed, 3),
+            'files_per_second': round(files_rate, 2),
+            'bytes_per_second': round(self.bytes / elapsed if elapsed > 0 else 0.0),
+            'bytes': self.bytes,
+            'findings': self.findings,
+            'eta_seconds': None if remaining is None else round(remaining, 1)
+        }
+    # end def status:
+
+    def show(self, now: float, final: bool = False) -> None:
+        '''write the status, as a redrawn line or a JSON line'''
+        status = self.status(now)
+        if self.mode == 'json':
+            status['final'] = final
+            self.stream.write(json.dumps(status) + '\n')
+        else:
+            if status['total'] is None:
+                done = '{0} parts'.format(status['done'])
+            else:
+                done = '{0}/{1} parts {2:.1%}'.format(
+                    status['done'], status['total'],
+                    status['done'] / status['total'] if status['total'] else 1.0)
+            line = '{0}  {1:.1f} parts/s  {2}/s  {3} findings'.format(
+                done, status['files_per_second'], format_size(status['bytes_per_second']),
+                status['findings'])
+            if final:
+                line += '  elapsed ' + format_duration(status['elapsed'])
+            elif status['total'] is not None:
+                line += '  ETA ' + format_duration(status['eta_seconds'])
+            if self.stdout is not None:
+                self.stdout.flush() # the normal output first
+            # pad over any longer previous line
+            self.stream.write('\r' + line.ljust(self.line_width) + ('\n' if final else ''))
+            self.line_width = 0 if final else len(line)
+        self.stream.flush()
+    # end def show:
+
+    def clear(self) -> None:
+        '''remove the status line, when one is showing'''
+        if self.line_width:
+            self.stream.write('\r' + ' ' * self.line_width + '\r')
+            self.stream.flush()
+            self.line_width = 0
+    # end def clear:
+
+    def finish(self) -> None:
+        '''show the final status'''
+        if self.mode != 'off':
+            self.show(time.perf_counter(), final=True)
+        if self.stdout is not None:
+            sys.stdout = self.stdout
+            self.stdout = None
+    # end def finish:
+# end class ProgressReporter:
+
+# variables
+#   cSpell:words
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+keep count and lint run results in a local SQLite database, for ad-hoc queries
+
+Every run adds a row to «runs», with the parts and findings (lint runs) or the
+folder counts (count runs) linked to it. All rows for a run are inserted in batches,
+inside a single transaction, so an interrupted run leaves nothing behind. Another
+run on the same database waits (up to LOCK_WAIT_SECONDS) for that transaction to
+finish before starting its own. The findings rule key and severity, and the part
+family and source folder are indexed.
+
+    result_store.py lint.sqlite "SELECT p.path FROM findings f JOIN parts p
+        USING (part_id) WHERE f.rule = 'bad_layer4image' AND p.source = 'contrib'
+        AND f.context LIKE '%pcbView%' AND f.run_id = (SELECT max(run_id) FROM runs)"
+'''
+
+# pipenv shell
+# pipenv run pylint result_store.py
+
+# standard library imports
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from typing import Dict, List
+
+# local application/library specific imports
+from baseline import finding_fingerprint
+
+RESULT_STORE_VERSION = '0.0.1'
+BATCH_SIZE = 1000
+# how long a run waits for another run on the same database to be committed
+LOCK_WAIT_SECONDS = 600
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY, tool TEXT NOT NULL, library TEXT, arguments TEXT,
+    started REAL NOT NULL, finished REAL, parts INTEGER, findings INTEGER);
+CREATE TABLE IF NOT EXISTS parts (
+    part_id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL REFERENCES runs,
+    path TEXT NOT NULL, source TEXT, module_id TEXT, family TEXT, error TEXT,
+    suppressed INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id INTEGER NOT NULL REFERENCES runs, part_id INTEGER NOT NULL REFERENCES parts,
+    rule TEXT NOT NULL, severity TEXT NOT NULL, value TEXT, context TEXT,
+    fingerprint TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS counts (
+    run_id INTEGER NOT NULL REFERENCES runs, part_set TEXT, source TEXT, view TEXT,
+    kind TEXT NOT NULL, count INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS findings_rule ON findings (rule);
+CREATE INDEX IF NOT EXISTS findings_severity ON findings (severity);
+CREATE INDEX IF NOT EXISTS findings_part ON findings (part_id);
+CREATE INDEX IF NOT EXISTS parts_family ON parts (family);
+CREATE INDEX IF NOT EXISTS parts_source ON parts (source);
+CREATE INDEX IF NOT EXISTS parts_run ON parts (run_id);
+CREATE INDEX IF NOT EXISTS counts_run ON counts (run_id);
+'''
+COMPARE_QUERY = '''
+SELECT rule, severity, sum(run_id = :old), sum(run_id = :new)
+FROM findings WHERE run_id IN (:old, :new) GROUP BY rule, severity ORDER BY rule, severity
+'''
+
+
+def json_value(value) -> str:
+    '''get the text stored for a finding value or context'''
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, default=str)
+# end def json_value:
+
+
+class ResultStore:
+    '''add the results of a single count or lint run to a SQLite database'''
+    def __init__(self, database_path: str, tool: str, library: str = None,
+                 arguments: dict = None):
+        self.connection = sqlite3.connect(database_path, timeout=LOCK_WAIT_SECONDS)
+        self.connection.executescript(SCHEMA)
+        self.pending = {'parts': [], 'findings': [], 'counts': []}
+        self.totals = {'parts': 0, 'findings': 0}
+        # the run is a single write transaction. Starting it before the part ids are
+        # read makes another run wait, instead of reusing the same ids
+        self.connection.execute('BEGIN IMMEDIATE')
+        # part ids are assigned here, so the findings can be batched with their parts
+        self.next_part_id = self.connection.execute(
+            'SELECT coalesce(max(part_id), 0) + 1 FROM parts').fetchone()[0]
+        self.run_id = self.connection.execute(
+            'INSERT INTO runs (tool, library, arguments, started) VALUES (?, ?, ?, ?)',
+            (tool, library,
+             json.dumps(arguments or {}, default=str, sort_keys=True), time.time())).lastrowid
+    # end def __init__:
+
+    def add_part(self, part_path: str, data_set: dict, exceptions: Dict[str, List[dict]],
+                 error: str = None) -> None:
+        '''save a linted part, with all of its findings'''
+        part_id = self.next_part_id
+        self.next_part_id += 1
+        self.pending['parts'].append((
+            part_id, self.run_id, part_path,
+            os.path.basename(os.path.dirname(os.path.abspath(part_path))),
+            data_set.get('module_id'), data_set.get('properties', {}).get('family'), error,
+            len(data_set.get('suppressed', ()))))
+        for severity, findings in exceptions.items():
+            for finding in findings:
+                self.pending['findings'].append((
+                    self.run_id, part_id, finding['key'], severity,
+                    json_value(finding['value']), json_value(finding['context']),
+                    finding_fingerprint(part_path, finding, data_set.get('layer', 0))))
+        self.totals['parts'] += 1
+        self.totals['findings'] += sum(len(findings) for findings in exceptions.values())
+        if len(self.pending['findings']) + len(self.pending['parts']) >= BATCH_SIZE:
+            self.flush()
+    # end def add_part:
+
+    def add_counts(self, part_set: str, source: str, view: str, counts: Dict[str, int]) -> None:
+        '''save the file counts for a part source, or view image, folder'''
+        self.pending['counts'].extend(
+            (self.run_id, part_set, source, view, kind, count)
+            for kind, count in counts.items() if isinstance(count, int))
+        if len(self.pending['counts']) >= BATCH_SIZE:
+            self.flush()
+    # end def add_counts:
+
+    def flush(self) -> None:
+        '''insert the pending rows (the transaction stays open)'''
+        self.connection.executemany(
+            'INSERT INTO parts VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self.pending['parts'])
+        self.connection.executemany(
+            'INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?)', self.pending['findings'])
+        self.connection.executemany(
+            'INSERT INTO counts VALUES (?, ?, ?, ?, ?, ?)', self.pending['counts'])
+        for rows in self.pending.values():
+            rows.clear()
+    # end def flush:
+
+    def finish(self) -> None:
+        '''complete the run, then commit everything for it at once'''
+        self.flush()
+        self.connection.execute(
+            'UPDATE runs SET finished = ?, parts = ?, findings = ? WHERE run_id = ?',
+            (time.time(), self.totals['parts'], self.totals['findings'], self.run_id))
+        self.connection.commit()
+        self.connection.close()
+    # end def finish:
+# end class ResultStore:
+
+
+class CommandLineParser:
+    '''handle command line argument parsing'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.parser = CommandLineParser.build_parser()
+        self.command_arguments = self.parser.parse_args()
+
+    @staticmethod
+    def build_parser() -> argparse.ArgumentParser:
+        '''create command line argument parser'''
+        parser = argparse.ArgumentParser(description='Fritzing lint result store query')
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + RESULT_STORE_VERSION)
+        parser.add_argument('database', metavar='Database',
+                            help='SQLite database written by parse_fzp or count_parts --store')
+        parser.add_argument('query', metavar='SQL', nargs='?',
+                            help='query to run. Without one, the runs are listed')
+        parser.add_argument('--compare', nargs=2, type=int, metavar=('old', 'new'),
+                            help='show the finding counts by rule for two runs')
+        return parser
+    # end def build_parser:
+# end class CommandLineParser:
+
+
+def my_main() -> None:
+    '''wrapper for test/start code so that variables do not look like constants'''
+    cli_parser = CommandLineParser()
+    cmd_args = cli_parser.command_arguments
+    if not os.path.isfile(cmd_args.database):
+        cli_parser.parser.error('"{0}" does not exist'.format(cmd_args.database))
+    connection = sqlite3.connect(cmd_args.database)
+    try:
+        if cmd_args.compare is not None:
+            old_run, new_run = cmd_args.compare
+            print('{0:>24} {1:>12} {2:>8} {3:>8} {4:>8}'.format(
+                'rule', 'severity', old_run, new_run, 'change'))
+            for rule, severity, old_count, new_count in connection.execute(
+                    COMPARE_QUERY, {'old': old_run, 'new': new_run}):
+                print('{0:>24} {1:>12} {2:>8} {3:>8} {4:>+8}'.format(
+                    rule, severity, old_count, new_count, new_count - old_count))
+        elif cmd_args.query is not None:
+            cursor = connection.execute(cmd_args.query)
+            if cursor.description is not None:
+                print('\t'.join(column[0] for column in cursor.description))
+            for row in cursor:
+                print('\t'.join('' if value is None else str(value) for value in row))
+        else:
+            for row in connection.execute(
+                    "SELECT run_id, tool, library, datetime(started, 'unixepoch'),"
+                    ' round(finished - started, 2), parts, findings FROM runs ORDER BY run_id'):
+                print('run {0}: {1} {2} at {3} ({4}s) parts {5} findings {6}'.format(*row))
+    except sqlite3.Error as exc:
+        sys.exit('query failed: {0}'.format(exc))
+    finally:
+        connection.close()
+# end def my_main:
+
+# Standalone module execution
+if __name__ == "__main__":
+    my_main()
+
+# variables
+#   cSpell:words sqlite unixepoch coalesce executemany executescript lastrowid
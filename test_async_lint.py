@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+tests for the asyncio lint interface: one bad source does not end the stream
+'''
+
+# pipenv shell
+# pipenv run python -m pytest test_async_lint.py
+
+# standard library imports
+import asyncio
+
+# local application/library specific imports
+from async_lint import lint_many
+
+GOOD_PART = (b'<module moduleId="x"><title>t</title>'
+             b'<properties><property name="family">f</property></properties>'
+             b'<views><breadboardView><layers image="breadboard/x.svg">'
+             b'<layer layerId="breadboard"/></layers></breadboardView></views>'
+             b'<connectors/></module>')
+EMPTY_LAYERS_PART = GOOD_PART.replace(b'<layer layerId="breadboard"/>', b'')
+
+
+async def collect(sources, concurrency: int) -> dict:
+    '''get the lint results by source name'''
+    return {result.source: result async for result in lint_many(
+        sources, concurrency=concurrency)}
+# end def collect:
+
+
+def test_bad_source_in_stream() -> None:
+    '''every source gets a result, including the ones after a part that can not be checked'''
+    sources = [('bad.fzp', EMPTY_LAYERS_PART)] + [
+        ('good{0}.fzp'.format(index), GOOD_PART) for index in range(5)] + [
+            '/nonexistent/part.fzp']
+    results = asyncio.run(collect(sources, 2))
+    assert set(results) == {source if isinstance(source, str) else source[0]
+                            for source in sources}
+    assert results['bad.fzp'].error.startswith('IndexError: ')
+    assert results['/nonexistent/part.fzp'].error.startswith('FileNotFoundError: ')
+    assert all(results['good{0}.fzp'.format(index)].error is None for index in range(5))
+# end def test_bad_source_in_stream:
+
+# variables
+#   cSpell:words
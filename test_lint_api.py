@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+tests for the in process lint interface: bad part definitions give error results
+'''
+
+# pipenv shell
+# pipenv run python -m pytest test_lint_api.py
+
+# standard library imports
+import pytest
+
+# local application/library specific imports
+from lint_api import lint_part
+
+PART_TEMPLATE = (b'<module moduleId="x"><title>t</title>'
+                 b'<properties><property name="family">f</property></properties>'
+                 b'<views>%s</views><connectors/></module>')
+
+
+@pytest.mark.parametrize('views, error', [
+    (b'<breadboardView><layers image="breadboard/x.svg"></layers></breadboardView>',
+     'IndexError'),
+    (b'<breadboardView/>', 'KeyError'),
+    (b'<breadboardView>', 'ParseError'),
+])
+def test_bad_part(views: bytes, error: str) -> None:
+    '''a part the checks can not handle is an error result, not an exception'''
+    result = lint_part(PART_TEMPLATE % views, {'xml_backend': 'defusedxml'}, 'bad.fzp')
+    assert result.source == 'bad.fzp'
+    assert result.error.startswith(error + ': ')
+    assert result.findings == ()
+# end def test_bad_part:
+
+
+def test_good_part() -> None:
+    '''a part the checks handle has no error'''
+    result = lint_part(PART_TEMPLATE % (
+        b'<breadboardView><layers image="breadboard/x.svg">'
+        b'<layer layerId="breadboard"/></layers></breadboardView>'), None, 'good.fzp')
+    assert result.error is None
+    assert result.module_id == 'x'
+    assert result.family == 'f'
+# end def test_good_part:
+
+# variables
+#   cSpell:words
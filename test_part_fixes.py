@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+tests for the in place part fixes: element byte positions and the patched files
+'''
+
+# pipenv shell
+# pipenv run python -m pytest test_part_fixes.py
+
+# standard library imports
+import os
+import stat
+import pytest
+
+# local application/library specific imports
+from part_fixes import element_spans, fix_part
+
+
+@pytest.mark.parametrize('content, path, expected', [
+    (b'<a><x></x></a>', 'a/x', b'<x></x>'),
+    (b'<a><x/></a>', 'a/x', b'<x/>'),
+    (b'<a><x /></a>', 'a/x', b'<x />'),
+    (b'<a><x>t</x></a>', 'a/x', b'<x>t</x>'),
+    (b'<a><x></x ></a>', 'a/x', b'<x></x >'),
+])
+def test_element_spans(content: bytes, path: str, expected: bytes) -> None:
+    '''the span of an element covers the start tag through the end tag'''
+    spans = [span for span in element_spans(content) if span.path == path]
+    assert [content[span.start:span.end] for span in spans] == [expected]
+# end def test_element_spans:
+
+
+@pytest.mark.parametrize('repeated', [b'<title></title>', b'<title/>', b'<title>LED</title>'])
+def test_fix_duplicate_element(tmp_path, repeated: bytes) -> None:
+    '''only the later copy of a repeated supporting element is removed'''
+    part_path = tmp_path / 'part.fzp'
+    part_path.write_bytes(b'<module>\n  ' + repeated + b'\n  ' + repeated + b'\n</module>\n')
+    summary = fix_part(str(part_path), [
+        {'key': 'dup_support_ele', 'value': 'title', 'context': ['root']}])
+    assert summary['error'] is None
+    assert summary['rules'] == {'dup_support_ele': 1}
+    assert part_path.read_bytes() == b'<module>\n  ' + repeated + b'\n</module>\n'
+# end def test_fix_duplicate_element:
+
+
+def test_fix_linked_part(tmp_path) -> None:
+    '''a linked part file is fixed where it is, keeping the link and the file mode'''
+    real_path = tmp_path / 'shared.fzp'
+    real_path.write_bytes(b'<module>\n  <title/>\n  <title/>\n</module>\n')
+    os.chmod(str(real_path), 0o664)
+    link_path = tmp_path / 'part.fzp'
+    link_path.symlink_to(real_path)
+    summary = fix_part(str(link_path), [
+        {'key': 'dup_support_ele', 'value': 'title', 'context': ['root']}])
+    assert summary['error'] is None
+    assert link_path.is_symlink()
+    assert real_path.read_bytes() == b'<module>\n  <title/>\n</module>\n'
+    assert stat.S_IMODE(real_path.stat().st_mode) == 0o664
+# end def test_fix_linked_part:
+
+# variables
+#   cSpell:words
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+'''
+tests for the part file selection patterns: glob matching and folder pruning
+'''
+
+# pipenv shell
+# pipenv run python -m pytest test_path_pattern.py
+
+# standard library imports
+import pytest
+
+# local application/library specific imports
+from yield_parts import PathPattern, PatternSelector
+
+
+@pytest.mark.parametrize('pattern, path, expected', [
+    ('*.fzp', 'core/led.fzp', True),
+    ('*.fzp', 'led.fzp', True),
+    ('*.fzp', 'core/led.fzp.bak', False),
+    ('core/*.fzp', 'core/led.fzp', True),
+    ('core/*.fzp', 'contrib/led.fzp', False),
+    ('core/*.fzp', 'core/sub/led.fzp', False),
+    ('core/?ed.fzp', 'core/led.fzp', True),
+    ('core/[!l]ed.fzp', 'core/led.fzp', False),
+    ('core/**/*.fzp', 'core/led.fzp', True),
+    ('core/**/*.fzp', 'core/a/b/led.fzp', True),
+    ('svg/**', 'svg/core/breadboard/led.svg', True),
+    ('svg/**', 'core/led.fzp', False),
+    ('re:.*/led\\.fzp$', 'core/led.fzp', True),
+    ('re:.*/led\\.fzp$', 'core/dip8.fzp', False),
+])
+def test_matches(pattern: str, path: str, expected: bool) -> None:
+    '''glob and regular expression patterns against relative file paths'''
+    assert PathPattern(pattern).matches(path) is expected
+# end def test_matches:
+
+
+@pytest.mark.parametrize('pattern, folder, expected', [
+    ('*.fzp', 'anything/deep', True), # name only globs never prune
+    ('re:core/.*', 'contrib', True), # nor do regular expressions
+    ('core/*.fzp', '', True),
+    ('core/*.fzp', 'core', True),
+    ('core/*.fzp', 'contrib', False),
+    ('core/*.fzp', 'core/sub', False), # deeper than the pattern
+    ('svg/**', 'svg', True),
+    ('svg/**', 'svg/core', True),
+    ('svg/**', 'svg/core/breadboard', True),
+    ('svg/**', 'core', False),
+    ('svg/core/**', 'svg/core/breadboard', True),
+    ('svg/core/**', 'svg/contrib', False),
+    ('svg/**/*.svg', 'svg/core/breadboard', True),
+    ('svg/*/breadboard/*.svg', 'svg/core/breadboard', True),
+    ('svg/*/breadboard/*.svg', 'svg/core/pcb', False),
+])
+def test_could_match_below(pattern: str, folder: str, expected: bool) -> None:
+    '''folders are only pruned when nothing below them can match'''
+    assert PathPattern(pattern).could_match_below(folder) is expected
+# end def test_could_match_below:
+
+
+@pytest.mark.parametrize('patterns, folder, expected', [
+    ([], 'core', True),
+    (['svg/core/**'], 'svg', True),
+    (['svg/core/**'], 'svg/core/breadboard', True),
+    (['svg/core/**'], 'core', False),
+    (['!obsolete'], 'obsolete', False),
+    (['!obsolete'], 'core', True),
+    (['core/*.fzp', '!core'], 'core', False), # exclusion wins
+])
+def test_may_enter(patterns: list, folder: str, expected: bool) -> None:
+    '''folder pruning for a combination of include and exclude patterns'''
+    assert PatternSelector(patterns).may_enter(folder) is expected
+# end def test_may_enter:
+
+
+@pytest.mark.parametrize('patterns, path, expected', [
+    ([], 'core/led.fzp', True),
+    (['core/*.fzp'], 'core/led.fzp', True),
+    (['core/*.fzp'], 'user/led.fzp', False),
+    (['*.fzp', '!obsolete/**'], 'obsolete/old.fzp', False),
+    (['*.fzp', '!obsolete/**'], 'core/led.fzp', True),
+    (['!*dip*'], 'core/dip8.fzp', False),
+])
+def test_selects(patterns: list, path: str, expected: bool) -> None:
+    '''file selection for a combination of include and exclude patterns'''
+    assert PatternSelector(patterns).selects(path) is expected
+# end def test_selects:
+
+# variables
+#   cSpell:words
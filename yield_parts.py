@@ -22,10 +22,16 @@ for file_path in instance.iteration:
 # standard library imports
 import os
 import posix
+import re
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
 
 # local application/library specific imports
 # from myutilities import ExistingDir
+from part_bins import ModuleIdIndex, BinResolver
 
 YIELD_PARTS_VERSION = '0.0.1'
 
@@ -44,6 +50,171 @@ def scan_directory_files(
 # end def scan_directory_files:
 
 
+def read_file_content(file_entry: posix.DirEntry, max_bytes: int = None) -> bytes:
+    '''get the full (binary) content of a file in a single read
+
+    None when the file is bigger than «max_bytes». No more than one byte over the limit
+    is read, and the file is left for the (size limited) parser to report'''
+    with open(file_entry.path, 'rb') as file_handle:
+        if max_bytes is None:
+            return file_handle.read()
+        content = file_handle.read(max_bytes + 1)
+    return None if len(content) > max_bytes else content
+# end def read_file_content:
+
+
+def inode_sort_key(file_entry: posix.DirEntry) -> int:
+    '''get the inode number for a file, without a stat call when the entry already has it'''
+    if hasattr(file_entry, 'inode'):
+        return file_entry.inode()
+    return os.stat(file_entry.path).st_ino
+# end def inode_sort_key:
+
+
+def read_ahead(
+        file_entries: Iterable[posix.DirEntry], workers: int = 4, window: int = 32,
+        inode_order: bool = False,
+        max_bytes: int = None) -> Iterator[Tuple[posix.DirEntry, bytes]]:
+    '''yield (entry, content) pairs, with the next files being read in background threads
+
+    Up to «window» files are read ahead of the consumer, so file reads overlap the
+    processing of the content already yielded. With «inode_order», each window of
+    entries is read in inode number order, which reduces seeking on spinning disks.
+    That changes the order the files are yielded in. A file bigger than «max_bytes» is
+    not buffered, and gives None content. A read error is raised when the entry for
+    that file would have been yielded'''
+    entries = iter(file_entries)
+    if inode_order:
+        entries = inode_ordered(entries, window)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='read_ahead') as pool:
+        for file_entry in islice(entries, window):
+            pending.append((file_entry, pool.submit(read_file_content, file_entry, max_bytes)))
+        while pending:
+            file_entry, content = pending.popleft()
+            for next_entry in islice(entries, 1):
+                pending.append((next_entry, pool.submit(
+                    read_file_content, next_entry, max_bytes)))
+            yield file_entry, content.result()
+# end def read_ahead:
+
+
+def inode_ordered(
+        file_entries: Iterator[posix.DirEntry], window: int) -> Iterator[posix.DirEntry]:
+    '''regroup a sequence of file entries, sorting each window sized block by inode'''
+    while True:
+        block = list(islice(file_entries, window))
+        if not block:
+            return
+        block.sort(key=inode_sort_key)
+        for file_entry in block:
+            yield file_entry
+# end def inode_ordered:
+
+
+class LinkWalker:
+    '''scan folders following symbolic links, visiting each physical folder and file once
+
+    Folders and files are identified by (device, inode), so a file reached through
+    several links (or hard links) is only offered the first time. A link to a folder
+    that is still being walked (like an ancestor) is a cycle, and is not entered.
+    Linked files are deferred until all of the real files have been offered, so the
+    real path is the one used for a file that is reached both ways. stat results are
+    cached, since the same targets are checked repeatedly.'''
+    def __init__(self):
+        self.stat_cache = {}
+        self.seen_files = set()
+        self.seen_folders = set()
+        self.open_folders = set()
+        self.linked_files = []
+        self.statistics = {'duplicate_files': 0, 'duplicate_folders': 0, 'cycles': 0,
+                           'broken_links': 0}
+    # end def __init__:
+
+    def stat(self, path: str) -> os.stat_result:
+        '''get the (link following) stat result for a path, or None when it does not exist'''
+        if path not in self.stat_cache:
+            try:
+                self.stat_cache[path] = os.stat(path)
+            except OSError:
+                self.stat_cache[path] = None
+        return self.stat_cache[path]
+    # end def stat:
+
+    def identity(self, entry: posix.DirEntry) -> Tuple[int, int]:
+        '''get the (device, inode) that an entry refers to, or None for a broken link'''
+        entry_stat = self.stat(entry.path)
+        if entry_stat is None:
+            return None
+        return entry_stat.st_dev, entry_stat.st_ino
+    # end def identity:
+
+    def enter(self, folder: posix.DirEntry) -> bool:
+        '''decide if a folder should be walked, and mark it as open when it is'''
+        folder_identity = self.identity(folder)
+        if folder_identity is None:
+            self.statistics['broken_links'] += 1
+            return False
+        if folder_identity in self.open_folders:
+            self.statistics['cycles'] += 1
+            return False
+        if folder_identity in self.seen_folders:
+            self.statistics['duplicate_folders'] += 1
+            return False
+        self.seen_folders.add(folder_identity)
+        self.open_folders.add(folder_identity)
+        return True
+    # end def enter:
+
+    def leave(self, folder: posix.DirEntry) -> None:
+        '''mark a folder as completely walked'''
+        self.open_folders.discard(self.identity(folder))
+    # end def leave:
+
+    def is_new_file(self, entry: posix.DirEntry) -> bool:
+        '''check (and remember) that the physical file for an entry has not been seen before'''
+        file_identity = self.identity(entry)
+        if file_identity is None:
+            self.statistics['broken_links'] += 1
+            return False
+        if file_identity in self.seen_files:
+            self.statistics['duplicate_files'] += 1
+            return False
+        self.seen_files.add(file_identity)
+        return True
+    # end def is_new_file:
+
+    def offer(self, entry: posix.DirEntry) -> bool:
+        '''decide if a (selected) file should be used now: links are deferred'''
+        if entry.is_symlink():
+            self.linked_files.append(entry)
+            return False
+        return self.is_new_file(entry)
+    # end def offer:
+
+    def deferred_files(self) -> posix.DirEntry:
+        '''return one linked file at a time, when its target has not already been seen'''
+        linked_files, self.linked_files = self.linked_files, []
+        for entry in linked_files:
+            if self.is_new_file(entry):
+                yield entry
+    # end def deferred_files:
+
+    @staticmethod
+    def real_first(entries: Iterable[posix.DirEntry]) -> List[posix.DirEntry]:
+        '''order folder entries with the real (not linked) ones first'''
+        return sorted(entries, key=lambda entry: (entry.is_symlink(), entry.name))
+    # end def real_first:
+
+    def report(self) -> None:
+        '''show what the link handling skipped'''
+        print('following links: skipped {duplicate_files} duplicate files, {duplicate_folders}'
+              ' duplicate folders, {cycles} folder cycles, {broken_links} broken links'.format(
+                  **self.statistics))
+    # end def report:
+# end class LinkWalker:
+
+
 class PseudoDirEntry:
     '''A fake posix.DirEntry instantiation'''
     def __init__(self, name, path):
@@ -65,9 +236,144 @@ class PseudoDirEntry:
     def stat(self):
         '''getter function to emulate DirEntry'''
         return self._stat
+
+    def __fspath__(self):
+        '''path protocol, so the entry can be opened the same as a DirEntry'''
+        return self.path
 # end class PseudoDirEntry:
 
 
+def glob_to_regex(pattern: str) -> str:
+    '''translate a path wildcard pattern to an (anchored) regular expression string
+
+    «*» and «?» do not match across «/» folder separators, while a «**» segment
+    matches zero or more complete folder levels'''
+    regex_parts = []
+    segments = pattern.split('/')
+    for index, segment in enumerate(segments):
+        is_last = index == len(segments) - 1
+        if segment == '**':
+            regex_parts.append('.*' if is_last else '(?:[^/]+/)*')
+            continue
+        position = 0
+        while position < len(segment):
+            char = segment[position]
+            if char == '*':
+                regex_parts.append('[^/]*')
+            elif char == '?':
+                regex_parts.append('[^/]')
+            elif char == '[' and ']' in segment[position + 2:]:
+                close = segment.index(']', position + 2)
+                char_class = segment[position + 1:close]
+                if char_class.startswith('!'):
+                    char_class = '^' + char_class[1:]
+                regex_parts.append('[' + char_class.replace('\\', '\\\\') + ']')
+                position = close
+            else:
+                regex_parts.append(re.escape(char))
+            position += 1
+        if not is_last:
+            regex_parts.append('/')
+    return '(?s:' + ''.join(regex_parts) + r')\Z'
+# end def glob_to_regex:
+
+
+class PathPattern:
+    '''a single compiled file selection pattern, matched against relative paths
+
+    A pattern is a wildcard (glob) expression, unless it starts with «re:», in which
+    case the rest of the pattern is a regular expression. A glob that does not contain
+    any «/» only needs to match the file name, in any folder.'''
+    REGEX_PREFIX = 're:'
+
+    def __init__(self, pattern: str):
+        self.source = pattern
+        self.segment_regex = None
+        if pattern.startswith(self.REGEX_PREFIX):
+            self.regex = re.compile(pattern[len(self.REGEX_PREFIX):])
+            self.name_only = False
+            return
+        glob = pattern.strip('/')
+        self.name_only = '/' not in glob
+        self.regex = re.compile(glob_to_regex(glob))
+        if not self.name_only:
+            self.segment_regex = tuple(
+                None if segment == '**' else re.compile(glob_to_regex(segment))
+                for segment in glob.split('/'))
+    # end def __init__:
+
+    def matches(self, relative_path: str) -> bool:
+        '''check if a relative (file or folder) path is matched by the pattern'''
+        if self.name_only:
+            return self.regex.match(relative_path.rpartition('/')[2]) is not None
+        return self.regex.match(relative_path) is not None
+    # end def matches:
+
+    def could_match_below(self, relative_folder: str) -> bool:
+        '''check if anything nested in a relative folder path could match the pattern
+
+        Regular expressions and name only globs can not be used to exclude a folder'''
+        if self.segment_regex is None:
+            return True
+        folder_segments = relative_folder.split('/') if relative_folder else []
+        for index, segment in enumerate(folder_segments):
+            if index < len(self.segment_regex) and self.segment_regex[index] is None:
+                return True # «**» can match any remaining depth
+            if index >= len(self.segment_regex) - 1:
+                return False # the folder is deeper than the pattern
+            if self.segment_regex[index].match(segment) is None:
+                return False
+        return True
+    # end def could_match_below:
+# end class PathPattern:
+
+
+class PatternSelector:
+    '''select files, and prune folders, using a set of include and exclude patterns
+
+    Patterns starting with «!» exclude matching files, and when the pattern matches a
+    folder, everything nested in it. A file is selected when it is not excluded, and
+    either no include patterns were given, or at least one include pattern matches.'''
+    EXCLUDE_PREFIX = '!'
+
+    def __init__(self, patterns: list):
+        self.include = []
+        self.exclude = []
+        for pattern in patterns:
+            if pattern.startswith(self.EXCLUDE_PREFIX):
+                self.exclude.append(PathPattern(pattern[len(self.EXCLUDE_PREFIX):]))
+            else:
+                self.include.append(PathPattern(pattern))
+    # end def __init__:
+
+    def may_enter(self, relative_folder: str) -> bool:
+        '''decide if a folder needs to be scanned at all'''
+        for pattern in self.exclude:
+            if pattern.matches(relative_folder):
+                return False
+        if not self.include:
+            return True
+        for pattern in self.include:
+            if pattern.could_match_below(relative_folder):
+                return True
+        return False
+    # end def may_enter:
+
+    def selects(self, relative_path: str) -> bool:
+        '''decide if a file (relative path) is part of the selected set'''
+        for pattern in self.exclude:
+            if pattern.matches(relative_path):
+                return False
+        if not self.include:
+            return True
+        for pattern in self.include:
+            if pattern.matches(relative_path):
+                return True
+        return False
+    # end def selects:
+# end class PatternSelector:
+
+
 class PartFinder:
     '''create a generator that will iterate over the specified part files'''
     PART_SOURCE_FOLDERS = ('contrib', 'core', 'obsolete', 'user')
@@ -83,7 +389,11 @@ class PartFinder:
             'folder': None,
             'single_folder': None,
             'svg': None,
-            'part_library': None
+            'part_library': None,
+            'selector': None,
+            'bins': None,
+            'bin_resolver': None,
+            'walker': None
         }
         # hpd setup folder nest/filter criteria
         self.process_command_arguments(cmd_args)
@@ -106,11 +416,59 @@ class PartFinder:
                 'handling not written yet for additional configuration option')
 
         self.criteria['svg'] = cmd_args.svg
+        # a walker (and module index) passed in is shared with other finders
+        self.criteria['walker'] = getattr(cmd_args, 'link_walker', None)
+        if self.criteria['walker'] is None and getattr(cmd_args, 'follow_links', False):
+            self.criteria['walker'] = LinkWalker()
+        bins = getattr(cmd_args, 'bins', None)
+        if bins:
+            if not self.criteria['part_library']:
+                raise ValueError('bin parts need a parts library') # checked by the CLIs
+            self.criteria['bins'] = bins
+            module_index = getattr(cmd_args, 'module_index', None)
+            if module_index is None:
+                module_index = ModuleIdIndex(
+                    cmd_args.part_library, getattr(cmd_args, 'module_cache', None),
+                    getattr(cmd_args, 'xml_backend', None))
+            self.criteria['bin_resolver'] = BinResolver(module_index)
+        patterns = getattr(cmd_args, 'pattern', None)
+        if patterns:
+            if isinstance(patterns, str):
+                patterns = [patterns]
+            # compile once, then reuse for every folder and file checked
+            self.criteria['selector'] = PatternSelector(patterns)
     # end def process_command_arguments:
 
+    def relative_folder(self, folder: posix.DirEntry) -> str:
+        '''get the path to a folder relative to the root folder being processed'''
+        relative = os.path.relpath(folder.path, self.criteria['folder'].path)
+        if relative == os.curdir:
+            return ''
+        return relative.replace(os.sep, '/')
+    # end def relative_folder:
+
+    def may_enter(self, relative_folder: str) -> bool:
+        '''decide if a folder could contain any selected file'''
+        selector = self.criteria['selector']
+        return selector is None or selector.may_enter(relative_folder)
+    # end def may_enter:
+
+    def may_walk(self, folder: posix.DirEntry) -> bool:
+        '''decide if a folder should be walked, when following links'''
+        walker = self.criteria['walker']
+        return walker is None or walker.enter(folder)
+    # end def may_walk:
+
+    def done_walking(self, folder: posix.DirEntry) -> None:
+        '''finished with a folder, when following links'''
+        if self.criteria['walker'] is not None:
+            self.criteria['walker'].leave(folder)
+    # end def done_walking:
+
     def folder_sources(self) -> posix.DirEntry:
         '''provide single source folder for processing'''
         root = self.criteria['folder']
+        self.may_walk(root)
         yield root
         if self.criteria['svg']:
             self.criteria['match_suffix'] = self.IMAGE_FILE_TYPE
@@ -120,20 +478,35 @@ class PartFinder:
     def library_sources(self) -> posix.DirEntry:
         '''sequence through the part source folders in the library'''
         image_folder = None
+        self.may_walk(self.criteria['folder'])
         with os.scandir(self.criteria['folder'].path) as library_root:
             self.criteria['match_suffix'] = self.PART_FILE_TYPE
+            if self.criteria['walker'] is not None:
+                library_root = LinkWalker.real_first(library_root)
             for source_candidate in library_root:
                 if self.is_source_folder(source_candidate):
-                    yield source_candidate
+                    if self.may_enter(source_candidate.name) and self.may_walk(source_candidate):
+                        yield source_candidate
+                        self.done_walking(source_candidate)
                 elif self.is_image_folder(source_candidate):
                     image_folder = source_candidate
-        if self.criteria['svg'] and not image_folder is None:
+        if self.criteria['svg'] and not image_folder is None \
+                and self.may_enter(image_folder.name) and self.may_walk(image_folder):
             self.criteria['match_suffix'] = self.IMAGE_FILE_TYPE
-            for source_candidate in image_folder:
-                if self.is_source_folder(source_candidate):
-                    for view_candidate in source_candidate:
-                        if self.is_view_folder(view_candidate):
+            source_candidates = scan_directory_files(image_folder)
+            if self.criteria['walker'] is not None:
+                source_candidates = LinkWalker.real_first(source_candidates)
+            for source_candidate in source_candidates:
+                source_relative = image_folder.name + '/' + source_candidate.name
+                if self.is_source_folder(source_candidate) and self.may_enter(source_relative) \
+                        and self.may_walk(source_candidate):
+                    for view_candidate in scan_directory_files(source_candidate):
+                        if self.is_view_folder(view_candidate) and self.may_enter(
+                                source_relative + '/' + view_candidate.name) \
+                                and self.may_walk(view_candidate):
                             yield view_candidate
+                            self.done_walking(view_candidate)
+                    self.done_walking(source_candidate)
     # end def library_sources(self, root: posix.DirEntry) ->posix.DirEntry:
 
     def is_source_folder(self, candidate_folder: posix.DirEntry) -> bool:
@@ -166,24 +539,75 @@ class PartFinder:
     def filtered_files(self) -> posix.DirEntry:
         '''select part files based on selection criteria'''
         # print('start filtered_files') # DEBUG
+        if self.criteria['bins']:
+            for file_path in self.bin_files():
+                yield file_path
+            return
         for folder_path in self.matching_folders():
             # print('start folder "{0}"'.format(type(folder_path))) # DEBUG
             for file_path in self.matching_files(folder_path):
                 yield file_path
+        if self.criteria['walker'] is not None:
+            for file_path in self.criteria['walker'].deferred_files():
+                yield file_path
     # end def filtered_files:
 
+    def bin_files(self) -> posix.DirEntry:
+        '''sequence through the part files referenced by the selected bins'''
+        self.criteria['match_suffix'] = self.PART_FILE_TYPE
+        root_path = self.criteria['folder'].path
+        # a library stack resolves parts in any of its libraries
+        layer_root = getattr(self.criteria['bin_resolver'].module_index, 'layer_root', None)
+        selected_parts = []
+        for part_path in self.criteria['bin_resolver'].resolve(self.criteria['bins']):
+            entry = PseudoDirEntry(os.path.basename(part_path), part_path)
+            if layer_root is not None:
+                root_path = layer_root(part_path)
+            relative_folder = os.path.relpath(
+                os.path.dirname(part_path), root_path).replace(os.sep, '/')
+            if self.may_enter(relative_folder) and self.is_matched_file(entry, relative_folder) \
+                    and (self.criteria['walker'] is None
+                         or self.criteria['walker'].is_new_file(entry)):
+                selected_parts.append(part_path)
+                yield entry
+        if not self.criteria['svg']:
+            return
+        # then the view images used by the selected parts
+        self.criteria['match_suffix'] = self.IMAGE_FILE_TYPE
+        for image_path in self.criteria['bin_resolver'].view_images(selected_parts):
+            entry = PseudoDirEntry(os.path.basename(image_path), image_path)
+            if layer_root is not None:
+                root_path = layer_root(image_path)
+            relative_folder = os.path.relpath(
+                os.path.dirname(image_path), root_path).replace(os.sep, '/')
+            if self.may_enter(relative_folder) and self.is_matched_file(entry, relative_folder) \
+                    and (self.criteria['walker'] is None
+                         or self.criteria['walker'].is_new_file(entry)):
+                yield entry
+    # end def bin_files:
+
     def matching_files(self, source: posix.DirEntry) -> posix.DirEntry:
         '''sequence through the files that match the selection criteria'''
         # print('matching_files for : {0}'.format(source)) # DEBUG
+        relative_folder = self.relative_folder(source)
+        walker = self.criteria['walker']
         for entry in scan_directory_files(source):
-            if self.is_matched_file(entry):
+            if self.is_matched_file(entry, relative_folder) \
+                    and (walker is None or walker.offer(entry)):
                 yield entry
     # end def matching_files:
 
-    def is_matched_file(self, offered: posix.DirEntry) -> bool:
+    def is_matched_file(self, offered: posix.DirEntry, relative_folder: str = '') -> bool:
         '''choose whether a file should be processed (True) or skipped (False)'''
         # Use the current folder information to inform the choice logic
-        return offered.name.endswith(self.criteria['match_suffix'])
+        if not offered.name.endswith(self.criteria['match_suffix']):
+            return False
+        selector = self.criteria['selector']
+        if selector is None:
+            return True
+        if relative_folder:
+            return selector.selects(relative_folder + '/' + offered.name)
+        return selector.selects(offered.name)
     # end def is_matched_file:
 
     # def __iter__(self):